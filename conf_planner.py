@@ -0,0 +1,201 @@
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+# Covering array planner of the hwruntime_tb configurations. Every dimension of
+# a configuration is abstracted into a few levels (a shape) and a greedy
+# t-wise covering set of shapes is built, so that every combination of t levels
+# that the testbench supports is simulated at least once. The concrete values
+# inside a level are drawn from the conf seed, so different runs still explore
+# different configurations. The feature flags of the manager are tied to
+# NUM_CREATORS in hwruntime_tb, they are covered by the creators dimension.
+
+import itertools
+import json
+import os
+import random
+
+from integration_conf import IntegrationConf, MAX_ACCS, MAX_CREATORS, MAX_TASK_TYPE, MAX_SIM_SEED
+
+COVERAGE_FORMAT_VERSION = 1
+
+FACTORS = [('creators', ['none', 'one', 'mid', 'max']),
+           ('accs', ['min', 'mid', 'max']),
+           ('types', ['min', 'mid', 'one_per_acc']),
+           ('instances', ['single', 'uniform', 'skewed']),
+           ('nesting', ['none', 'single', 'flat', 'chain', 'full'])]
+
+
+def valid_shape(shape):
+    creators, accs, types, instances, nesting = (shape[name] for name, _ in FACTORS)
+    if creators == 'none' and nesting != 'none':
+        return False
+    if creators == 'one' and nesting != 'single':
+        return False
+    if creators in ('mid', 'max') and nesting not in ('flat', 'chain', 'full'):
+        return False
+    # With the minimum number of accelerators there is one per type
+    if accs == 'min' and types != 'min':
+        return False
+    if accs == 'min' or types == 'one_per_acc':
+        return instances == 'single'
+    # A single non creator type gets all the remaining instances
+    if types == 'min':
+        return instances == 'skewed'
+    return instances != 'single'
+
+
+def all_shapes():
+    shapes = []
+    for levels in itertools.product(*(levels for _, levels in FACTORS)):
+        shape = dict(zip((name for name, _ in FACTORS), levels))
+        if valid_shape(shape):
+            shapes.append(shape)
+    return shapes
+
+
+def shape_str(shape):
+    return ','.join('{}={}'.format(name, shape[name]) for name, _ in FACTORS)
+
+
+def parse_shape(value):
+    shape = dict(item.split('=', 1) for item in value.split(','))
+    if sorted(shape) != sorted(name for name, _ in FACTORS) or not valid_shape(shape):
+        raise ValueError('invalid configuration shape ' + value)
+    return shape
+
+
+def shape_tuples(shape, t):
+    # Combinations of t levels of a shape, as strings so they can be stored in json
+    names = [name for name, _ in FACTORS]
+    return [','.join('{}={}'.format(name, shape[name]) for name in combination)
+            for combination in itertools.combinations(names, t)]
+
+
+def plan_shapes(t, history=None, max_confs=None, rng=None):
+    # Greedy construction of the covering array: each step picks the shape that
+    # covers the most pending tuples. Tuples seldom covered by previous runs
+    # weight more, so they are planned first when the number of confs is limited
+    history = history or {}
+    rng = rng or random.Random()
+    shapes = all_shapes()
+    tuples = [shape_tuples(shape, t) for shape in shapes]
+    pending = set(tup for shape_tups in tuples for tup in shape_tups)
+
+    def weight(tup):
+        return 1.0 / (1 + history.get(tup, {}).get('count', 0))
+
+    plan = []
+    while pending and (max_confs is None or len(plan) < max_confs):
+        scores = [(sum(weight(tup) for tup in shape_tups if tup in pending), rng.random(), idx)
+                  for idx, shape_tups in enumerate(tuples)]
+        _, _, best = max(scores)
+        plan.append(shapes[best])
+        pending.difference_update(tuples[best])
+    return plan
+
+
+def shaped_conf(shape, conf_seed, max_commands, repeats, repeat_seed=0):
+    rng = random.Random(conf_seed)
+
+    if shape['creators'] == 'none':
+        ncreators = 0
+    elif shape['creators'] == 'one':
+        ncreators = 1
+    elif shape['creators'] == 'mid':
+        ncreators = rng.randint(2, MAX_CREATORS - 1)
+    else:
+        ncreators = MAX_CREATORS
+
+    # Middle values leave room for a middle number of types
+    if shape['accs'] == 'min':
+        naccs = ncreators + 1
+    elif shape['accs'] == 'mid':
+        naccs = rng.randint(ncreators + 3, MAX_ACCS - 1)
+    else:
+        naccs = MAX_ACCS
+
+    if shape['types'] == 'min':
+        ntypes = ncreators + 1
+    elif shape['types'] == 'mid':
+        ntypes = rng.randint(ncreators + 2, naccs - 1)
+    else:
+        ntypes = naccs
+
+    # Creators are the first types and have a single instance
+    ninstances = [1] * ntypes
+    extra = naccs - ntypes
+    if shape['instances'] == 'skewed':
+        ninstances[rng.randint(ncreators, ntypes - 1)] += extra
+    elif shape['instances'] == 'uniform':
+        first = rng.randint(0, ntypes - ncreators - 1)
+        for i in range(extra):
+            ninstances[ncreators + (first + i) % (ntypes - ncreators)] += 1
+
+    # Creators create every non creator type. In a chain each creator also
+    # creates the previous one, in a full graph all the previous ones
+    nest_graph = [[0] * ncreators + [1] * (ntypes - ncreators) for _ in range(ncreators)]
+    creator_order = list(range(ncreators))
+    rng.shuffle(creator_order)
+    for i in range(1, ncreators):
+        if shape['nesting'] == 'chain':
+            nest_graph[creator_order[i]][creator_order[i - 1]] = 1
+        elif shape['nesting'] == 'full':
+            for j in range(i):
+                nest_graph[creator_order[i]][creator_order[j]] = 1
+
+    task_types = rng.sample(range(MAX_TASK_TYPE), ntypes)
+
+    if repeat_seed == 0:
+        repeat_seeds = [rng.randint(1, MAX_SIM_SEED) for _ in range(repeats)]
+    else:
+        repeat_seeds = [repeat_seed] * repeats
+
+    return IntegrationConf(conf_seed, 1 if ncreators else 0, max_commands, naccs, ninstances, ncreators,
+                           task_types, nest_graph, repeat_seeds)
+
+
+def load_coverage(path, t):
+    # Coverage of previous runs, it is discarded when t or the format change
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        coverage = json.load(f)
+    if coverage.get('version') != COVERAGE_FORMAT_VERSION or coverage.get('t') != t:
+        return {}
+    return coverage['tuples']
+
+
+def save_coverage(path, t, history, covered_shapes, campaign_seed):
+    # Returns the number of tuples covered for the first time
+    new = 0
+    for shape in covered_shapes:
+        for tup in shape_tuples(shape, t):
+            entry = history.setdefault(tup, {'count': 0})
+            if entry['count'] == 0:
+                new += 1
+            entry['count'] += 1
+            entry['last_seed'] = campaign_seed
+    with open(path, 'w') as f:
+        json.dump({'version': COVERAGE_FORMAT_VERSION, 't': t, 'tuples': history}, f, indent=4, sort_keys=True)
+    return new
+
+
+def num_tuples(t):
+    return len(set(tup for shape in all_shapes() for tup in shape_tuples(shape, t)))
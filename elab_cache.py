@@ -0,0 +1,81 @@
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+
+# Cache of the elaborated xsim snapshots of the integration tests, one
+# directory per configuration key. The Tcl script elaborates the snapshot
+# into <entry>/xsim the first time the entry is used and marks it with
+# xsim/ready. Every use touches the last_used file of the entry, and evict()
+# removes the least recently used entries while the cache is over its size
+# limit, as well as the entries that have not been used for max_age days.
+# The most recently used entry is always kept.
+
+import os
+import shutil
+import time
+
+LAST_USED = 'last_used'
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files
+               if not os.path.islink(os.path.join(root, name)))
+
+
+class ElabCache:
+    def __init__(self, cache_dir, max_size, max_age):
+        self.cache_dir = cache_dir
+        self.max_size = max_size * 1024 * 1024
+        self.max_age = max_age * 24 * 3600
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def entry(self, key):
+        entry_path = self.path(key)
+        os.makedirs(entry_path, exist_ok=True)
+        with open(os.path.join(entry_path, LAST_USED), 'a'):
+            pass
+        os.utime(os.path.join(entry_path, LAST_USED))
+        return entry_path
+
+    def ready(self, key):
+        return os.path.exists(os.path.join(self.path(key), 'xsim', 'ready'))
+
+    def evict(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            entry_path = os.path.join(self.cache_dir, key)
+            if not os.path.isdir(entry_path):
+                continue
+            # Entries written before last_used existed are as old as their directory
+            used_path = os.path.join(entry_path, LAST_USED)
+            mtime = os.path.getmtime(used_path if os.path.exists(used_path) else entry_path)
+            entries.append((mtime, dir_size(entry_path), entry_path))
+
+        entries.sort()
+        total_size = sum(size for _, size, _ in entries)
+        now = time.time()
+        for mtime, size, entry_path in entries[:-1]:
+            if now - mtime > self.max_age or total_size > self.max_size:
+                shutil.rmtree(entry_path, ignore_errors=True)
+                total_size -= size
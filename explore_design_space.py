@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+# Design space exploration of the PicosOmpSsManager IP generics. Every point
+# is synthesized out of context from the IP packaged by generate_IP.py and
+# joined with the throughput estimated by pom_model.py for the same queue
+# sizes and features. The result is the Pareto front of LUT/FF/BRAM against
+# throughput.
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from integration_conf import hash_sources
+from pom_model import ModelConf, PomModel, Workload
+from result_cache import ResultCache
+from run_log import RunLog
+from vivado_reports import get_used_resources, parse_rpt_tables, parse_timing_summary
+
+FEATURE_FLAGS = ['ENABLE_TASK_CREATION', 'LOCK_SUPPORT', 'ENABLE_SPAWN_QUEUES', 'AXILITE_INTF', 'DBG_AVAIL_COUNT_EN']
+PARETO_RESOURCES = ['LUT', 'FF', 'BRAM_18K']
+
+
+class Logger(object):
+    def __init__(self):
+        self.terminal = sys.stdout
+        # Compressed and indexed, see run_log.py
+        self.log = RunLog('explore_design_space.log.gz')
+        self.lock = threading.Lock()
+
+    def write(self, message):
+        with self.lock:
+            self.terminal.write(message)
+            self.log.write(message)
+
+    def flush(self):
+        pass
+
+
+class Color:
+    GREEN = '\033[0;32m'
+    YELLOW = '\033[1;33m'
+    RED = '\033[0;31m'
+    END = '\033[0m'
+
+
+class Messages:
+    def error(self, msg):
+        print(Color.RED + msg + '. Check explore_design_space.log.gz for more information' + Color.END)
+        sys.exit(1)
+
+    def info(self, msg):
+        print(Color.YELLOW + msg + Color.END)
+
+    def warning(self, msg):
+        print(Color.YELLOW + msg + Color.END)
+
+    def success(self, msg):
+        print(Color.GREEN + msg + Color.END)
+
+    def log(self, msg):
+        print(msg)
+
+
+def int_list(value):
+    return [int(v) for v in value.split(',')]
+
+
+class ArgParser:
+    def __init__(self):
+        self.parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter)
+
+        self.parser.add_argument('-b', '--board_part', help='board part number', type=str.lower, required=True)
+        self.parser.add_argument('-v', '--verbose', help='prints Vivado messages', action='store_true', default=False)
+        self.parser.add_argument('-j', '--jobs', help='number of points synthesized concurrently (def: 2)', type=int, default=2)
+        self.parser.add_argument('--ip_repo', help='IP repository generated by generate_IP.py (def: ./pom_IP/IP_packager)', type=str, default='./pom_IP/IP_packager')
+        self.parser.add_argument('--clock_period', help='clock period in ns used for the synthesis timing report (def: 3.333)', type=float, default=3.333)
+        self.parser.add_argument('--max_accs', help='comma separated MAX_ACCS values (def: 16)', type=int_list, default=[16])
+        self.parser.add_argument('--max_acc_types', help='comma separated MAX_ACC_TYPES values (def: 16)', type=int_list, default=[16])
+        self.parser.add_argument('--cmdin_subqueue_len', help='comma separated CMDIN_SUBQUEUE_LEN values (def: 64)', type=int_list, default=[64])
+        self.parser.add_argument('--cmdout_subqueue_len', help='comma separated CMDOUT_SUBQUEUE_LEN values (def: 64)', type=int_list, default=[64])
+        self.parser.add_argument('--spawnin_queue_len', help='comma separated SPAWNIN_QUEUE_LEN values (def: 1024)', type=int_list, default=[1024])
+        self.parser.add_argument('--spawnout_queue_len', help='comma separated SPAWNOUT_QUEUE_LEN values (def: 1024)', type=int_list, default=[1024])
+        self.parser.add_argument('--sweep_flags', help='feature flags swept between 0 and 1, the others are enabled', nargs='+', choices=FEATURE_FLAGS, default=[])
+        self.parser.add_argument('--sample', help='synthesize only this number of random points of the space', type=int)
+        self.parser.add_argument('--seed', help='seed of --sample and of the throughput model (def: 0)', type=int, default=0)
+        self.parser.add_argument('--model_tasks', help='tasks simulated by the throughput model per point, 0 to disable it (def: 200000)', type=int, default=200000)
+        self.parser.add_argument('--cache_dir', help='directory of the results cache (def: $XDG_CACHE_HOME/pom_dse)',
+                                 default=os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'pom_dse'))
+        self.parser.add_argument('--no_cache', help='always synthesize and do not store the results in the cache', action='store_true', default=False)
+        self.parser.add_argument('-o', '--output', help='json file with every point and the Pareto front (def: dse_results.json)', type=str, default='dse_results.json')
+
+    def parse_args(self):
+        args = self.parser.parse_args()
+        return args
+
+
+def normalize_point(point):
+    # Generics disabled by a feature flag do not change the design, fix them
+    # so that equivalent points are only synthesized once
+    if not point['ENABLE_SPAWN_QUEUES']:
+        point['SPAWNIN_QUEUE_LEN'] = args.spawnin_queue_len[0]
+        point['SPAWNOUT_QUEUE_LEN'] = args.spawnout_queue_len[0]
+    if not point['AXILITE_INTF']:
+        point['DBG_AVAIL_COUNT_EN'] = 0
+    if point['DBG_AVAIL_COUNT_EN']:
+        point['DBG_AVAIL_COUNT_W'] = 64
+    return point
+
+
+def generate_points():
+    space = [('MAX_ACCS', args.max_accs),
+             ('MAX_ACC_TYPES', args.max_acc_types),
+             ('CMDIN_SUBQUEUE_LEN', args.cmdin_subqueue_len),
+             ('CMDOUT_SUBQUEUE_LEN', args.cmdout_subqueue_len),
+             ('SPAWNIN_QUEUE_LEN', args.spawnin_queue_len),
+             ('SPAWNOUT_QUEUE_LEN', args.spawnout_queue_len)]
+    space += [(flag, [0, 1] if flag in args.sweep_flags else [1]) for flag in FEATURE_FLAGS]
+
+    points = {}
+    for values in itertools.product(*[v for _, v in space]):
+        point = dict(zip([name for name, _ in space], values))
+        if point['MAX_ACC_TYPES'] > point['MAX_ACCS']:
+            continue
+        point = normalize_point(point)
+        points[json.dumps(point, sort_keys=True)] = point
+    points = list(points.values())
+
+    if args.sample is not None and args.sample < len(points):
+        points = random.Random(args.seed).sample(points, args.sample)
+    return points
+
+
+def point_key(kind, point, context):
+    sha = hashlib.sha256((kind + '\0' + context + '\0').encode('utf-8'))
+    sha.update(json.dumps(point, sort_keys=True).encode('utf-8'))
+    return sha.hexdigest()
+
+
+def point_name(point):
+    return ' '.join('{}={}'.format(name, value) for name, value in point.items())
+
+
+def synthesize_point(point):
+    key = point_key('synth', point, synth_context)
+    result = cache.load(key)
+    if result is not None:
+        msg.log('Reusing synthesis of ' + point_name(point))
+        return result
+
+    prj_path = os.path.abspath('./dse/' + key[:16])
+    shutil.rmtree(prj_path, ignore_errors=True)
+    os.makedirs(prj_path)
+    msg.info('Synthesizing ' + point_name(point))
+    with open(prj_path + '/vivado.log', 'w') as log_file:
+        p = subprocess.Popen('vivado -nojournal -nolog -notrace -mode batch -source '
+                             + os.getcwd() + '/scripts/synthesize_ip.tcl -tclargs '
+                             + prj_path + ' '
+                             + 'PicosOmpSsManager '
+                             + args.board_part + ' '
+                             + os.path.abspath(args.ip_repo) + ' '
+                             + str(args.clock_period) + ' '
+                             + ' '.join('{}={}'.format(name, value) for name, value in point.items()),
+                             cwd=prj_path,
+                             stdout=subprocess.PIPE if args.verbose else log_file,
+                             stderr=subprocess.STDOUT, shell=True)
+
+        if args.verbose:
+            prefix = '[' + key[:8] + '] '
+            for line in iter(p.stdout.readline, b''):
+                line = line.decode('utf-8')
+                log_file.write(line)
+                sys.stdout.write(prefix + line)
+
+        retval = p.wait()
+
+    if retval:
+        msg.warning('Synthesis of ' + point_name(point) + ' failed, see ' + prj_path + '/vivado.log')
+        return None
+
+    rpt_path = prj_path + '/synth_project.runs/synth_1/picosompssmanager_0_utilization_synth.rpt'
+    if not os.path.exists(rpt_path):
+        msg.warning('Cannot find rpt file ' + rpt_path)
+        return None
+    used_resources, missing = get_used_resources(parse_rpt_tables(rpt_path))
+    if missing is not None:
+        msg.warning('Cannot find ' + missing + ' info in rpt file ' + rpt_path)
+        return None
+
+    result = {'resources': used_resources}
+    if os.path.exists(prj_path + '/timing_summary.rpt'):
+        timing = parse_timing_summary(prj_path + '/timing_summary.rpt')
+        if timing is not None:
+            timing['Fmax_MHz'] = round(1000.0 / (args.clock_period - timing['WNS']), 2)
+            result['timing'] = timing
+
+    cache.store(key, result)
+    msg.success('Finished synthesis of ' + point_name(point))
+    return result
+
+
+def model_point(point):
+    key = point_key('model', point, model_context)
+    result = cache.load(key)
+    if result is not None:
+        return result
+
+    # MAX_ACCS accelerators of MAX_ACC_TYPES types, the first type creates tasks
+    naccs = point['MAX_ACCS']
+    ntypes = min(point['MAX_ACC_TYPES'], naccs)
+    ninstances = [naccs // ntypes + (i < naccs % ntypes) for i in range(ntypes)]
+    ncreators = 1 if point['ENABLE_TASK_CREATION'] and ntypes > 1 else 0
+    conf = ModelConf(ninstances, ncreators,
+                     cmdin_subqueue_len=point['CMDIN_SUBQUEUE_LEN'],
+                     cmdout_subqueue_len=point['CMDOUT_SUBQUEUE_LEN'],
+                     spawnin_queue_len=point['SPAWNIN_QUEUE_LEN'],
+                     spawnout_queue_len=point['SPAWNOUT_QUEUE_LEN'])
+    workload = Workload(args.model_tasks,
+                        smp_ratio=0.1 if ncreators and point['ENABLE_SPAWN_QUEUES'] else 0.0,
+                        lock_ratio=0.2 if ncreators and point['LOCK_SUPPORT'] else 0.0)
+    res = PomModel(conf, workload, args.seed).run()
+    result = {'tasks_per_cycle': res['tasks_per_cycle'],
+              'host_dispatch_latency': res['latency']['host_dispatch']['mean'],
+              'created_dispatch_latency': res['latency']['created_dispatch']['mean']}
+
+    cache.store(key, result)
+    return result
+
+
+def pareto_front(points, metric):
+    front = []
+    for p in points:
+        dominated = False
+        for q in points:
+            if q is p:
+                continue
+            no_worse = all(q['resources'][r] <= p['resources'][r] for r in PARETO_RESOURCES) and q[metric] >= p[metric]
+            better = any(q['resources'][r] < p['resources'][r] for r in PARETO_RESOURCES) or q[metric] > p[metric]
+            if no_worse and better:
+                dominated = True
+                break
+        if not dominated:
+            front.append(p)
+    return front
+
+
+msg = Messages()
+parser = ArgParser()
+args = parser.parse_args()
+cache = ResultCache(args.cache_dir, not args.no_cache)
+sys.stdout = Logger()
+
+if not shutil.which('vivado'):
+    msg.error('vivado not found. Please set PATH correctly')
+
+if args.jobs < 1:
+    msg.error('jobs must be at least 1')
+
+if not os.path.exists(args.ip_repo + '/component.xml'):
+    msg.error('Cannot find the PicosOmpSsManager IP in ' + args.ip_repo + '. Run generate_IP.py --skip_synth first')
+
+points = generate_points()
+if not points:
+    msg.error('The design space is empty')
+msg.info('Exploring {} points of the design space for part {}'.format(len(points), args.board_part))
+
+# The path of the vivado binary identifies the installed version
+synth_context = '\0'.join([hash_sources(args.ip_repo, ['.']), args.board_part, str(args.clock_period),
+                           os.path.realpath(shutil.which('vivado'))])
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pom_model.py'), 'rb') as f:
+    model_context = '\0'.join([hashlib.sha256(f.read()).hexdigest(), str(args.model_tasks), str(args.seed)])
+
+with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+    futures = [pool.submit(synthesize_point, point) for point in points]
+    # The model runs in the main thread while Vivado synthesizes
+    models = [model_point(point) if args.model_tasks > 0 else None for point in points]
+    synth_results = [f.result() for f in futures]
+
+results = []
+for point, synth, model in zip(points, synth_results, models):
+    if synth is None:
+        continue
+    res = {'params': point}
+    res.update(synth)
+    if model is not None:
+        res['model'] = model
+    results.append(res)
+
+if not results:
+    msg.error('Synthesis failed for every point')
+
+# Throughput in tasks per microsecond when the timing of every point is known, tasks per cycle otherwise
+if args.model_tasks > 0 and all('timing' in res for res in results):
+    metric = 'tasks_per_us'
+    for res in results:
+        res[metric] = round(res['model']['tasks_per_cycle'] * res['timing']['Fmax_MHz'], 4)
+elif args.model_tasks > 0:
+    metric = 'tasks_per_cycle'
+    for res in results:
+        res[metric] = res['model']['tasks_per_cycle']
+else:
+    metric = 'none'
+    for res in results:
+        res[metric] = 0
+
+front = pareto_front(results, metric)
+for res in results:
+    res['pareto'] = any(res is p for p in front)
+
+with open(args.output, 'w') as f:
+    json.dump({'board_part': args.board_part, 'clock_period': args.clock_period, 'throughput_metric': metric,
+               'points': results}, f, indent=4)
+
+front.sort(key=lambda res: res[metric], reverse=True)
+msg.log('Pareto front of {} out of {} points (LUT/FF/BRAM_18K against {}):'.format(len(front), len(results), metric))
+msg.log('  {:>8} {:>8} {:>8} {:>8} {:>12}  {}'.format('LUT', 'FF', 'BRAM_18K', 'Fmax', metric, 'point'))
+for res in front:
+    fmax = res['timing']['Fmax_MHz'] if 'timing' in res else '-'
+    msg.log('  {:>8} {:>8} {:>8} {:>8} {:>12}  {}'.format(res['resources']['LUT'], res['resources']['FF'], res['resources']['BRAM_18K'],
+                                                         fmax, res[metric], point_name(res['params'])))
+
+failed = len(points) - len(results)
+if failed:
+    msg.error('Synthesis failed for {} points, results written to {}'.format(failed, args.output))
+msg.success('Results written to ' + args.output)
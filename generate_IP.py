@@ -21,12 +21,20 @@
 # ------------------------------------------------------------------------- #
 
 import argparse
+import atexit
+import hashlib
 import json
 import os
-import re
 import shutil
 import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from run_log import RunLog
+from timing_spans import SpanRecorder, StreamPhases, format_slowest
+from vivado_reports import get_rpt_table, get_used_resources, parse_rpt_tables, parse_timing_summary
 
 POM_MAJOR_VERSION = 7
 POM_MINOR_VERSION = 1
@@ -34,18 +42,44 @@ POM_MINOR_VERSION = 1
 POM_PREVIOUS_MAJOR_VERSION = 7
 POM_PREVIOUS_MINOR_VERSION = 0
 
+# Instance names of PicosOmpSsManager submodules, used to locate critical paths
+POM_INSTANCE_MODULES = {
+    'axilite_controller_I': 'axilite_controller',
+    'Command_In_I': 'Command_In',
+    'copy_opt': 'Command_In_copy_opt',
+    'Command_Out_I': 'Command_Out',
+    'Lock_I': 'Lock',
+    'Cutoff_Manager_I': 'Cutoff_Manager',
+    'Scheduler_I': 'Scheduler',
+    'sched_spawnout': 'Scheduler_spawnout',
+    'Spawn_In_I': 'Spawn_In',
+    'Taskwait_I': 'Taskwait',
+    'intCmdInQueue': 'dual_port_mem_wrapper',
+    'tw_info': 'dual_port_mem_wrapper',
+    'Picos_finish_task_Inter': 'axis_switch_picos_finish_task',
+    'Sched_inStream_Inter': 'axis_switch_sched_in',
+    'Taskwait_inStream_Inter': 'axis_switch_taskwait_in',
+    'Task_create_ack_Inter': 'axis_switch_task_create_ack'
+}
+
 
 class Logger(object):
     def __init__(self):
         self.terminal = sys.stdout
-        self.log = open('generate_IP.log', 'w+')
-        self.subprocess = subprocess.PIPE if args.verbose else self.log
-        self.re_color = re.compile(r'\033\[[0,1][0-9,;]*m')
+        # Compressed and indexed, see run_log.py
+        self.log = RunLog('generate_IP.log.gz')
+        self.lock = threading.Lock()
 
     def write(self, message):
-        self.terminal.write(message)
-        self.log.write(self.re_color.sub('', message))
-        self.log.flush()
+        with self.lock:
+            self.terminal.write(message)
+            self.log.write(message)
+
+    def writeVerbose(self, message, stream=None):
+        with self.lock:
+            if args.verbose:
+                self.terminal.write(message)
+            self.log.write(message, stream)
 
     def flush(self):
         pass
@@ -60,7 +94,7 @@ class Color:
 
 class Messages:
     def error(self, msg):
-        print(Color.RED + msg + '. Check generate_IP.log for more information' + Color.END)
+        print(Color.RED + msg + '. Check generate_IP.log.gz for more information' + Color.END)
         sys.exit(1)
 
     def info(self, msg):
@@ -80,107 +114,302 @@ class ArgParser:
     def __init__(self):
         self.parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter)
 
-        self.parser.add_argument('-b', '--board_part', help='board part number', metavar='BOARD_PART', type=str.lower)
+        self.parser.add_argument('-b', '--board_part', help='board part number(s). The IP is synthesized for each part in parallel', metavar='BOARD_PART', type=str.lower, nargs='+')
         self.parser.add_argument('-v', '--verbose', help='prints Vivado messages', action='store_true', default=False)
         self.parser.add_argument('--skip_board_check', help='skips the board part check', action='store_true', default=False)
         self.parser.add_argument('--skip_synth', help='skips POM IP synthesis to generate resource utilization report', action='store_true', default=False)
+        self.parser.add_argument('--clock_period', help='clock period in ns used for the synthesis timing report (def: 3.333)', type=float, default=3.333)
         self.parser.add_argument('--no_encrypt', help='do not encrypt IP source files', action='store_true', default=False)
+        self.parser.add_argument('--cache_dir', help='directory of the IP build cache (def: $XDG_CACHE_HOME/pom_IP)', metavar='CACHE_DIR',
+                                 default=os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'pom_IP'))
+        self.parser.add_argument('--timing', help='write the timing spans of every phase in this json lines file prefix, plus a Chrome trace (def: generate_IP_timing)', nargs='?', const='generate_IP_timing', type=str)
+        self.parser.add_argument('--no_cache', help='always rebuild the IP and do not store it in the cache', action='store_true', default=False)
+        self.parser.add_argument('--cache_max_size', help='maximum size of the IP build cache in MB (def: 2048)', type=int, default=2048)
+        self.parser.add_argument('--cache_max_age', help='maximum age of IP build cache entries in days (def: 30)', type=int, default=30)
 
     def parse_args(self):
         args = self.parser.parse_args()
         return args
 
 
-def parse_syntehsis_utilization_report(rpt_path, report_file, name_IP):
+class BuildCache:
+    def __init__(self, cache_dir, max_size, max_age):
+        self.cache_dir = cache_dir
+        self.max_size = max_size * 1024 * 1024
+        self.max_age = max_age * 24 * 3600
+
+    def compute_key(self):
+        sha = hashlib.sha256()
+
+        def add_file(path):
+            sha.update(os.path.relpath(path).encode('utf-8') + b'\0')
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    sha.update(chunk)
+            sha.update(b'\0')
+
+        for root_dir in ['./src', './picos/src']:
+            for root, dirs, files in os.walk(root_dir):
+                dirs.sort()
+                for name in sorted(files):
+                    add_file(os.path.join(root, name))
+
+        for path in ['./scripts/ip_packager.tcl', './scripts/synthesize_ip.tcl', './vivado_keyfile_ver.txt', './pom_logo.png']:
+            add_file(path)
+
+        # The path of the vivado binary identifies the installed version
+        params = [str(POM_MAJOR_VERSION), str(POM_MINOR_VERSION),
+                  str(POM_PREVIOUS_MAJOR_VERSION), str(POM_PREVIOUS_MINOR_VERSION),
+                  '' if args.skip_synth else ' '.join(args.board_part),
+                  str(args.no_encrypt), str(args.skip_synth), str(args.clock_period),
+                  os.path.realpath(shutil.which('vivado'))]
+        sha.update('\0'.join(params).encode('utf-8'))
+
+        return sha.hexdigest()
+
+    def restore(self, key, dst_path):
+        entry_path = os.path.join(self.cache_dir, key)
+        if not os.path.exists(os.path.join(entry_path, 'meta.json')):
+            return False
+
+        shutil.copytree(os.path.join(entry_path, 'IP_packager'), dst_path)
+        # Entries are evicted in least recently used order
+        os.utime(os.path.join(entry_path, 'meta.json'))
+        return True
+
+    def store(self, key, src_path):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry_path = os.path.join(self.cache_dir, key)
+        tmp_path = entry_path + '.tmp.' + str(os.getpid())
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        shutil.copytree(src_path, os.path.join(tmp_path, 'IP_packager'))
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as meta_file:
+            meta_file.write(json.dumps({'board_part': args.board_part, 'no_encrypt': args.no_encrypt,
+                                        'skip_synth': args.skip_synth, 'created': time.time()}))
+        shutil.rmtree(entry_path, ignore_errors=True)
+        os.rename(tmp_path, entry_path)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            entry_path = os.path.join(self.cache_dir, key)
+            meta_path = os.path.join(entry_path, 'meta.json')
+            if not os.path.exists(meta_path):
+                continue
+            size = sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(entry_path) for name in files)
+            entries.append((os.path.getmtime(meta_path), size, entry_path))
+
+        entries.sort()
+        total_size = sum(size for _, size, _ in entries)
+        now = time.time()
+        for mtime, size, entry_path in entries[:-1]:
+            if now - mtime > self.max_age or total_size > self.max_size:
+                shutil.rmtree(entry_path, ignore_errors=True)
+                total_size -= size
+
+
+def parse_syntehsis_utilization_report(rpt_path, name_IP, detail_file=None):
     if not os.path.exists(rpt_path):
         msg.warning('Cannot find rpt file ' + rpt_path + '. Skipping resource utilization report')
         return
 
-    used_resources = {}
-    with open(rpt_path, 'r') as rpt_file:
-        rpt_data = rpt_file.readlines()
-
-        # Search LUT/FF section
-        # NOTE: Possible section names: Slice Logic, CLB Logic
-        ids = [idx for idx in range(len(rpt_data) - 1) if ((re.match('^[0-9]\. Slice Logic\n', rpt_data[idx])
-                                                            and rpt_data[idx + 1] == '--------------\n') or
-                                                           (re.match('^[0-9]\. CLB Logic\n', rpt_data[idx])
-                                                            and rpt_data[idx + 1] == '------------\n'))]
-        if len(ids) != 1:
-            msg.warning('Cannot find LUT/FF info in rpt file ' + rpt_path + '. Skipping bitstream utilization report')
-            return
-
-        # Get LUT
-        elems = rpt_data[ids[0] + 6].split('|')
-        used_resources['LUT'] = int(elems[2].strip())
-
-        # Skip 2 lines if there is LUT as memory
-        elems = rpt_data[ids[0] + 8].split('|')
-        memory_LUT = int(elems[2].strip())
-
-        # Get FF
-        elems = rpt_data[ids[0] + (11 if memory_LUT > 0 else 9)].split('|')
-        used_resources['FF'] = int(elems[2].strip())
-
-        # Get DSP
-        # NOTE: Possible section names: DSP, ARITHMETIC
-        ids = [idx for idx in range(len(rpt_data) - 1) if ((re.match('^[0-9]\. DSP\n', rpt_data[idx])
-                                                            and rpt_data[idx + 1] == '------\n') or
-                                                           (re.match('^[0-9]\. ARITHMETIC\n', rpt_data[idx])
-                                                            and rpt_data[idx + 1] == '-------------\n'))]
-        if len(ids) != 1:
-            msg.warning('Cannot find DSP info in rpt file ' + rpt_path + '. Skipping bitstream utilization report')
-            return
-        elems = rpt_data[ids[0] + 6].split('|')
-        used_resources['DSP48E'] = int(elems[2].strip())
-
-        # Get BRAM
-        # NOTE: Possible section names: Memory, BLOCKRAM
-        ids = [idx for idx in range(len(rpt_data) - 1) if ((re.match('^[0-9]\. Memory\n', rpt_data[idx])
-                                                           and rpt_data[idx + 1] == '---------\n') or
-                                                           (re.match('^[0-9]\. BLOCKRAM\n', rpt_data[idx])
-                                                           and rpt_data[idx + 1] == '-----------\n'))]
-        if len(ids) != 1:
-            msg.warning('Cannot find BRAM info in rpt file ' + rpt_path + '. Skipping bitstream utilization report')
-            return
-        elems = rpt_data[ids[0] + 6].split('|')
-        used_resources['BRAM_18K'] = int(float(elems[2].strip()) * 2)
-
-    msg.log(name_IP + ' resources utilization summary')
-    for name in ['BRAM_18K', 'DSP48E', 'FF', 'LUT']:
-        report_string = '{0:<9} {1:>6} used'
-        report_string_formatted = report_string.format(name, used_resources[name])
-        msg.log(report_string_formatted)
-
-    with open(report_file, 'w') as json_file:
-        json_file.write(json.dumps(used_resources))
+    sections = parse_rpt_tables(rpt_path)
+    if detail_file is not None:
+        with open(detail_file, 'w') as json_file:
+            json_file.write(json.dumps(sections))
+
+    used_resources, missing = get_used_resources(sections)
+    if missing is not None:
+        msg.warning('Cannot find ' + missing + ' info in rpt file ' + rpt_path + '. Skipping bitstream utilization report')
+        return
+
+    report_string = name_IP + ' resources utilization summary'
+    for name in ['BRAM_18K', 'DSP48E', 'FF', 'LUT', 'URAM']:
+        if name in used_resources:
+            report_string += '\n{0:<9} {1:>6} used'.format(name, used_resources[name])
+    msg.log(report_string)
+
+    return used_resources
+
+
+def parse_hierarchical_utilization_report(rpt_path):
+    if not os.path.exists(rpt_path):
+        msg.warning('Cannot find rpt file ' + rpt_path + '. Skipping hierarchical utilization report')
+        return
+
+    table = get_rpt_table(parse_rpt_tables(rpt_path), ['Utilization by Hierarchy'])
+    if table is None or 'Instance' not in table['header']:
+        msg.warning('Cannot find hierarchy info in rpt file ' + rpt_path + '. Skipping hierarchical utilization report')
+        return
+
+    header = table['header']
+    columns = {'LUT': ['Total LUTs'], 'FF': ['FFs'], 'RAMB36': ['RAMB36'], 'RAMB18': ['RAMB18'],
+               'URAM': ['URAM'], 'DSP48E': ['DSP Blocks', 'DSP48 Blocks']}
+    columns = {name: header.index(col) for name, cols in columns.items() for col in cols if col in header}
+
+    # Per-submodule numbers of every block below PicosOmpSsManager_I, keyed by their instance path
+    hierarchy = {}
+    path = []
+    top_depth = None
+    for row, depth in zip(table['rows'], table['depth']):
+        inst = str(row[0])
+        if inst.startswith('('):
+            continue
+        del path[depth:]
+        path.append(inst)
+        if inst == 'PicosOmpSsManager_I':
+            top_depth = depth
+        elif top_depth is not None and depth <= top_depth:
+            top_depth = None
+        elif top_depth is not None:
+            module = POM_INSTANCE_MODULES.get(inst.split('.')[-1], str(row[1]).split('__parameterized')[0])
+            used_resources = {'module': module}
+            for name, col in columns.items():
+                used_resources[name] = row[col]
+            if 'RAMB36' in used_resources and 'RAMB18' in used_resources:
+                used_resources['BRAM_18K'] = int(used_resources.pop('RAMB36') * 2 + used_resources.pop('RAMB18'))
+            hierarchy['/'.join(path[top_depth + 1:])] = used_resources
+
+    return hierarchy
+
+
+def get_POM_module(pin):
+    module = 'PicosOmpSsManager'
+    # Generate blocks appear as <genblk>.<instance> in the hierarchical name
+    for inst in pin.split('/')[:-1]:
+        inst = inst.split('.')[-1]
+        if inst in POM_INSTANCE_MODULES:
+            module = POM_INSTANCE_MODULES[inst]
+    return module
+
+
+def parse_synthesis_timing_report(summary_path, paths_path, name_IP):
+    if not os.path.exists(summary_path) or not os.path.exists(paths_path):
+        msg.warning('Cannot find timing report in ' + os.path.dirname(summary_path) + '. Skipping timing report')
+        return
+
+    timing = parse_timing_summary(summary_path)
+    if timing is None:
+        msg.warning('Cannot find WNS/TNS info in rpt file ' + summary_path + '. Skipping timing report')
+        return
+
+    timing['critical_paths'] = []
+    with open(paths_path, 'r') as paths_file:
+        for line in paths_file:
+            elems = line.rstrip('\n').split('\t')
+            if elems[0] == 'PERIOD':
+                timing['period'] = float(elems[1])
+            elif len(elems) == 5:
+                timing['critical_paths'].append({
+                    'slack': float(elems[0]),
+                    'logic_levels': int(elems[1]),
+                    'datapath_delay': float(elems[2]),
+                    'startpoint': elems[3],
+                    'endpoint': elems[4],
+                    'src_module': get_POM_module(elems[3]),
+                    'dst_module': get_POM_module(elems[4])
+                })
+
+    if 'period' not in timing:
+        msg.warning('Cannot find clock period in ' + paths_path + '. Skipping timing report')
+        return
+    timing['Fmax_MHz'] = round(1000.0 / (timing['period'] - timing['WNS']), 2)
+
+    report_string = name_IP + ' timing summary'
+    report_string += '\n{0:<9} {1:>9.3f} ns'.format('WNS', timing['WNS'])
+    report_string += '\n{0:<9} {1:>9.3f} ns'.format('TNS', timing['TNS'])
+    report_string += '\n{0:<9} {1:>9.2f} MHz'.format('Fmax', timing['Fmax_MHz'])
+    for path in timing['critical_paths'][:3]:
+        report_string += '\n{0:>9.3f} ns {1} -> {2}'.format(path['slack'], path['src_module'], path['dst_module'])
+    msg.log(report_string)
 
+    return timing
 
-def compute_POM_resource_utilization():
-    msg.info('Synthesizing PicosOmpSsManager IP')
-    prj_path = './pom_IP/Synthesis'
+
+def compute_POM_resource_utilization(part):
+    msg.info('Synthesizing PicosOmpSsManager IP for part ' + part)
+    prj_path = './pom_IP/Synthesis/' + part
+    os.makedirs(prj_path)
     p = subprocess.Popen('vivado -nojournal -nolog -notrace -mode batch -source '
                          + os.getcwd() + '/scripts/synthesize_ip.tcl -tclargs '
-                         + os.path.abspath(os.getcwd() + '/pom_IP/Synthesis') + ' '
+                         + os.path.abspath(prj_path) + ' '
                          + 'PicosOmpSsManager '
-                         + args.board_part + ' '
-                         + os.path.abspath(os.getcwd() + '/pom_IP/IP_packager'),
+                         + part + ' '
+                         + os.path.abspath(os.getcwd() + '/pom_IP/IP_packager') + ' '
+                         + str(args.clock_period),
                          cwd=prj_path,
-                         stdout=sys.stdout.subprocess,
-                         stderr=sys.stdout.subprocess, shell=True)
-
-    if args.verbose:
+                         stdout=subprocess.PIPE,
+                         stderr=subprocess.STDOUT, shell=True)
+
+    prefix = '[' + part + '] ' if len(args.board_part) > 1 else ''
+    phases = StreamPhases(spans, part, rules=None, part=part)
+    # The output of each part is a section of the log, see run_log.py
+    sys.stdout.log.start_section(part, phase='synthesis', part=part)
+    with spans.span('synthesis', part, part=part):
         for line in iter(p.stdout.readline, b''):
-            sys.stdout.write(line.decode('utf-8'))
-
-    retval = p.wait()
+            line = line.decode('utf-8', errors='replace')
+            phases.feed(line)
+            sys.stdout.writeVerbose(prefix + line, part)
+        retval = p.wait()
+    sys.stdout.log.close_stream(part)
     if retval:
-        msg.error('Synthesis of PicosOmpSsManager IP failed')
-    else:
-        msg.success('Finished synthesis of PicosOmpSsManager IP')
+        msg.warning('Synthesis of PicosOmpSsManager IP for part ' + part + ' failed')
+        return False, None
+
+    msg.success('Finished synthesis of PicosOmpSsManager IP for part ' + part)
+    used_resources = parse_syntehsis_utilization_report(prj_path + '/synth_project.runs/synth_1/picosompssmanager_0_utilization_synth.rpt',
+                                                        'PicosOmpSsManager (' + part + ')', prj_path + '/utilization.json')
+    if used_resources is not None:
+        hierarchy = parse_hierarchical_utilization_report(prj_path + '/utilization_hierarchical.rpt')
+        if hierarchy is not None:
+            used_resources['hierarchy'] = hierarchy
+        timing = parse_synthesis_timing_report(prj_path + '/timing_summary.rpt', prj_path + '/timing_paths.txt',
+                                               'PicosOmpSsManager (' + part + ')')
+        if timing is not None:
+            used_resources['timing'] = timing
+
+    return True, used_resources
+
+
+def compute_POM_resource_utilization_all_parts():
+    with ThreadPoolExecutor(max_workers=len(args.board_part)) as pool:
+        results = dict(zip(args.board_part, pool.map(compute_POM_resource_utilization, args.board_part)))
+
+    failed_parts = [part for part, (ok, _) in results.items() if not ok]
+    used_resources = {part: res for part, (_, res) in results.items() if res is not None}
+
+    # The first part keeps the single-part report format consumed by AIT and CI
+    if args.board_part[0] in used_resources:
+        with open('./pom_IP/IP_packager/pom_resource_utilization.json', 'w') as json_file:
+            json_file.write(json.dumps(used_resources[args.board_part[0]]))
+    with open('./pom_IP/IP_packager/pom_resource_utilization_parts.json', 'w') as json_file:
+        json_file.write(json.dumps(used_resources))
+
+    if failed_parts:
+        msg.error('Synthesis of PicosOmpSsManager IP failed for part(s) ' + ' '.join(failed_parts))
+
 
-    parse_syntehsis_utilization_report(prj_path + '/synth_project.runs/synth_1/picosompssmanager_0_utilization_synth.rpt',
-                                       './pom_IP/IP_packager/pom_resource_utilization.json', 'PicosOmpSsManager')
+def check_board_parts():
+    msg.info('Checking if your current version of Vivado supports the selected board part(s)')
+    with open('./board_part_check.tcl', 'w') as tcl_file:
+        tcl_file.write('set unsupported {}\n'
+                       'foreach part {' + ' '.join(args.board_part) + '} {\n'
+                       '    if {[llength [get_parts $part]] == 0} {lappend unsupported $part}\n'
+                       '}\n'
+                       'if {[llength $unsupported] > 0} {\n'
+                       '    puts "UNSUPPORTED_PARTS: $unsupported"\n'
+                       '    exit 1\n'
+                       '}\n')
+    p = subprocess.Popen('vivado -nojournal -nolog -mode batch -source ./board_part_check.tcl', shell=True,
+                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    output = p.communicate()[0].decode('utf-8')
+    os.remove('./board_part_check.tcl')
+    if p.returncode == 1:
+        unsupported = [line[len('UNSUPPORTED_PARTS:'):].split() for line in output.splitlines() if line.startswith('UNSUPPORTED_PARTS:')]
+        msg.error('Your current version of Vivado does not support part(s) ' + ' '.join(unsupported[0] if unsupported else args.board_part))
+
+    msg.success('Success')
 
 
 def generate_POM_IP():
@@ -197,56 +426,85 @@ def generate_POM_IP():
                          + os.path.abspath(os.getcwd() + '/pom_IP') + ' '
                          + ('0' if args.no_encrypt else '1') + ' ',
                          cwd=prj_path,
-                         stdout=sys.stdout.subprocess,
-                         stderr=sys.stdout.subprocess, shell=True)
+                         stdout=subprocess.PIPE,
+                         stderr=subprocess.STDOUT, shell=True)
 
-    if args.verbose:
-        for line in iter(p.stdout.readline, b''):
-            sys.stdout.write(line.decode('utf-8'))
+    sys.stdout.log.start_section('packaging', phase='packaging')
+    for line in iter(p.stdout.readline, b''):
+        sys.stdout.writeVerbose(line.decode('utf-8', errors='replace'), 'packaging')
 
     retval = p.wait()
+    sys.stdout.log.close_stream('packaging')
     if retval:
         msg.error('Generation of PicosOmpSsManager IP failed')
     else:
         msg.success('Finished generation of PicosOmpSsManager IP')
 
 
+def write_timing():
+    if args.timing is None:
+        return
+    spans.write(args.timing)
+    if args.board_part is not None:
+        msg.log(format_slowest(spans.slowest('part', exclude=('synthesis',)), 'parts'))
+    msg.log('Timing spans written to {0}.jsonl and {0}.trace.json'.format(args.timing))
+
+
 msg = Messages()
 parser = ArgParser()
 args = parser.parse_args()
 sys.stdout = Logger()
 
+# Timing spans of every phase, written at exit so failed builds are timed too
+spans = SpanRecorder()
+atexit.register(write_timing)
+
 if (not args.skip_synth) and args.board_part is None:
     msg.error('board_part must be specified to synthetize a design')
 
-if shutil.which('vivado'):
-    if not args.skip_board_check and args.board_part is not None:
-        msg.info('Checking if your current version of Vivado supports the selected board part')
-        os.system('echo "if {[llength [get_parts ' + args.board_part + ']] == 0} {exit 1}" > ./board_part_check.tcl')
-        p = subprocess.Popen('vivado -nojournal -nolog -mode batch -source ./board_part_check.tcl', shell=True, stdout=open(os.devnull, 'w'))
-        retval = p.wait()
-        os.system('rm ./board_part_check.tcl')
-        if (int(retval) == 1):
-            msg.error('Your current version of Vivado does not support part ' + args.board_part)
-
-        msg.success('Success')
+if args.board_part is not None:
+    args.board_part = list(dict.fromkeys(args.board_part))
 
-else:
+if not shutil.which('vivado'):
     msg.error('vivado not found. Please set PATH correctly')
 
+cache = None
+cache_key = None
+if not args.no_cache:
+    cache = BuildCache(args.cache_dir, args.cache_max_size, args.cache_max_age)
+    with spans.span('cache_key', 'main'):
+        cache_key = cache.compute_key()
+
 if os.path.exists('./pom_IP'):
     shutil.rmtree('./pom_IP_old', ignore_errors=True)
     os.rename('./pom_IP', './pom_IP_old')
 
+with spans.span('cache_restore', 'main'):
+    restored = cache is not None and cache.restore(cache_key, './pom_IP/IP_packager')
+if restored:
+    msg.success('Restored PicosOmpSsManager IP from cache entry ' + cache_key)
+    sys.exit(0)
+
+if not args.skip_board_check and args.board_part is not None:
+    with spans.span('board_check', 'main'):
+        check_board_parts()
+
 # Generate Vivado project and package IP
 os.makedirs('./pom_IP/Vivado/PicosOmpSsManager')
 os.makedirs('./pom_IP/IP_packager')
 
-generate_POM_IP()
+with spans.span('packaging', 'main'):
+    generate_POM_IP()
 
 if not args.skip_synth:
     if os.path.exists('./pom_IP/Synthesis'):
         shutil.rmtree('./pom_IP/Synthesis')
     os.makedirs('./pom_IP/Synthesis')
 
-    compute_POM_resource_utilization()
+    with spans.span('synthesis_all_parts', 'main'):
+        compute_POM_resource_utilization_all_parts()
+
+if cache is not None:
+    with spans.span('cache_store', 'main'):
+        cache.store(cache_key, './pom_IP/IP_packager')
+    msg.log('Stored PicosOmpSsManager IP in cache entry ' + cache_key)
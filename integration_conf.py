@@ -0,0 +1,256 @@
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+# Random configurations of the hwruntime_tb integration testbench. Every
+# configuration is fully determined by its seed, so a conf seed reproduces
+# the generics, nest_graph.txt, task_types.txt and the repetition seeds.
+
+import hashlib
+import os
+import random
+
+MAX_ACCS = 32
+MAX_CREATORS = 8
+MAX_TASK_TYPE = 4294967295
+MAX_SIM_SEED = 2147483647
+
+
+def long_int_to_hex(bits, num):
+    return '{:X}'.format(num & ((1 << bits) - 1))
+
+
+def hash_sources(root_dir, paths):
+    sha = hashlib.sha256()
+    for path in paths:
+        path = os.path.join(root_dir, path)
+        files = [path] if os.path.isfile(path) else sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+        for file_path in files:
+            sha.update(os.path.relpath(file_path, root_dir).encode('utf-8') + b'\0')
+            with open(file_path, 'rb') as f:
+                sha.update(f.read())
+    return sha.hexdigest()
+
+
+class IntegrationConf:
+    def __init__(self, conf_seed, task_creation, max_commands, naccs, ninstances, ncreators, task_types, nest_graph, repeat_seeds):
+        self.conf_seed = conf_seed
+        self.task_creation = task_creation
+        self.max_commands = max_commands
+        self.naccs = naccs
+        self.ntypes = len(ninstances)
+        self.ninstances = ninstances
+        self.ncreators = ncreators
+        self.task_types = task_types
+        self.nest_graph = nest_graph
+        self.repeat_seeds = repeat_seeds
+
+    def generics(self):
+        sched_count = 0
+        sched_accid = 0
+        sched_ttype = 0
+        accid = 0
+        for i in range(self.ntypes):
+            sched_count |= (self.ninstances[i] - 1) << i * 8
+            sched_accid |= accid << i * 8
+            sched_ttype |= self.task_types[i] << i * 32
+            accid += self.ninstances[i]
+
+        if self.ncreators == 0:
+            num_cmds, max_new_tasks = self.max_commands, 1
+        else:
+            num_cmds, max_new_tasks = 1, self.max_commands
+
+        return [('NUM_ACCS', str(self.naccs)),
+                ('NUM_CMDS', str(num_cmds)),
+                ('MAX_NEW_TASKS', str(max_new_tasks)),
+                ('NUM_CREATORS', str(self.ncreators)),
+                ('NUM_ACC_TYPES', str(self.ntypes)),
+                ('SCHED_COUNT', "{}'h{}".format(self.ntypes * 8, long_int_to_hex(self.ntypes * 8, sched_count))),
+                ('SCHED_ACCID', "{}'h{}".format(self.ntypes * 8, long_int_to_hex(self.ntypes * 8, sched_accid))),
+                ('SCHED_TTYPE', "{}'h{}".format(self.ntypes * 32, long_int_to_hex(self.ntypes * 32, sched_ttype)))]
+
+    def nest_graph_str(self):
+        return ''.join(' '.join(str(v) for v in node) + ' ' for node in self.nest_graph) + '\n'
+
+    def task_types_str(self):
+        return ''.join('{} {}\n'.format(tt, n) for tt, n in zip(self.task_types, self.ninstances))
+
+    def key(self, sources_hash):
+        sha = hashlib.sha256(sources_hash.encode('utf-8'))
+        for name, value in self.generics():
+            sha.update('{}={}\0'.format(name, value).encode('utf-8'))
+        sha.update(self.nest_graph_str().encode('utf-8') + b'\0')
+        sha.update(self.task_types_str().encode('utf-8'))
+        return sha.hexdigest()
+
+    def write_files(self, dst_dir):
+        os.makedirs(dst_dir, exist_ok=True)
+        with open(os.path.join(dst_dir, 'nest_graph.txt'), 'w') as f:
+            f.write(self.nest_graph_str())
+        with open(os.path.join(dst_dir, 'task_types.txt'), 'w') as f:
+            f.write(self.task_types_str())
+
+    def desc(self):
+        return 'naccs {} ntypes {} ncreators {}'.format(self.naccs, self.ntypes, self.ncreators)
+
+
+def generate_conf(conf_seed, task_creation, max_commands, repeats, repeat_seed=0):
+    rng = random.Random(conf_seed)
+
+    ncreators = rng.randint(1, MAX_CREATORS) if task_creation else 0
+    naccs = rng.randint(ncreators + 1, MAX_ACCS)
+    ntypes = rng.randint(ncreators + 1, naccs)
+
+    # Only give the remaining instances among non creator accelerators
+    ninstances = [1] * ntypes
+    for _ in range(naccs - ntypes):
+        ninstances[rng.randint(ncreators, ntypes - 1)] += 1
+
+    # Creators are nested in a random order, a creator can only create tasks
+    # of the types of the creators nested below it so that the graph is acyclic
+    nest_graph = []
+    if ncreators > 0:
+        creator_order = list(range(ncreators))
+        rng.shuffle(creator_order)
+        nest_graph = [[1] * ntypes for _ in range(ncreators)]
+        for i in range(ncreators):
+            nest_graph[i][i] = 0
+            for j in range(i):
+                nest_graph[creator_order[i]][creator_order[j]] = 0
+
+    # Task types must be unique, the scheduler would not tell apart accelerators otherwise
+    task_types = rng.sample(range(MAX_TASK_TYPE), ntypes)
+
+    if repeat_seed == 0:
+        repeat_seeds = [rng.randint(1, MAX_SIM_SEED) for _ in range(repeats)]
+    else:
+        repeat_seeds = [repeat_seed] * repeats
+
+    return IntegrationConf(conf_seed, task_creation, max_commands, naccs, ninstances, ncreators, task_types, nest_graph, repeat_seeds)
+
+
+def conf_to_dict(conf):
+    return {'conf_seed': conf.conf_seed,
+            'task_creation': conf.task_creation,
+            'max_commands': conf.max_commands,
+            'naccs': conf.naccs,
+            'ninstances': conf.ninstances,
+            'ncreators': conf.ncreators,
+            'task_types': conf.task_types,
+            'nest_graph': conf.nest_graph,
+            'repeat_seeds': conf.repeat_seeds}
+
+
+def conf_from_dict(d):
+    return IntegrationConf(d['conf_seed'], d['task_creation'], d['max_commands'], d['naccs'], d['ninstances'],
+                           d['ncreators'], d['task_types'], d['nest_graph'], d['repeat_seeds'])
+
+
+# Reductions of a configuration used to shrink failing tests. Creators are
+# always the first ncreators types with a single instance each, so removing a
+# type also removes its row and column of the nest graph when it is a creator.
+
+def remove_types(conf, types):
+    keep = [i for i in range(conf.ntypes) if i not in types]
+    creators = [i for i in keep if i < conf.ncreators]
+    ninstances = [conf.ninstances[i] for i in keep]
+    nest_graph = [[conf.nest_graph[c][t] for t in keep] for c in creators]
+    return IntegrationConf(conf.conf_seed, 1 if creators else 0, conf.max_commands, sum(ninstances), ninstances,
+                           len(creators), [conf.task_types[i] for i in keep], nest_graph, conf.repeat_seeds)
+
+
+def remove_instances(conf, instances):
+    ninstances = list(conf.ninstances)
+    for t, _ in instances:
+        ninstances[t] -= 1
+    return IntegrationConf(conf.conf_seed, conf.task_creation, conf.max_commands, sum(ninstances), ninstances,
+                           conf.ncreators, conf.task_types, conf.nest_graph, conf.repeat_seeds)
+
+
+def remove_edges(conf, edges):
+    nest_graph = [list(row) for row in conf.nest_graph]
+    for c, t in edges:
+        nest_graph[c][t] = 0
+    return IntegrationConf(conf.conf_seed, conf.task_creation, conf.max_commands, conf.naccs, conf.ninstances,
+                           conf.ncreators, conf.task_types, nest_graph, conf.repeat_seeds)
+
+
+def set_max_commands(conf, max_commands):
+    return IntegrationConf(conf.conf_seed, conf.task_creation, max_commands, conf.naccs, conf.ninstances,
+                           conf.ncreators, conf.task_types, conf.nest_graph, conf.repeat_seeds)
+
+
+def valid_conf(conf):
+    # acc_creator_sim loops forever looking for a type to create when the row
+    # of a creator is empty, removing nodes or edges never creates cycles
+    return conf.ntypes > conf.ncreators and conf.max_commands >= 1 and all(any(row) for row in conf.nest_graph)
+
+
+def shrink_dimensions(conf):
+    # Units that can be removed independently, in the order they are tried
+    return [(remove_types, list(range(conf.ncreators))),
+            (remove_types, list(range(conf.ncreators, conf.ntypes))),
+            (remove_instances, [(t, k) for t in range(conf.ncreators, conf.ntypes) for k in range(1, conf.ninstances[t])]),
+            (remove_edges, [(c, t) for c in range(conf.ncreators) for t in range(conf.ntypes) if conf.nest_graph[c][t]])]
+
+
+def split_chunks(units, n):
+    n = min(n, len(units))
+    size, extra = divmod(len(units), n)
+    chunks = []
+    start = 0
+    for i in range(n):
+        end = start + size + (1 if i < extra else 0)
+        chunks.append(units[start:end])
+        start = end
+    return chunks
+
+
+def shrink_candidates(conf, granularity):
+    # One step of delta debugging: each dimension is split in granularity
+    # chunks and every candidate either keeps a single chunk (subset) or
+    # removes one (complement). Returns a list of (conf, is_subset), smaller
+    # candidates first, and max_commands is shrunk in fractions of granularity
+    subsets = []
+    complements = []
+    for reduce, units in shrink_dimensions(conf):
+        if not units:
+            continue
+        chunks = split_chunks(units, granularity)
+        for i, chunk in enumerate(chunks):
+            if len(chunks) > 1:
+                subsets.append(reduce(conf, [u for j, other in enumerate(chunks) if j != i for u in other]))
+            complements.append(reduce(conf, chunk))
+    if conf.max_commands > 1:
+        subsets.append(set_max_commands(conf, max(1, conf.max_commands // granularity)))
+        # Below granularity commands the complement would remove none
+        if granularity > 2 and conf.max_commands >= granularity:
+            complements.append(set_max_commands(conf, conf.max_commands - conf.max_commands // granularity))
+    return [(c, True) for c in subsets if valid_conf(c)] + [(c, False) for c in complements if valid_conf(c)]
+
+
+def shrink_granularity(conf):
+    # Largest useful granularity, max_commands is not split beyond eighths
+    return max([8] + [len(units) for _, units in shrink_dimensions(conf)])
+
+
+def conf_size(conf):
+    # Simulation cost proxy used to report the reduction
+    return conf.naccs + conf.ncreators + sum(sum(row) for row in conf.nest_graph), conf.max_commands
@@ -0,0 +1,108 @@
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+# Fail-fast monitor of the output of the Vivado runs. Lines are read as soon
+# as they are available, without blocking on partial lines, and classified by
+# a single compiled regex. The callers stop at the first fatal line and kill
+# the whole process tree instead of waiting for Vivado to finish.
+
+import os
+import re
+import selectors
+import signal
+from collections import deque
+
+
+class LineReader:
+    def __init__(self, stream):
+        self.fd = stream.fileno()
+        os.set_blocking(self.fd, False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.fd, selectors.EVENT_READ)
+        self.buf = b''
+        self.lines = deque()
+        self.eof = False
+
+    def readline(self):
+        # Returns the next complete line, or '' at EOF
+        while not self.lines and not self.eof:
+            self.selector.select()
+            try:
+                chunk = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                continue
+            if not chunk:
+                self.eof = True
+                if self.buf:
+                    self.lines.append(self.buf)
+                    self.buf = b''
+                break
+            parts = (self.buf + chunk).split(b'\n')
+            self.buf = parts.pop()
+            self.lines.extend(part + b'\n' for part in parts)
+        if not self.lines:
+            return ''
+        return self.lines.popleft().decode('utf-8', errors='replace')
+
+    def close(self):
+        self.selector.close()
+
+
+class OutputMonitor:
+    def __init__(self, rules, ignore=None):
+        # rules is a list of (kind, regex), a line gets the kind of the first
+        # rule found anywhere in it. ignore maps kinds to a regex of the lines
+        # that must not be reported with that kind (e.g. known warnings)
+        # NOTE: Every rule is a lookahead from the beginning of the line, so the
+        # order of the rules and not the position of the match gives priority
+        self.regex = re.compile('|'.join('(?P<{}>(?=.*?(?:{})))'.format(kind, rx) for kind, rx in rules))
+        self.ignore = {kind: re.compile(rx) for kind, rx in (ignore or {}).items()}
+
+    def match(self, line):
+        m = self.regex.match(line)
+        if m is None:
+            return None
+        kind = m.lastgroup
+        if kind in self.ignore and self.ignore[kind].search(line):
+            return None
+        return kind
+
+
+def kill_process_tree(p):
+    # The process must have been started with start_new_session=True, so that
+    # Vivado, xsim and the shell that launched them share its process group
+    try:
+        os.killpg(p.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def monitor_process(p, on_line):
+    # Feeds every output line of p to on_line until it returns True, then
+    # kills the process tree. Returns the exit code and whether it was killed
+    reader = LineReader(p.stdout)
+    aborted = False
+    for line in iter(reader.readline, ''):
+        if on_line(line):
+            aborted = True
+            kill_process_tree(p)
+            break
+    reader.close()
+    return p.wait(), aborted
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+# Sampler of the AXI-Lite debug registers of the manager (AXILITE_INTF=1, see
+# src/axilite_controller.sv). The register window is mapped from /dev/mem, a
+# UIO device or a regular file that stands in for them, and every register of
+# the block is read at a fixed rate into a preallocated ring buffer. The
+# samples are exported as time series of the accelerator occupancy and the
+# non-empty scheduler queues, to find the accelerators starved of tasks.
+#
+# Register map (32-bit registers, byte offsets):
+#   0x000         copy_in_opt
+#   0x004         copy_out_opt
+#   0x008 0x00C   dbg_acc_avail, low and high 32 bits, 1 when the accelerator is idle
+#   0x010 0x014   dbg_queue_nempty, low and high 32 bits
+#   0x800 + 4*i   commands read from the cmdin queue of accelerator i
+#   0x900 + 4*i   commands written to the cmdout queue of accelerator i
+#   0xA00 + 8*i   dbg_avail_count[i], low and high 32 bits, cycles busy (DBG_AVAIL_COUNT_EN=1)
+# Any other offset answers SLVERR, so only these registers are read.
+
+import argparse
+import mmap
+import operator
+import os
+import signal
+import stat
+import sys
+import time
+from array import array
+
+COPY_IN_OPT_ADDR = 0x000
+COPY_OUT_OPT_ADDR = 0x004
+ACC_AVAIL_ADDR = 0x008
+QUEUE_NEMPTY_ADDR = 0x010
+CMD_IN_N_CMDS_ADDR = 0x800
+CMD_OUT_N_CMDS_ADDR = 0x900
+AVAIL_COUNT_ADDR = 0xA00
+# The manager decodes 14 address bits
+WINDOW_SIZE = 1 << 14
+MAX_ACCS = 64
+# The register window has room for the n_cmds of 64 accelerators and the
+# avail counters of 32
+MAX_AVAIL_COUNT_ACCS = 32
+
+
+class RegisterWindow:
+    # The registers are read through a memoryview of 32-bit words, each
+    # register is a single aligned load, as AXI-Lite requires
+    def __init__(self, path, base=0, uio_map=0):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY | os.O_SYNC)
+        try:
+            page = mmap.PAGESIZE
+            if path.startswith('/dev/uio'):
+                # Map N of a UIO device is selected with an offset of N pages
+                offset, delta = uio_map * page, 0
+            elif stat.S_ISCHR(os.fstat(self.fd).st_mode):
+                offset, delta = base - base % page, base % page
+            else:
+                # Stand-in file: the window starts at base, it must be big enough
+                offset, delta = base - base % page, base % page
+                if os.fstat(self.fd).st_size < base + WINDOW_SIZE:
+                    raise ValueError('{} is smaller than the register window'.format(path))
+            self.mm = mmap.mmap(self.fd, delta + WINDOW_SIZE, mmap.MAP_SHARED, mmap.PROT_READ, offset=offset)
+        except BaseException:
+            os.close(self.fd)
+            raise
+        self.words = memoryview(self.mm)[delta:delta + WINDOW_SIZE].cast('I')
+
+    def read(self, addr):
+        return self.words[addr // 4]
+
+    def close(self):
+        self.words.release()
+        self.mm.close()
+        os.close(self.fd)
+
+
+def create_stand_in(path, base=0):
+    # Zeroed file with the size of the window, to be written by a model or a test
+    with open(path, 'wb') as f:
+        f.truncate(base + WINDOW_SIZE)
+
+
+class SampleLayout:
+    # Word offsets of a sample, in address order
+    def __init__(self, num_accs, avail_count=True):
+        if num_accs < 1 or num_accs > MAX_ACCS:
+            raise ValueError('num_accs must be between 1 and {}'.format(MAX_ACCS))
+        self.num_accs = num_accs
+        self.num_counters = min(num_accs, MAX_AVAIL_COUNT_ACCS) if avail_count else 0
+        high = num_accs > 32
+        self.names = ['copy_in_opt', 'copy_out_opt', 'acc_avail_low'] + (['acc_avail_high'] if high else []) + \
+                     ['queue_nempty_low'] + (['queue_nempty_high'] if high else [])
+        addrs = [COPY_IN_OPT_ADDR, COPY_OUT_OPT_ADDR, ACC_AVAIL_ADDR] + ([ACC_AVAIL_ADDR + 4] if high else []) + \
+                [QUEUE_NEMPTY_ADDR] + ([QUEUE_NEMPTY_ADDR + 4] if high else [])
+        for i in range(num_accs):
+            self.names.append('cmd_in_n_cmds_{}'.format(i))
+            addrs.append(CMD_IN_N_CMDS_ADDR + 4 * i)
+        for i in range(num_accs):
+            self.names.append('cmd_out_n_cmds_{}'.format(i))
+            addrs.append(CMD_OUT_N_CMDS_ADDR + 4 * i)
+        for i in range(self.num_counters):
+            self.names += ['avail_count_low_{}'.format(i), 'avail_count_high_{}'.format(i)]
+            addrs += [AVAIL_COUNT_ADDR + 8 * i, AVAIL_COUNT_ADDR + 8 * i + 4]
+        self.addrs = addrs
+        self.index = {name: idx for idx, name in enumerate(self.names)}
+        self.width = len(addrs)
+
+    def bitmap(self, row, name):
+        value = row[self.index[name + '_low']]
+        if self.num_accs > 32:
+            value |= row[self.index[name + '_high']] << 32
+        return value
+
+    def avail_count(self, row, acc):
+        return row[self.index['avail_count_low_{}'.format(acc)]] | (row[self.index['avail_count_high_{}'.format(acc)]] << 32)
+
+
+class Sampler:
+    def __init__(self, window, layout, capacity):
+        self.window = window
+        self.layout = layout
+        self.capacity = capacity
+        # Preallocated ring buffer, the oldest samples are overwritten when full
+        self.data = array('I', bytes(4 * capacity * layout.width))
+        self.times = array('q', bytes(8 * capacity))
+        self.count = 0
+        self.missed = 0
+        # A single C call gathers the whole block from the mapped registers
+        self.gather = operator.itemgetter(*(addr // 4 for addr in layout.addrs))
+        self.stopped = False
+
+    def sample(self):
+        pos = self.count % self.capacity
+        self.times[pos] = time.perf_counter_ns()
+        row = self.gather(self.window.words)
+        width = self.layout.width
+        self.data[pos * width:(pos + 1) * width] = array('I', row)
+        self.count += 1
+
+    def run(self, rate, duration=None, batch=64):
+        # Samples are taken in batches of back to back deadlines, the stop
+        # conditions are checked between batches. A sample later than a whole
+        # period skips the deadlines it missed, so the rate never drifts
+        period = int(1e9 / rate)
+        start = time.perf_counter_ns()
+        end = None if duration is None else start + int(duration * 1e9)
+        deadline = start
+        while not self.stopped and (end is None or deadline < end):
+            for _ in range(batch):
+                now = time.perf_counter_ns()
+                if deadline - now > 200000:
+                    time.sleep((deadline - now - 100000) / 1e9)
+                while time.perf_counter_ns() < deadline:
+                    pass
+                self.sample()
+                deadline += period
+                now = time.perf_counter_ns()
+                if now - deadline > period:
+                    skipped = (now - deadline) // period
+                    self.missed += skipped
+                    deadline += skipped * period
+
+    def rows(self):
+        # Samples in time order, with their time in seconds since the first one
+        num = min(self.count, self.capacity)
+        first = self.count - num
+        width = self.layout.width
+        t0 = self.times[first % self.capacity] if num else 0
+        for i in range(first, self.count):
+            pos = i % self.capacity
+            yield (self.times[pos] - t0) / 1e9, self.data[pos * width:(pos + 1) * width]
+
+    def export(self, prefix, freq=None, count_width=64):
+        layout = self.layout
+        accs = range(layout.num_accs)
+        header = 'time,' + ','.join('acc{}'.format(i) for i in accs) + '\n'
+        busy = [0] * layout.num_accs
+        nempty = [0] * layout.num_accs
+        starved = [0] * layout.num_accs
+        num = 0
+        with open(prefix + '_occupancy.csv', 'w') as focc, open(prefix + '_queue_nempty.csv', 'w') as fq, \
+                open(prefix + '_registers.csv', 'w') as fregs:
+            focc.write(header)
+            fq.write(header)
+            fregs.write('time,' + ','.join(layout.names) + '\n')
+            for t, row in self.rows():
+                avail = layout.bitmap(row, 'acc_avail')
+                queue = layout.bitmap(row, 'queue_nempty')
+                occ = [(avail >> i & 1) ^ 1 for i in accs]
+                nem = [queue >> i & 1 for i in accs]
+                for i in accs:
+                    busy[i] += occ[i]
+                    nempty[i] += nem[i]
+                    starved[i] += (occ[i] ^ 1) & (nem[i] ^ 1)
+                num += 1
+                focc.write('{:.9f},'.format(t) + ','.join(map(str, occ)) + '\n')
+                fq.write('{:.9f},'.format(t) + ','.join(map(str, nem)) + '\n')
+                fregs.write('{:.9f},'.format(t) + ','.join(map(str, row)) + '\n')
+
+        # The avail counters count the busy cycles exactly, sampling only
+        # estimates it. Their occupancy needs the clock frequency
+        counter_busy = None
+        if freq is not None and layout.num_counters and num > 1:
+            counter_busy = [0.0] * layout.num_counters
+            with open(prefix + '_busy_cycles.csv', 'w') as f:
+                f.write('time,' + ','.join('acc{}'.format(i) for i in range(layout.num_counters)) + '\n')
+                last_t, last = None, None
+                for t, row in self.rows():
+                    counts = [layout.avail_count(row, i) for i in range(layout.num_counters)]
+                    if last is not None:
+                        deltas = [(c - l) % (1 << count_width) for c, l in zip(counts, last)]
+                        f.write('{:.9f},'.format(t) + ','.join(map(str, deltas)) + '\n')
+                        for i, d in enumerate(deltas):
+                            counter_busy[i] += d
+                    else:
+                        first_t = t
+                    last_t, last = t, counts
+                cycles = (last_t - first_t) * freq
+                counter_busy = [b / cycles if cycles else 0.0 for b in counter_busy]
+        return {'samples': num, 'busy': [b / num if num else 0.0 for b in busy],
+                'queue_nempty': [q / num if num else 0.0 for q in nempty],
+                'starved': [s / num if num else 0.0 for s in starved],
+                'counter_busy': counter_busy}
+
+
+class ArgParser:
+    def __init__(self):
+        self.parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter,
+                                              description='Sample the AXI-Lite debug registers of the manager')
+
+        self.parser.add_argument('device', help='/dev/mem, a /dev/uioN device or a stand-in file of the register window')
+        self.parser.add_argument('num_accs', help='number of accelerators of the design', type=int)
+        self.parser.add_argument('--base', help='address of the register window in /dev/mem or offset in the stand-in file (def: 0)', type=lambda x: int(x, 0), default=0)
+        self.parser.add_argument('--uio_map', help='map of the UIO device with the register window (def: 0)', type=int, default=0)
+        self.parser.add_argument('--rate', help='samples per second (def: 10000)', type=float, default=10000.0)
+        self.parser.add_argument('--duration', help='seconds to sample (def: until interrupted)', type=float)
+        self.parser.add_argument('--capacity', help='samples kept in the ring buffer, the oldest are overwritten (def: 1000000)', type=int, default=1000000)
+        self.parser.add_argument('--batch', help='samples taken between checks of the stop conditions (def: 64)', type=int, default=64)
+        self.parser.add_argument('--no_avail_count', help='do not read the avail counters, the design was built without DBG_AVAIL_COUNT_EN', action='store_true', default=False)
+        self.parser.add_argument('--freq', help='clock frequency of the manager in Hz, to turn the avail counters into occupancy', type=float)
+        self.parser.add_argument('--count_width', help='width of the avail counters, DBG_AVAIL_COUNT_W (def: 64)', type=int, default=64)
+        self.parser.add_argument('--create', help='create a zeroed stand-in file of the register window and exit', action='store_true', default=False)
+        self.parser.add_argument('-o', '--output', help='prefix of the csv files of the time series (def: pom_dbg)', type=str, default='pom_dbg')
+
+    def parse_args(self):
+        args = self.parser.parse_args()
+        return args
+
+
+if __name__ == '__main__':
+    args = ArgParser().parse_args()
+    if args.create:
+        create_stand_in(args.device, args.base)
+        sys.exit(0)
+    if args.rate <= 0 or args.capacity < 1 or args.batch < 1:
+        print('rate, capacity and batch must be positive')
+        sys.exit(1)
+
+    try:
+        layout = SampleLayout(args.num_accs, not args.no_avail_count)
+        window = RegisterWindow(args.device, args.base, args.uio_map)
+    except (OSError, ValueError) as e:
+        print('Cannot map the registers of {}: {}'.format(args.device, e))
+        sys.exit(1)
+
+    sampler = Sampler(window, layout, args.capacity)
+
+    def stop(signum, frame):
+        sampler.stopped = True
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    print('Sampling {} registers of {} at {} samples/s'.format(layout.width, args.device, args.rate))
+    sampler.run(args.rate, args.duration, args.batch)
+    window.close()
+
+    summary = sampler.export(args.output, args.freq, args.count_width)
+    kept = min(sampler.count, sampler.capacity)
+    print('{} samples, {} kept, {} missed deadlines'.format(sampler.count, kept, sampler.missed))
+    print('  {:6} {:>8} {:>8} {:>8}{}'.format('acc', 'busy', 'nempty', 'starved', ' {:>8}'.format('counted') if summary['counter_busy'] else ''))
+    for i in range(layout.num_accs):
+        line = '  {:6} {:>8.2%} {:>8.2%} {:>8.2%}'.format('acc{}'.format(i), summary['busy'][i], summary['queue_nempty'][i], summary['starved'][i])
+        if summary['counter_busy'] and i < len(summary['counter_busy']):
+            line += ' {:>8.2%}'.format(summary['counter_busy'][i])
+        print(line)
+    print('Time series written to {}_*.csv'.format(args.output))
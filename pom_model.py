@@ -0,0 +1,723 @@
+#!/usr/bin/env python3
+
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+# Transaction-level, cycle-approximate model of the POM. Every FSM is a server
+# that takes as many cycles per command as states it walks in the RTL, and the
+# queues are modeled in slots (64-bit words) with the same sizes and command
+# layouts as the hardware. Time advances from event to event, not cycle by
+# cycle, at about 15 us per task: one million tasks sent by the host take
+# around 15 s and a million tasks with task creation around 25 s.
+#
+#   host -> cmdin subqueues -> Command_In -> accelerators -> Command_Out -> host
+#   creators -> Scheduler -> intCmdIn subqueues -> Command_In
+#                         -> Scheduler_spawnout -> host -> Spawn_In -> Taskwait
+#   creators -> Lock, creators -> Taskwait
+
+import argparse
+import heapq
+import json
+import random
+import sys
+import time
+from collections import deque
+
+import pom_pkg
+from integration_conf import generate_conf
+
+# Cycles per command, taken from the states of each FSM
+CMDIN_DISPATCH_CYCLES = 7  # IDLE, GET_QUEUE_IDX, ISSUE_CMD_READ, CHECK_CMD_QUEUE, READ_NEXT_CMD, CHECK_NEXT_CMD, UPDATE_QUEUE_NEMPTY
+CMDIN_CLEAR_CYCLES = 7  # IDLE, GET_QUEUE_IDX, ISSUE_CMD_READ, CHECK_CMD_QUEUE, READ_NEXT_CMD, CHECK_NEXT_CMD, CLEAR_HEADER
+CMDIN_POLL_CYCLES = 3  # Average of a skipped accelerator in the round robin (2 if busy, 4 if its queue is empty)
+CMDOUT_CYCLES = 6  # READ_HEADER, READ_TID, READ_PTID, CMD_OUT_WAIT, WRITE_TID, WRITE_HEADER
+CMDOUT_NOTIFY_CYCLES = 6  # READ_HEADER, READ_TID, READ_PTID, NOTIFY_PICOS, NOTIFY_TW_1, NOTIFY_TW_2
+SCHED_HEADER_CYCLES = 4  # READ_HEADER_1, GEN_TASK_ID, HEADER_OTHER_1, HEADER_OTHER_2
+SCHED_ASSIGN_CYCLES = 3  # ASSIGN_ACCID, ASSIGN, CMDIN_CHECK
+SCHED_RECLAIM_CYCLES = 2  # CMDIN_READ, CMDIN_CHECK per reclaimed command
+SCHED_WRITE_CYCLES = 4  # WRITE_1, WRITE_2, WRITE_4, ACCEPT
+SCHED_REJECT_CYCLES = 1
+SPAWNOUT_CYCLES = 5  # CHECK, TASKID, PTASKID, TASKTYPE, HEADER
+SPAWNIN_CYCLES = 7  # START_LOOP_1, START_LOOP_2, READ_HEADER, READ_TID_1, READ_TID_2, NOTIFY_TW_1, NOTIFY_TW_2
+TASKWAIT_CYCLES = 6  # READ_HEADER, READ_PTID, ISSUE_MEM_READ, MEM_READ, RESULT, CHECK
+TASKWAIT_WAKEUP_CYCLES = 1
+LOCK_CYCLES = 3  # READ_HEADER, CHECK_LOCK, SEND_ACK
+UNLOCK_CYCLES = 2  # READ_HEADER, CHECK_LOCK
+
+# Command layouts in slots
+TASK_HEADER_SLOTS = 3  # Header, task id, parent task id
+PERI_TASK_HEADER_SLOTS = 4
+SPAWNOUT_HEADER_SLOTS = 4  # Header, task id, parent task id, task type
+SPAWNIN_SLOTS = 3  # Header, task id, parent task id
+CMDOUT_SLOTS = 2  # Header, task id
+
+
+def exec_task_slots(code, nargs):
+    header = PERI_TASK_HEADER_SLOTS if code == pom_pkg.EXEC_PERI_TASK_CODE else TASK_HEADER_SLOTS
+    return header + 2 * nargs
+
+
+class ModelConf:
+    def __init__(self, ninstances, ncreators=0, nest_graph=None, cmdin_subqueue_len=64, cmdout_subqueue_len=64,
+                 spawnin_queue_len=1024, spawnout_queue_len=1024, copy_words=pom_pkg.COPY_WORDS):
+        self.ninstances = ninstances
+        self.ntypes = len(ninstances)
+        self.naccs = sum(ninstances)
+        self.ncreators = ncreators
+        self.nest_graph = nest_graph if nest_graph is not None else []
+        self.cmdin_subqueue_len = cmdin_subqueue_len
+        self.cmdout_subqueue_len = cmdout_subqueue_len
+        self.spawnin_queue_len = spawnin_queue_len
+        self.spawnout_queue_len = spawnout_queue_len
+        self.copy_words = copy_words
+
+    @staticmethod
+    def from_integration_conf(conf, **kwargs):
+        return ModelConf(conf.ninstances, conf.ncreators, conf.nest_graph, **kwargs)
+
+
+class Workload:
+    def __init__(self, num_tasks, nargs=(1, 4), task_cycles=(50, 200), children=(1, 8),
+                 smp_ratio=0.0, deps_ratio=0.0, lock_ratio=0.0, host_cycles=0, host_smp_cycles=500, retry_cycles=16):
+        self.num_tasks = num_tasks
+        self.nargs = nargs
+        self.task_cycles = task_cycles
+        self.children = children
+        self.smp_ratio = smp_ratio
+        self.deps_ratio = deps_ratio
+        self.lock_ratio = lock_ratio
+        self.host_cycles = host_cycles
+        self.host_smp_cycles = host_smp_cycles
+        self.retry_cycles = retry_cycles
+
+
+class Task:
+    __slots__ = ('acc', 'nargs', 'ncops', 'ndeps', 'slots', 'cycles', 'created', 'parent', 'children', 'pending', 'waiting', 'locked')
+
+    def __init__(self, acc, nargs, cycles, created, parent=None):
+        self.acc = acc
+        self.nargs = nargs
+        self.ncops = 0
+        self.ndeps = 0
+        self.slots = exec_task_slots(pom_pkg.EXEC_TASK_CODE, nargs)
+        self.cycles = cycles
+        self.created = created
+        self.parent = parent
+        self.children = 0
+        self.pending = 0
+        self.waiting = False
+        self.locked = False
+
+
+class Acc:
+    __slots__ = ('idx', 'type_idx', 'creator', 'avail', 'running', 'cmdin', 'cmdin_used', 'intq', 'int_used', 'int_unreclaimed')
+
+    def __init__(self, idx, type_idx, creator):
+        self.idx = idx
+        self.type_idx = type_idx
+        self.creator = creator
+        self.avail = True
+        # Task sent by Command_In and not cleared yet, and whether it came from the internal queue
+        self.running = None
+        self.cmdin = deque()
+        self.cmdin_used = 0
+        self.intq = deque()
+        self.int_used = 0
+        # Slots cleared by Command_In that the Scheduler has not read back yet
+        self.int_unreclaimed = 0
+
+
+class Occupancy:
+    __slots__ = ('level', 'max', 'area', 'last')
+
+    def __init__(self):
+        self.level = 0
+        self.max = 0
+        self.area = 0
+        self.last = 0
+
+    def add(self, now, delta):
+        self.area += self.level * (now - self.last)
+        self.last = now
+        self.level += delta
+        if self.level > self.max:
+            self.max = self.level
+
+    def mean(self, now):
+        return (self.area + self.level * (now - self.last)) / now if now else 0.0
+
+
+class Server:
+    __slots__ = ('busy', 'busy_cycles', 'cmds', 'fifo')
+
+    def __init__(self):
+        self.busy = False
+        self.busy_cycles = 0
+        self.cmds = 0
+        self.fifo = deque()
+
+
+class PomModel:
+    def __init__(self, conf, workload, seed=0):
+        self.conf = conf
+        self.wl = workload
+        self.rng = random.Random(seed)
+        self.random = self.rng.random
+        self.now = 0
+        self.events = []
+        self.seq = 0
+
+        self.accs = []
+        self.type_accs = []
+        for t, n in enumerate(conf.ninstances):
+            self.type_accs.append(list(range(len(self.accs), len(self.accs) + n)))
+            for _ in range(n):
+                self.accs.append(Acc(len(self.accs), t, t < conf.ncreators))
+        self.leaf_types = list(range(conf.ncreators, conf.ntypes))
+        # Scheduler last assigned instance per type
+        self.last_acc = [-1] * conf.ntypes
+
+        self.cmdin = Server()
+        self.cmdin_ptr = 0
+        self.cmdin_idle_since = 0
+        self.cmdout = Server()
+        self.sched = Server()
+        self.spawnin = Server()
+        self.taskwait = Server()
+        self.lock = Server()
+        self.locked = False
+
+        # Accelerators with work for Command_In in the round robin and in the internal queues
+        self.rr_mask = 0
+        self.int_mask = 0
+
+        self.cmdin_occ = Occupancy()
+        self.int_occ = Occupancy()
+        self.cmdout_occ = Occupancy()
+        self.spawnout_occ = Occupancy()
+        self.spawnin_occ = Occupancy()
+        self.cmdout_used = [0] * conf.naccs
+
+        self.host_pending = [0] * conf.naccs
+        self.host_next = {}
+        self.host_tasks = 0
+        self.created_tasks = 0
+        self.smp_tasks = 0
+        self.finished = 0
+        self.rejects = 0
+        self.lock_rejects = 0
+        self.latencies = []
+        self.created_latencies = []
+        self.taskwait_latencies = []
+
+    # ----------------------------------------------------------------------
+    # Event engine
+
+    def at(self, delay, fn, *args):
+        self.seq += 1
+        heapq.heappush(self.events, (self.now + delay, self.seq, fn, args))
+
+    def run(self):
+        self.generate_host_tasks()
+        for acc in self.accs:
+            self.host_write(acc)
+        events = self.events
+        pop = heapq.heappop
+        while events:
+            self.now, _, fn, args = pop(events)
+            fn(*args)
+        return self.report()
+
+    def rand_int(self, bounds):
+        # Cheaper than randint, which matters at millions of draws
+        return bounds[0] + int(self.random() * (bounds[1] - bounds[0] + 1))
+
+    def new_task(self, acc, created, parent=None):
+        return Task(acc, self.rand_int(self.wl.nargs), self.rand_int(self.wl.task_cycles), created, parent)
+
+    # ----------------------------------------------------------------------
+    # Host side: writes commands into the cmdin subqueues and consumes cmdout
+
+    def generate_host_tasks(self):
+        # With task creation the host only sends tasks to the creators, like hwruntime_tb
+        ntargets = sum(self.conf.ninstances[:self.conf.ncreators]) if self.conf.ncreators else self.conf.naccs
+        for i in range(ntargets):
+            self.host_pending[i] = self.wl.num_tasks // ntargets + (i < self.wl.num_tasks % ntargets)
+        self.host_tasks = self.wl.num_tasks
+
+    def host_write(self, acc):
+        if not self.host_pending[acc.idx]:
+            return
+        written = False
+        # The next task is drawn in advance to know whether its command fits
+        task = self.host_next.get(acc.idx) or self.new_task(acc.idx, 0)
+        while acc.cmdin_used + task.slots <= self.conf.cmdin_subqueue_len:
+            self.host_pending[acc.idx] -= 1
+            task.created = self.now + self.wl.host_cycles
+            acc.cmdin_used += task.slots
+            self.cmdin_occ.add(self.now, task.slots)
+            if self.wl.host_cycles:
+                self.at(self.wl.host_cycles, self.host_written, acc, task)
+            else:
+                acc.cmdin.append(task)
+                written = True
+            if not self.host_pending[acc.idx]:
+                task = None
+                break
+            task = self.new_task(acc.idx, 0)
+        self.host_next[acc.idx] = task
+        if written:
+            self.update_cmdin_work(acc)
+            self.cmdin_wakeup()
+
+    def host_written(self, acc, task):
+        acc.cmdin.append(task)
+        self.update_cmdin_work(acc)
+        self.cmdin_wakeup()
+
+    def host_cmdout_read(self, acc_idx):
+        self.cmdout_used[acc_idx] -= CMDOUT_SLOTS
+        self.cmdout_occ.add(self.now, -CMDOUT_SLOTS)
+        if self.cmdout.fifo and not self.cmdout.busy:
+            self.cmdout_next()
+
+    # ----------------------------------------------------------------------
+    # Command_In
+
+    def update_cmdin_work(self, acc):
+        bit = 1 << acc.idx
+        running = acc.running
+        if running is not None:
+            # Waiting for the accelerator to finish, then the header is cleared
+            work = acc.avail
+            from_int = running.parent is not None
+        else:
+            work = acc.avail and (acc.intq or acc.cmdin)
+            from_int = bool(acc.intq)
+        if work and from_int:
+            self.int_mask |= bit
+            self.rr_mask &= ~bit
+        elif work:
+            self.rr_mask |= bit
+            self.int_mask &= ~bit
+        else:
+            self.rr_mask &= ~bit
+            self.int_mask &= ~bit
+
+    def cmdin_wakeup(self):
+        if not self.cmdin.busy and (self.rr_mask or self.int_mask):
+            # Command_In keeps polling while there is no work, so it is anywhere in the round robin
+            self.cmdin_ptr = (self.cmdin_ptr + (self.now - self.cmdin_idle_since) // CMDIN_POLL_CYCLES) % self.conf.naccs
+            self.cmdin_next()
+
+    def cmdin_next(self):
+        naccs = self.conf.naccs
+        poll = 0
+        if self.int_mask:
+            # The internal queues are checked first in index order
+            idx = (self.int_mask & -self.int_mask).bit_length() - 1
+        elif self.rr_mask:
+            ptr = self.cmdin_ptr
+            rot = ((self.rr_mask >> ptr) | (self.rr_mask << (naccs - ptr))) & ((1 << naccs) - 1)
+            dist = (rot & -rot).bit_length() - 1
+            idx = (ptr + dist) % naccs
+            poll = dist * CMDIN_POLL_CYCLES
+            self.cmdin_ptr = (idx + 1) % naccs
+        else:
+            self.cmdin.busy = False
+            self.cmdin_idle_since = self.now
+            return
+
+        acc = self.accs[idx]
+        self.cmdin.busy = True
+        self.cmdin.cmds += 1
+        if acc.running is not None:
+            task = acc.running
+            acc.running = None
+            cycles = poll + CMDIN_CLEAR_CYCLES
+            done = self.cmdin_cleared
+        else:
+            task = acc.intq.popleft() if acc.intq else acc.cmdin.popleft()
+            acc.running = task
+            acc.avail = False
+            # SEND_CMD sends the whole command one word per cycle
+            cycles = poll + CMDIN_DISPATCH_CYCLES + task.slots
+            if task.parent is None:
+                self.latencies.append(self.now + poll - task.created)
+            else:
+                self.created_latencies.append(self.now + poll - task.created)
+            done = self.acc_start
+        self.update_cmdin_work(acc)
+        self.cmdin.busy_cycles += cycles
+        self.at(cycles, self.cmdin_done, done, acc, task)
+
+    def cmdin_done(self, done, acc, task):
+        done(acc, task)
+        self.cmdin_next()
+
+    def cmdin_cleared(self, acc, task):
+        if task.parent is None:
+            acc.cmdin_used -= task.slots
+            self.cmdin_occ.add(self.now, -task.slots)
+            self.host_write(acc)
+        else:
+            acc.int_unreclaimed += task.slots
+        self.update_cmdin_work(acc)
+
+    # ----------------------------------------------------------------------
+    # Accelerators
+
+    def acc_start(self, acc, task):
+        if acc.creator and self.leaf_types:
+            nchildren = self.rand_int(self.wl.children)
+            task.children = nchildren
+            task.pending = nchildren
+            if nchildren > 0:
+                if self.rng.random() < self.wl.lock_ratio:
+                    self.lock_request(task)
+                else:
+                    self.create_child(task)
+                return
+        self.at(task.cycles, self.acc_finish, acc, task)
+
+    def create_child(self, task):
+        if task.children == 0:
+            if task.locked:
+                self.unlock_request(task)
+            # All children have been accepted, now the creator does a taskwait
+            task.waiting = self.now
+            self.taskwait_push(('wait', task))
+            return
+        rng = self.rng
+        smp = rng.random() < self.wl.smp_ratio
+        ttype = rng.choice(self.leaf_types)
+        child = self.new_task(ttype, self.now, task)
+        if smp or rng.random() < self.wl.deps_ratio:
+            child.ndeps = rng.randint(1, 4) if not smp else 0
+            # Tasks with dependencies go out through the spawnout queue too and come back from the host
+            child.acc = -1
+        self.sched_push(child)
+
+    def acc_finish(self, acc, task):
+        self.cmdout_push(acc, task)
+
+    # ----------------------------------------------------------------------
+    # Scheduler and Scheduler_spawnout
+
+    def sched_push(self, task):
+        self.sched.fifo.append(task)
+        if not self.sched.busy:
+            self.sched_next()
+
+    def sched_next(self):
+        if not self.sched.fifo:
+            self.sched.busy = False
+            return
+        task = self.sched.fifo.popleft()
+        self.sched.busy = True
+        self.sched.cmds += 1
+        cycles = SCHED_HEADER_CYCLES
+        body_cycles = 2 * task.nargs + 2 * task.ncops
+        if task.acc == -1:
+            needed = SPAWNOUT_HEADER_SLOTS + task.ndeps + task.nargs + task.ncops * self.conf.copy_words
+            cycles += SPAWNOUT_CYCLES
+            if self.spawnout_occ.level + needed <= self.conf.spawnout_queue_len:
+                cycles += needed + SCHED_WRITE_CYCLES
+                self.spawnout_occ.add(self.now, needed)
+                self.at(cycles, self.spawnout_written, task, needed)
+                accepted = True
+            else:
+                cycles += body_cycles + SCHED_REJECT_CYCLES
+                accepted = False
+        else:
+            ttype = task.acc
+            instances = self.type_accs[ttype]
+            # ASSIGN_SEARCH walks the type table until the task type is found
+            cycles += ttype + 1 + SCHED_ASSIGN_CYCLES
+            self.last_acc[ttype] = (self.last_acc[ttype] + 1) % len(instances)
+            acc = self.accs[instances[self.last_acc[ttype]]]
+            if acc.int_used - acc.int_unreclaimed + task.slots > self.conf.cmdin_subqueue_len:
+                pass
+            elif acc.int_used + task.slots > self.conf.cmdin_subqueue_len:
+                # Read back the commands already cleared by Command_In to know the free slots
+                cycles += SCHED_RECLAIM_CYCLES * max(1, acc.int_unreclaimed // TASK_HEADER_SLOTS)
+                acc.int_used -= acc.int_unreclaimed
+                self.int_occ.add(self.now, -acc.int_unreclaimed)
+                acc.int_unreclaimed = 0
+            if acc.int_used + task.slots <= self.conf.cmdin_subqueue_len:
+                cycles += body_cycles + SCHED_WRITE_CYCLES
+                task.acc = acc.idx
+                acc.int_used += task.slots
+                self.int_occ.add(self.now, task.slots)
+                self.at(cycles, self.sched_written, acc, task)
+                accepted = True
+            else:
+                cycles += body_cycles + SCHED_REJECT_CYCLES
+                task.acc = ttype
+                accepted = False
+        self.sched.busy_cycles += cycles
+        self.at(cycles + 1, self.creator_ack, task, accepted)
+        self.at(cycles, self.sched_next)
+
+    def sched_written(self, acc, task):
+        acc.intq.append(task)
+        self.update_cmdin_work(acc)
+        self.cmdin_wakeup()
+
+    def spawnout_written(self, task, slots):
+        # The host runtime picks the task, runs it and writes the finish into the spawnin queue
+        self.smp_tasks += 1
+        self.at(self.wl.host_smp_cycles, self.host_spawnin_write, task, slots)
+
+    def host_spawnin_write(self, task, slots):
+        self.spawnout_occ.add(self.now, -slots)
+        if self.spawnin_occ.level + SPAWNIN_SLOTS > self.conf.spawnin_queue_len:
+            self.at(self.wl.retry_cycles, self.host_spawnin_write, task, 0)
+            return
+        self.spawnin_occ.add(self.now, SPAWNIN_SLOTS)
+        self.spawnin.fifo.append(task)
+        if not self.spawnin.busy:
+            self.spawnin_next()
+
+    def spawnin_next(self):
+        if not self.spawnin.fifo:
+            self.spawnin.busy = False
+            return
+        task = self.spawnin.fifo.popleft()
+        self.spawnin.busy = True
+        self.spawnin.cmds += 1
+        self.spawnin.busy_cycles += SPAWNIN_CYCLES
+        self.at(SPAWNIN_CYCLES, self.spawnin_done, task)
+
+    def spawnin_done(self, task):
+        self.spawnin_occ.add(self.now, -SPAWNIN_SLOTS)
+        self.finished += 1
+        self.taskwait_push(('finish', task.parent))
+        self.spawnin_next()
+
+    def creator_ack(self, child, accepted):
+        parent = child.parent
+        if accepted:
+            self.created_tasks += 1
+            parent.children -= 1
+            self.create_child(parent)
+        else:
+            self.rejects += 1
+            child.created = self.now + self.wl.retry_cycles
+            self.at(self.wl.retry_cycles, self.sched_push, child)
+
+    # ----------------------------------------------------------------------
+    # Command_Out
+
+    def cmdout_push(self, acc, task):
+        self.cmdout.fifo.append((acc, task))
+        if not self.cmdout.busy:
+            self.cmdout_next()
+
+    def cmdout_next(self):
+        fifo = self.cmdout.fifo
+        if not fifo:
+            self.cmdout.busy = False
+            return
+        acc, task = fifo[0]
+        if task.parent is None:
+            if self.cmdout_used[acc.idx] + CMDOUT_SLOTS > self.conf.cmdout_subqueue_len:
+                # CMD_OUT_WAIT until the host frees a slot
+                self.cmdout.busy = False
+                return
+            cycles = CMDOUT_CYCLES
+            self.cmdout_used[acc.idx] += CMDOUT_SLOTS
+            self.cmdout_occ.add(self.now, CMDOUT_SLOTS)
+            if self.wl.host_cycles:
+                self.at(cycles + self.wl.host_cycles, self.host_cmdout_read, acc.idx)
+        else:
+            cycles = CMDOUT_NOTIFY_CYCLES
+        fifo.popleft()
+        self.cmdout.busy = True
+        self.cmdout.cmds += 1
+        self.cmdout.busy_cycles += cycles
+        self.at(cycles, self.cmdout_done, acc, task)
+
+    def cmdout_done(self, acc, task):
+        self.finished += 1
+        if task.parent is None and not self.wl.host_cycles:
+            self.host_cmdout_read(acc.idx)
+        if task.parent is not None:
+            self.taskwait_push(('finish', task.parent))
+        acc.avail = True
+        self.update_cmdin_work(acc)
+        self.cmdin_wakeup()
+        self.cmdout_next()
+
+    # ----------------------------------------------------------------------
+    # Taskwait and Lock
+
+    def taskwait_push(self, msg):
+        self.taskwait.fifo.append(msg)
+        if not self.taskwait.busy:
+            self.taskwait_next()
+
+    def taskwait_next(self):
+        if not self.taskwait.fifo:
+            self.taskwait.busy = False
+            return
+        kind, task = self.taskwait.fifo.popleft()
+        self.taskwait.busy = True
+        self.taskwait.cmds += 1
+        cycles = TASKWAIT_CYCLES
+        if kind == 'finish':
+            task.pending -= 1
+        if task.pending == 0 and task.waiting is not False:
+            cycles += TASKWAIT_WAKEUP_CYCLES
+            self.at(cycles, self.taskwait_wakeup, task)
+        self.taskwait.busy_cycles += cycles
+        self.at(cycles, self.taskwait_next)
+
+    def taskwait_wakeup(self, task):
+        self.taskwait_latencies.append(self.now - task.waiting)
+        task.waiting = False
+        self.at(task.cycles, self.acc_finish, self.accs[task.acc], task)
+
+    def lock_request(self, task):
+        self.lock.cmds += 1
+        self.lock.busy_cycles += LOCK_CYCLES
+        if self.locked:
+            self.lock_rejects += 1
+            self.at(LOCK_CYCLES + self.wl.retry_cycles, self.lock_request, task)
+        else:
+            self.locked = True
+            task.locked = True
+            self.at(LOCK_CYCLES, self.create_child, task)
+
+    def unlock_request(self, task):
+        self.lock.cmds += 1
+        self.lock.busy_cycles += UNLOCK_CYCLES
+        task.locked = False
+        self.locked = False
+
+    # ----------------------------------------------------------------------
+
+    def report(self):
+        now = max(self.now, 1)
+
+        def latency_stats(values):
+            if not values:
+                return {'mean': 0, 'p50': 0, 'p99': 0, 'max': 0}
+            values.sort()
+            return {'mean': round(sum(values) / len(values), 2),
+                    'p50': values[len(values) // 2],
+                    'p99': values[min(len(values) - 1, len(values) * 99 // 100)],
+                    'max': values[-1]}
+
+        def occupancy(occ, capacity):
+            return {'mean': round(occ.mean(now), 2), 'max': occ.max, 'capacity': capacity}
+
+        naccs = self.conf.naccs
+        return {
+            'cycles': now,
+            'tasks': self.finished,
+            'host_tasks': self.host_tasks,
+            'created_tasks': self.created_tasks,
+            'smp_tasks': self.smp_tasks,
+            'tasks_per_cycle': round(self.finished / now, 6),
+            'sched_rejects': self.rejects,
+            'lock_rejects': self.lock_rejects,
+            'latency': {
+                'host_dispatch': latency_stats(self.latencies),
+                'created_dispatch': latency_stats(self.created_latencies),
+                'taskwait': latency_stats(self.taskwait_latencies),
+            },
+            'occupancy': {
+                'cmdin': occupancy(self.cmdin_occ, self.conf.cmdin_subqueue_len * naccs),
+                'intcmdin': occupancy(self.int_occ, self.conf.cmdin_subqueue_len * naccs),
+                'cmdout': occupancy(self.cmdout_occ, self.conf.cmdout_subqueue_len * naccs),
+                'spawnout': occupancy(self.spawnout_occ, self.conf.spawnout_queue_len),
+                'spawnin': occupancy(self.spawnin_occ, self.conf.spawnin_queue_len),
+            },
+            'utilization': {name: round(server.busy_cycles / now, 4) for name, server in
+                            (('Command_In', self.cmdin), ('Command_Out', self.cmdout), ('Scheduler', self.sched),
+                             ('Spawn_In', self.spawnin), ('Taskwait', self.taskwait), ('Lock', self.lock))},
+        }
+
+
+def print_report(res, elapsed):
+    print('Simulated {} tasks ({} created, {} smp) in {} cycles ({:.2f} s)'.format(res['tasks'], res['created_tasks'], res['smp_tasks'], res['cycles'], elapsed))
+    print('Throughput: {} tasks/cycle'.format(res['tasks_per_cycle']))
+    print('Scheduler rejects: {}, lock rejects: {}'.format(res['sched_rejects'], res['lock_rejects']))
+    print('Latency (cycles)       mean       p50       p99       max')
+    for name, lat in res['latency'].items():
+        print('  {:18} {:>9} {:>9} {:>9} {:>9}'.format(name, lat['mean'], lat['p50'], lat['p99'], lat['max']))
+    print('Occupancy (slots)      mean       max  capacity')
+    for name, occ in res['occupancy'].items():
+        print('  {:18} {:>9} {:>9} {:>9}'.format(name, occ['mean'], occ['max'], occ['capacity']))
+    print('Utilization')
+    for name, util in res['utilization'].items():
+        print('  {:18} {:>8.2f}%'.format(name, util * 100))
+
+
+def int_range(value):
+    values = [int(v) for v in value.split(',')]
+    return (values[0], values[-1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cycle-approximate performance model of the POM')
+    parser.add_argument('-n', '--tasks', help='number of tasks sent by the host (def: 1000000)', type=int, default=1000000)
+    parser.add_argument('--ninstances', help='comma separated number of instances per accelerator type (def: 4,4,4,4)', default='4,4,4,4')
+    parser.add_argument('--ncreators', help='number of creator accelerator types, the first ones in --ninstances (def: 0)', type=int, default=0)
+    parser.add_argument('--conf_seed', help='model the configuration of an integration test seed', type=int)
+    parser.add_argument('--task_creation', help='task creation of the --conf_seed configuration (def: 0)', type=int, choices=[0, 1], default=0)
+    parser.add_argument('--cmdin_subqueue_len', type=int, default=64)
+    parser.add_argument('--cmdout_subqueue_len', type=int, default=64)
+    parser.add_argument('--spawnin_queue_len', type=int, default=1024)
+    parser.add_argument('--spawnout_queue_len', type=int, default=1024)
+    parser.add_argument('--nargs', help='min,max number of arguments per task (def: 1,4)', type=int_range, default=(1, 4))
+    parser.add_argument('--task_cycles', help='min,max execution cycles per task (def: 50,200)', type=int_range, default=(50, 200))
+    parser.add_argument('--children', help='min,max tasks created per creator task (def: 1,8)', type=int_range, default=(1, 8))
+    parser.add_argument('--smp_ratio', help='ratio of created tasks sent to the host (def: 0)', type=float, default=0.0)
+    parser.add_argument('--deps_ratio', help='ratio of created tasks with dependencies (def: 0)', type=float, default=0.0)
+    parser.add_argument('--lock_ratio', help='ratio of creator tasks that take the lock (def: 0)', type=float, default=0.0)
+    parser.add_argument('--host_cycles', help='host latency to write/read a command (def: 0)', type=int, default=0)
+    parser.add_argument('--seed', help='workload seed (def: 0)', type=int, default=0)
+    parser.add_argument('--json', help='write the report in this json file')
+    args = parser.parse_args()
+
+    queues = {'cmdin_subqueue_len': args.cmdin_subqueue_len,
+              'cmdout_subqueue_len': args.cmdout_subqueue_len,
+              'spawnin_queue_len': args.spawnin_queue_len,
+              'spawnout_queue_len': args.spawnout_queue_len}
+    if args.conf_seed is not None:
+        integration_conf = generate_conf(args.conf_seed, args.task_creation, args.tasks, 1)
+        print('Configuration of conf seed {}: {}'.format(args.conf_seed, integration_conf.desc()))
+        conf = ModelConf.from_integration_conf(integration_conf, **queues)
+    else:
+        conf = ModelConf([int(n) for n in args.ninstances.split(',')], args.ncreators, **queues)
+    if conf.ncreators >= conf.ntypes:
+        print('There must be at least one non creator accelerator type')
+        sys.exit(1)
+
+    workload = Workload(args.tasks, args.nargs, args.task_cycles, args.children, args.smp_ratio,
+                        args.deps_ratio, args.lock_ratio, args.host_cycles)
+    start = time.time()
+    res = PomModel(conf, workload, args.seed).run()
+    print_report(res, time.time() - start)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(res, f, indent=4)
@@ -0,0 +1,95 @@
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+# Constants of the OmpSsManager package, read from src/pom_pkg.sv so that the
+# Python tools never duplicate the command encodings by hand. The constants
+# the tools use are listed below, so a renamed localparam fails at import
+
+import os
+import re
+
+from sv_literal import parse_sv_literal
+
+POM_PKG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src', 'pom_pkg.sv')
+
+RE_LOCALPARAM = re.compile(r'^\s*localparam\s+(\w+)\s*=\s*([^;]+);')
+
+
+def parse_localparams(path=POM_PKG_PATH):
+    params = {}
+    with open(path, 'r') as pkg_file:
+        for line in pkg_file:
+            m = RE_LOCALPARAM.match(line)
+            if m:
+                try:
+                    params[m.group(1)] = parse_sv_literal(m.group(2))
+                except ValueError:
+                    # Expressions are not needed by now
+                    pass
+    return params
+
+
+# Every localparam with a literal value, by name
+PARAMS = parse_localparams()
+
+
+def localparam(name):
+    if name not in PARAMS:
+        raise ImportError('localparam {} not found in {}'.format(name, POM_PKG_PATH))
+    return PARAMS[name]
+
+
+ENTRY_VALID_OFFSET = localparam('ENTRY_VALID_OFFSET')
+ENTRY_VALID_BYTE_OFFSET = localparam('ENTRY_VALID_BYTE_OFFSET')
+DESTID_L = localparam('DESTID_L')
+DESTID_H = localparam('DESTID_H')
+COMPF_L = localparam('COMPF_L')
+COMPF_H = localparam('COMPF_H')
+
+CMD_TYPE_L = localparam('CMD_TYPE_L')
+CMD_TYPE_H = localparam('CMD_TYPE_H')
+NUM_ARGS_OFFSET = localparam('NUM_ARGS_OFFSET')
+NUM_DEPS_OFFSET = localparam('NUM_DEPS_OFFSET')
+NUM_COPS_OFFSET = localparam('NUM_COPS_OFFSET')
+
+TASK_SEQ_ID_L = localparam('TASK_SEQ_ID_L')
+TASK_SEQ_ID_H = localparam('TASK_SEQ_ID_H')
+
+EXEC_TASK_CODE = localparam('EXEC_TASK_CODE')
+SETUP_HW_INST_CODE = localparam('SETUP_HW_INST_CODE')
+EXEC_PERI_TASK_CODE = localparam('EXEC_PERI_TASK_CODE')
+
+ARG_FLAG_L = localparam('ARG_FLAG_L')
+ARG_FLAG_H = localparam('ARG_FLAG_H')
+ARG_IDX_L = localparam('ARG_IDX_L')
+ARG_IDX_H = localparam('ARG_IDX_H')
+
+CMD_NEWTASK_ARCHBITS_L = localparam('CMD_NEWTASK_ARCHBITS_L')
+CMD_NEWTASK_ARCHBITS_H = localparam('CMD_NEWTASK_ARCHBITS_H')
+CMD_NEWTASK_TASKTYPE_L = localparam('CMD_NEWTASK_TASKTYPE_L')
+CMD_NEWTASK_TASKTYPE_H = localparam('CMD_NEWTASK_TASKTYPE_H')
+CMD_NEWTASK_INSNUM_L = localparam('CMD_NEWTASK_INSNUM_L')
+CMD_NEWTASK_INSNUM_H = localparam('CMD_NEWTASK_INSNUM_H')
+LOCK_ID_L = localparam('LOCK_ID_L')
+LOCK_ID_H = localparam('LOCK_ID_H')
+
+# IOInterface::COPY_WORDS is defined in picos, a copy is its address and a
+# word with the flags, argument index and size (see test/spawn_sim.sv)
+COPY_WORDS = 2
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+# Vectorized codec of the 64-bit words of the POM queues. The bit layouts are
+# built at import time from the localparams of src/pom_pkg.sv (see pom_pkg.py)
+# and whole buffers are decoded at once with NumPy: byte aligned fields are
+# zero-copy structured views over the words, the rest are shifted and masked.
+# Memory dumps are mapped with np.memmap, so multi-GB files are never copied.
+#
+# Entry layouts (64-bit words, header first):
+#   cmdin     header, tid, ptid, [period/repetitions,] (arg flags, arg) * num_args
+#             setup: header, instrumentation address
+#   cmdout    header, tid
+#   spawnout  header, tid, ptid, task type, deps, (address, copy flags) * num_cops, args
+#   spawnin   header, tid, ptid
+
+import argparse
+import sys
+
+from pom_pkg import (ENTRY_VALID_OFFSET, ENTRY_VALID_BYTE_OFFSET, DESTID_L, DESTID_H, COMPF_L, COMPF_H,
+                     CMD_TYPE_L, CMD_TYPE_H, NUM_ARGS_OFFSET, NUM_DEPS_OFFSET, NUM_COPS_OFFSET,
+                     TASK_SEQ_ID_L, TASK_SEQ_ID_H, EXEC_TASK_CODE, SETUP_HW_INST_CODE, EXEC_PERI_TASK_CODE,
+                     ARG_FLAG_L, ARG_FLAG_H, ARG_IDX_L, ARG_IDX_H,
+                     CMD_NEWTASK_ARCHBITS_L, CMD_NEWTASK_ARCHBITS_H, CMD_NEWTASK_TASKTYPE_L, CMD_NEWTASK_TASKTYPE_H,
+                     CMD_NEWTASK_INSNUM_L, CMD_NEWTASK_INSNUM_H, LOCK_ID_L, LOCK_ID_H, COPY_WORDS)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+VALID_BYTE = 0x80
+CMDOUT_ENTRY_WORDS = 2
+SPAWNIN_ENTRY_WORDS = 3
+SPAWNOUT_HEADER_WORDS = 4
+# Words walked at once by entry_starts, it needs about 17 bytes per word
+CHUNK_WORDS = 1 << 24
+
+
+def bits(lo, hi):
+    return (lo, hi - lo + 1)
+
+
+# Fields of every word format as name: (low bit, width)
+WORD_FORMATS = {
+    'cmdin_header': {'code': bits(CMD_TYPE_L, CMD_TYPE_H),
+                     'num_args': (NUM_ARGS_OFFSET, 8),
+                     'compf': bits(COMPF_L, COMPF_H),
+                     'destid': bits(DESTID_L, DESTID_H),
+                     'valid': (ENTRY_VALID_BYTE_OFFSET, 8)},
+    # The number of slots of SETUP_HW_INST_CODE has no localparam, see cmdin_sim
+    'setup_header': {'code': bits(CMD_TYPE_L, CMD_TYPE_H),
+                     'num_slots': (CMD_TYPE_H + 1, 24),
+                     'valid': (ENTRY_VALID_BYTE_OFFSET, 8)},
+    'period_nrep': {'repetitions': (0, 32),
+                    'period': (32, 32)},
+    'arg_flags': {'flags': bits(ARG_FLAG_L, ARG_FLAG_H),
+                  'arg_idx': bits(ARG_IDX_L, ARG_IDX_H)},
+    'cmdout_header': {'code': bits(CMD_TYPE_L, CMD_TYPE_H),
+                      'valid': (ENTRY_VALID_BYTE_OFFSET, 8)},
+    'spawnout_header': {'num_args': (NUM_ARGS_OFFSET, 8),
+                        'num_deps': (NUM_DEPS_OFFSET, 8),
+                        'num_cops': (NUM_COPS_OFFSET, 8),
+                        'valid': (ENTRY_VALID_BYTE_OFFSET, 8)},
+    # Header of the new task stream of the accelerators
+    'newtask_header': {'num_args': (NUM_ARGS_OFFSET, 8),
+                       'num_deps': (NUM_DEPS_OFFSET, 8),
+                       'num_cops': (NUM_COPS_OFFSET, 8),
+                       'task_seq_id': bits(TASK_SEQ_ID_L, TASK_SEQ_ID_H)},
+    'newtask_type': {'task_type': bits(CMD_NEWTASK_TASKTYPE_L, CMD_NEWTASK_TASKTYPE_H),
+                     'arch': bits(CMD_NEWTASK_ARCHBITS_L, CMD_NEWTASK_ARCHBITS_H),
+                     'insnum': bits(CMD_NEWTASK_INSNUM_L, CMD_NEWTASK_INSNUM_H)},
+    'copy_flags': {'flags': (0, 8),
+                   'arg_idx': (8, 8),
+                   'size': (32, 32)},
+    'lock_cmd': {'code': bits(CMD_TYPE_L, CMD_TYPE_H),
+                 'lock_id': bits(LOCK_ID_L, LOCK_ID_H)},
+    # Bit 62 tells Spawn_In to notify Picos of the task id in the low bits
+    'spawnin_header': {'picos_id': (0, 32),
+                       'picos': (62, 1),
+                       'valid': (ENTRY_VALID_OFFSET, 1)},
+}
+
+HEADER_FORMATS = {'cmdin': 'cmdin_header',
+                  'cmdout': 'cmdout_header',
+                  'spawnout': 'spawnout_header',
+                  'spawnin': 'spawnin_header'}
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError('pom_queue_codec needs numpy, install it with: pip install numpy')
+
+
+class WordFormat:
+    def __init__(self, name, fields):
+        require_numpy()
+        self.name = name
+        self.fields = fields
+        # Byte aligned fields of a power of two size are read through a
+        # structured dtype over the little endian words, without copies
+        aligned = [(field, lo, width) for field, (lo, width) in fields.items()
+                   if lo % 8 == 0 and width in (8, 16, 32, 64) and lo % width == 0]
+        self.aligned = set(field for field, _, _ in aligned)
+        self.dtype = np.dtype({'names': [field for field, _, _ in aligned],
+                               'formats': ['<u{}'.format(width // 8) for _, _, width in aligned],
+                               'offsets': [lo // 8 for _, lo, _ in aligned],
+                               'itemsize': 8})
+
+    def view(self, words):
+        # Zero-copy structured view of the aligned fields
+        return words.view(self.dtype)
+
+    def field(self, words, name):
+        if name in self.aligned:
+            return self.view(words)[name]
+        lo, width = self.fields[name]
+        return (words >> np.uint64(lo)) & np.uint64((1 << width) - 1)
+
+    def decode(self, words):
+        return {name: self.field(words, name) for name in self.fields}
+
+    def encode(self, **values):
+        # Values are scalars or arrays that broadcast together, missing fields are 0
+        words = np.zeros(np.broadcast(*[np.asarray(v) for v in values.values()]).shape if values else (), dtype='<u8')
+        for name, value in values.items():
+            lo, width = self.fields[name]
+            value = np.asarray(value, dtype=np.uint64)
+            if width < 64 and np.any(value >> np.uint64(width)):
+                raise ValueError('{} does not fit in the {} bits of {}.{}'.format(value.max(), width, self.name, name))
+            words |= value << np.uint64(lo)
+        return words
+
+
+FORMATS = {}
+
+
+def word_format(name):
+    if name not in FORMATS:
+        FORMATS[name] = WordFormat(name, WORD_FORMATS[name])
+    return FORMATS[name]
+
+
+def as_words(buffer):
+    # Zero-copy view of a bytes-like object (bytes, bytearray, mmap...) as queue words
+    require_numpy()
+    return np.frombuffer(buffer, dtype='<u8')
+
+
+def load_dump(path, queue_len=None):
+    # Maps a binary dump of a queue memory, optionally as one row per subqueue or snapshot
+    require_numpy()
+    words = np.memmap(path, dtype='<u8', mode='r')
+    if queue_len is not None:
+        words = words[:len(words) // queue_len * queue_len].reshape(-1, queue_len)
+    return words
+
+
+def entry_lengths(queue, headers):
+    # Number of words of the entries of a queue given their header words.
+    # Headers that are not valid or have an unknown command code get length 0
+    header = word_format(HEADER_FORMATS[queue])
+    valid = header.field(headers, 'valid')
+    if queue == 'cmdout':
+        lengths = np.full(headers.shape, CMDOUT_ENTRY_WORDS, dtype=np.int64)
+        valid = valid == VALID_BYTE
+    elif queue == 'spawnin':
+        lengths = np.full(headers.shape, SPAWNIN_ENTRY_WORDS, dtype=np.int64)
+        valid = valid == 1
+    elif queue == 'spawnout':
+        lengths = (SPAWNOUT_HEADER_WORDS + header.field(headers, 'num_args').astype(np.int64)
+                   + header.field(headers, 'num_deps') + header.field(headers, 'num_cops').astype(np.int64) * COPY_WORDS)
+        valid = valid == VALID_BYTE
+    else:
+        code = header.field(headers, 'code').astype(np.int64)
+        num_args = header.field(headers, 'num_args').astype(np.int64)
+        lengths = np.select([code == EXEC_TASK_CODE, code == EXEC_PERI_TASK_CODE, code == SETUP_HW_INST_CODE],
+                            [3 + 2 * num_args, 4 + 2 * num_args, 2], 0)
+        valid = valid == VALID_BYTE
+    return np.where(valid, lengths, 0)
+
+
+def entry_starts(words, queue, start=0, wrap=False):
+    # Indexes of the valid entries that follow each other from start in every
+    # row of words (a subqueue or a snapshot), the first invalid header or an
+    # entry that does not fit in the row ends it. Found by pointer doubling,
+    # O(log n) vector operations instead of a Python loop per entry. Rows are
+    # processed in chunks of CHUNK_WORDS. Returns (row, column) in queue order.
+    # With wrap the rows are circular queues like the ones of the hardware,
+    # entries go on at column 0 and the walk ends when it gets back to start
+    words = np.atleast_2d(words)
+    num_rows, cols = words.shape
+    chunk_rows = max(1, CHUNK_WORDS // cols)
+    rows = []
+    columns = []
+    for first in range(0, num_rows, chunk_rows):
+        chunk = words[first:first + chunk_rows]
+        if wrap:
+            # Rotated so that start is column 0 and the walk is the same
+            chunk = np.roll(chunk, -start, axis=1)
+        chunk = np.ascontiguousarray(chunk).reshape(-1)
+        n = len(chunk)
+        lengths = entry_lengths(queue, chunk)
+        idx = np.arange(n, dtype=np.int64)
+        row_end = (idx // cols + 1) * cols
+        fits = (lengths > 0) & (idx + lengths <= row_end)
+        # The last slot n is the end of every walk
+        jump = np.append(np.where(fits & (idx + lengths < row_end), idx + lengths, n), n)
+        reached = np.zeros(n + 1, dtype=bool)
+        reached[np.arange(0, n, cols) + (0 if wrap else start)] = True
+        while True:
+            new = reached.copy()
+            new[jump[reached]] = True
+            if np.array_equal(new, reached):
+                break
+            reached = new
+            jump = jump[jump]
+        heads = np.flatnonzero(reached[:n] & fits)
+        rows.append(heads // cols + first)
+        columns.append((heads % cols + start) % cols if wrap else heads % cols)
+    return np.concatenate(rows), np.concatenate(columns)
+
+
+def decode_entries(words, queue, start=0, wrap=False):
+    # Structured array with the header fields and position of every entry.
+    # Words of an entry are read modulo the row length, see entry_starts
+    words = np.atleast_2d(words)
+    rows, cols = entry_starts(words, queue, start, wrap)
+    headers = words[rows, cols]
+    fmt = word_format(HEADER_FORMATS[queue])
+    fields = fmt.decode(headers)
+    lengths = entry_lengths(queue, headers)
+    entries = np.zeros(len(headers), dtype=[('row', '<i8'), ('col', '<i8'), ('length', '<i8'), ('tid', '<u8')]
+                       + [(name, '<u8') for name in fmt.fields])
+    entries['row'] = rows
+    entries['col'] = cols
+    entries['length'] = lengths
+    entries['tid'] = words[rows, (cols + 1) % words.shape[1]]
+    for name, value in fields.items():
+        entries[name] = value
+    return entries
+
+
+def decode_spawnout_types(words, entries):
+    # Task type word of the spawnout entries found by decode_entries
+    words = np.atleast_2d(words)
+    return word_format('newtask_type').decode(words[entries['row'], (entries['col'] + 3) % words.shape[1]])
+
+
+def cmdin_args(words, entries):
+    # Flattened (entry, arg_idx, flags, arg) of the EXEC and EXEC_PERI entries
+    words = np.atleast_2d(words)
+    tasks = entries[(entries['code'] == EXEC_TASK_CODE) | (entries['code'] == EXEC_PERI_TASK_CODE)]
+    num_args = tasks['num_args'].astype(np.int64)
+    first = tasks['col'] + np.where(tasks['code'] == EXEC_PERI_TASK_CODE, 4, 3)
+    entry = np.repeat(np.arange(len(tasks)), num_args)
+    k = np.arange(num_args.sum()) - np.repeat(np.cumsum(num_args) - num_args, num_args)
+    rows = tasks['row'][entry]
+    cols = first[entry] + 2 * k
+    flags = word_format('arg_flags').decode(words[rows, cols % words.shape[1]])
+    return {'entry': entry, 'arg_idx': flags['arg_idx'], 'flags': flags['flags'], 'arg': words[rows, (cols + 1) % words.shape[1]]}
+
+
+def encode_cmdin_tasks(tids, args, flags, compf=0, destid=0, ptids=None, queue_len=None):
+    # Builds back to back EXEC_TASK_CODE entries of tasks with the same number
+    # of arguments, args and flags are (tasks, num_args) arrays
+    tids = np.asarray(tids, dtype=np.uint64)
+    args = np.asarray(args, dtype=np.uint64).reshape(len(tids), -1)
+    flags = np.asarray(flags, dtype=np.uint64).reshape(len(tids), -1)
+    num_args = args.shape[1]
+    entry_words = 3 + 2 * num_args
+    entries = np.zeros((len(tids), entry_words), dtype='<u8')
+    entries[:, 0] = word_format('cmdin_header').encode(code=EXEC_TASK_CODE, num_args=num_args, compf=compf,
+                                                        destid=destid, valid=VALID_BYTE)
+    entries[:, 1] = tids
+    entries[:, 2] = 0 if ptids is None else np.asarray(ptids, dtype=np.uint64)
+    entries[:, 3::2] = word_format('arg_flags').encode(flags=flags, arg_idx=np.arange(num_args))
+    entries[:, 4::2] = args
+    words = entries.reshape(-1)
+    if queue_len is not None:
+        words = np.concatenate([words, np.zeros(-len(words) % queue_len, dtype='<u8')])
+    return words
+
+
+class ArgParser:
+    def __init__(self):
+        self.parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter,
+                                              description='Decode a binary dump of a POM queue')
+
+        self.parser.add_argument('queue', help='queue of the dump', choices=sorted(HEADER_FORMATS))
+        self.parser.add_argument('dump', help='little endian binary dump of the queue memory')
+        self.parser.add_argument('--queue_len', help='words of each subqueue or snapshot in the dump (def: the whole dump is one queue)', type=int)
+        self.parser.add_argument('--start', help='word of each subqueue where the first entry is (def: 0)', type=int, default=0)
+        self.parser.add_argument('--wrap', help='entries wrap around the end of each subqueue, like the read pointer of the hardware', action='store_true', default=False)
+        self.parser.add_argument('--csv', help='write every decoded entry in this csv file', type=str)
+
+    def parse_args(self):
+        args = self.parser.parse_args()
+        return args
+
+
+if __name__ == '__main__':
+    args = ArgParser().parse_args()
+    try:
+        require_numpy()
+    except ImportError as e:
+        print(e)
+        sys.exit(1)
+
+    words = load_dump(args.dump, args.queue_len)
+    entries = decode_entries(words, args.queue, args.start, args.wrap)
+    print('{} valid entries in {} words of {} rows'.format(len(entries), words.size, np.atleast_2d(words).shape[0]))
+    if args.queue in ('cmdin', 'cmdout'):
+        codes, counts = np.unique(entries['code'], return_counts=True)
+        for code, count in zip(codes, counts):
+            print('  code {}: {}'.format(code, count))
+    if len(entries):
+        print('  words per entry: mean {:.2f} max {}'.format(entries['length'].mean(), entries['length'].max()))
+    if args.csv is not None:
+        np.savetxt(args.csv, entries, delimiter=',', fmt='%d', header=','.join(entries.dtype.names), comments='')
@@ -0,0 +1,483 @@
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+# Index of the modules, packages, instantiations and package imports of the
+# (System)Verilog sources, so that the transitive sources of a module can be
+# found without Vivado. It is not a full parser: comments are removed and the
+# declarations and instantiations are found with regexes, which is enough for
+# the coding style of this repository. Parameter expressions of the
+# instantiations are evaluated to propagate the generics of a top module down
+# the hierarchy, together with the conditions of the generate blocks around
+# them to know which instances are elaborated with a given configuration.
+
+import os
+import re
+
+from integration_conf import hash_sources
+from sv_literal import parse_sv_literal
+
+SOURCE_EXTS = ('.sv', '.v', '.svh', '.vh')
+
+RE_COMMENT = re.compile(r'//[^\n]*|/\*.*?\*/', re.S)
+RE_MODULE = re.compile(r'\b(?:module|interface)\s+(?:automatic\s+|static\s+)?(\w+)')
+RE_END_MODULE = re.compile(r'\bend(?:module|interface)\b')
+RE_PACKAGE = re.compile(r'\bpackage\s+(\w+)\s*;')
+RE_PACKAGE_REF = re.compile(r'\b(\w+)::')
+RE_INCLUDE = re.compile(r'`include\s+"([^"]+)"')
+# Module name followed by its parameters or by the instance name
+RE_INSTANCE = re.compile(r'\b([A-Za-z_]\w*)\b\s*(?:(#)\s*\(|([A-Za-z_]\w*)\s*(?:\[[^\]]*\]\s*)?\()')
+RE_PARAM_DECL = re.compile(r'\b(parameter|localparam)\b([^;]*);')
+RE_PARAM_TYPE = re.compile(r'^(?:(?:int|integer|logic|bit|reg|signed|unsigned|string|real|longint|type)\b\s*|\[[^\]]*\]\s*)*')
+RE_NAMED_PARAM = re.compile(r'^\.(\w+)\s*\((.*)\)$', re.S)
+RE_BLOCK = re.compile(r'\b(?:(if)\s*\(|(else)\b|(begin)\b|(end)\b)')
+
+KEYWORDS = {'module', 'interface', 'begin', 'end', 'if', 'else', 'for', 'case', 'assign', 'always', 'always_ff',
+            'always_comb', 'initial', 'function', 'task', 'return', 'while', 'repeat', 'generate', 'wire', 'reg',
+            'logic', 'input', 'output', 'inout', 'parameter', 'localparam', 'assert', 'import', 'typedef', 'struct',
+            'enum', 'int', 'bit', 'automatic', 'foreach', 'do', 'unique', 'priority', 'posedge', 'negedge'}
+
+
+def strip_comments(text):
+    return RE_COMMENT.sub(lambda m: '\n' * m.group(0).count('\n'), text)
+
+
+def balanced(text, start):
+    # Returns the index after the parenthesis that closes the one at start
+    depth = 0
+    for idx in range(start, len(text)):
+        if text[idx] in '([{':
+            depth += 1
+        elif text[idx] in ')]}':
+            depth -= 1
+            if depth == 0:
+                return idx + 1
+    raise ValueError('unbalanced parenthesis')
+
+
+def split_top(text, sep=','):
+    # Splits text by sep outside of parenthesis, brackets and braces
+    parts = []
+    depth = 0
+    last = 0
+    for idx, c in enumerate(text):
+        if c in '([{':
+            depth += 1
+        elif c in ')]}':
+            depth -= 1
+        elif c == sep and depth == 0:
+            parts.append(text[last:idx])
+            last = idx + 1
+    parts.append(text[last:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+def parse_param_items(text, local):
+    # Items of a parameter list or declaration, 'parameter' or 'localparam'
+    # applies until the next keyword
+    params = []
+    for item in split_top(text):
+        m = re.match(r'^(parameter|localparam)\b\s*', item)
+        if m is not None:
+            local = m.group(1) == 'localparam'
+            item = item[m.end():]
+        item = RE_PARAM_TYPE.sub('', item)
+        if '=' not in item:
+            continue
+        name, expr = item.split('=', 1)
+        params.append((name.strip(), expr.strip(), local))
+    return params
+
+
+def guarded_regions(body):
+    # Conditions of the if/else blocks with begin/end as [(start, end, cond)].
+    # else branches get the negation of the conditions before them. if blocks
+    # without begin are not tracked, neither are case generate blocks
+    regions = []
+    stack = []
+    pending = None
+    else_of = None
+    last = None
+    pos = 0
+    while True:
+        m = RE_BLOCK.search(body, pos)
+        if m is None:
+            break
+        pos = m.end()
+        if m.group(1):
+            try:
+                close = balanced(body, m.end() - 1)
+            except ValueError:
+                break
+            cond = body[m.end():close - 1].strip()
+            if else_of is not None:
+                pending = ('({}) && ({})'.format(else_of, cond), '({}) && !({})'.format(else_of, cond))
+            else:
+                pending = (cond, '!({})'.format(cond))
+            if re.compile(r'\s*begin\b').match(body, close) is None:
+                pending = None
+            else_of = None
+            pos = close
+        elif m.group(2):
+            else_of = last
+            if else_of is not None and re.compile(r'\s*begin\b').match(body, pos) is not None:
+                pending = (else_of, None)
+                else_of = None
+        elif m.group(3):
+            stack.append((m.start(), pending))
+            pending = None
+            else_of = None
+        elif stack:
+            start, block = stack.pop()
+            last = None
+            if block is not None:
+                regions.append((start, m.start(), block[0]))
+                last = block[1]
+    return regions
+
+
+def guards_hold(guards, env):
+    # Conditions that can not be evaluated are assumed true
+    for cond in guards:
+        try:
+            if not evaluate(cond, env):
+                return False
+        except ValueError:
+            pass
+    return True
+
+
+class ModuleDecl:
+    def __init__(self, name, path, params, instances):
+        self.name = name
+        self.path = path
+        # [(name, expr, is_localparam)] in declaration order
+        self.params = params
+        # [(module, instance, {param: expr}, [generate conditions])], not
+        # every module exists
+        self.instances = instances
+
+
+class SourceFile:
+    def __init__(self, path, text):
+        self.path = path
+        text = strip_comments(text)
+        self.packages = set(RE_PACKAGE.findall(text))
+        self.package_refs = set(RE_PACKAGE_REF.findall(text)) - self.packages
+        self.includes = RE_INCLUDE.findall(text)
+        self.modules = {}
+        for m in RE_MODULE.finditer(text):
+            end = RE_END_MODULE.search(text, m.end())
+            body_end = end.start() if end is not None else len(text)
+            self.modules[m.group(1)] = self.parse_module(m.group(1), text, m.end(), body_end)
+        self.refs = set(inst[0] for decl in self.modules.values() for inst in decl.instances)
+
+    def parse_module(self, name, text, start, end):
+        params = []
+        pos = start
+        m = re.compile(r'\s*#\s*\(').match(text, pos)
+        if m is not None:
+            close = balanced(text, m.end() - 1)
+            params += parse_param_items(text[m.end():close - 1], False)
+            pos = close
+        # The body starts after the port list
+        m = re.compile(r'\s*\(').match(text, pos)
+        if m is not None:
+            pos = balanced(text, m.end() - 1)
+        body = text[pos:end]
+        for m in RE_PARAM_DECL.finditer(body):
+            params += parse_param_items(m.group(2), m.group(1) == 'localparam')
+
+        regions = guarded_regions(body)
+        instances = []
+        for m in RE_INSTANCE.finditer(body):
+            module = m.group(1)
+            if module in KEYWORDS or module == name:
+                continue
+            overrides = {}
+            inst = m.group(3)
+            if m.group(2) is not None:
+                try:
+                    close = balanced(body, m.end() - 1)
+                except ValueError:
+                    continue
+                for item in split_top(body[m.end():close - 1]):
+                    named = RE_NAMED_PARAM.match(item)
+                    if named is not None:
+                        overrides[named.group(1)] = named.group(2).strip()
+                inst_m = re.compile(r'\s*(\w+)\s*(?:\[[^\]]*\]\s*)?\(').match(body, close)
+                if inst_m is None:
+                    continue
+                inst = inst_m.group(1)
+            if inst in KEYWORDS:
+                continue
+            guards = [cond for r_start, r_end, cond in regions if r_start <= m.start() < r_end]
+            instances.append((module, inst, overrides, guards))
+        return ModuleDecl(name, self.path, params, instances)
+
+
+class RtlIndex:
+    def __init__(self, root, dirs):
+        # dirs are relative to root, missing ones (e.g. a submodule that was
+        # not checked out) are skipped
+        self.root = os.path.abspath(root)
+        self.files = {}
+        self.module_file = {}
+        self.package_file = {}
+        for src_dir in dirs:
+            for dirpath, dirnames, filenames in os.walk(os.path.join(self.root, src_dir)):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    if name.endswith(SOURCE_EXTS):
+                        self.add_file(os.path.relpath(os.path.join(dirpath, name), self.root))
+
+    def add_file(self, path):
+        with open(os.path.join(self.root, path), 'r', errors='replace') as f:
+            source = SourceFile(path, f.read())
+        self.files[path] = source
+        for name in source.modules:
+            self.module_file.setdefault(name, path)
+        for name in source.packages:
+            self.package_file.setdefault(name, path)
+
+    def file_deps(self, path):
+        deps = self.file_imports(path)
+        for ref in self.files[path].refs:
+            if ref in self.module_file:
+                deps.add(self.module_file[ref])
+        deps.discard(path)
+        return deps
+
+    def file_imports(self, path):
+        # Packages and includes used by a file
+        source = self.files[path]
+        deps = set()
+        for ref in source.package_refs:
+            if ref in self.package_file:
+                deps.add(self.package_file[ref])
+        for inc in source.includes:
+            for base in (os.path.dirname(path), ''):
+                inc_path = os.path.normpath(os.path.join(base, inc))
+                if inc_path in self.files:
+                    deps.add(inc_path)
+                    break
+        deps.discard(path)
+        return deps
+
+    def transitive_files(self, paths, deps=None):
+        deps = deps if deps is not None else self.file_deps
+        seen = set()
+        pending = list(paths)
+        while pending:
+            path = pending.pop()
+            if path in seen:
+                continue
+            seen.add(path)
+            pending.extend(deps(path) - seen)
+        return seen
+
+    def module_sources(self, module):
+        # Sources of a module and of everything it instantiates or imports,
+        # packages first so that they can be read in this order
+        files = self.transitive_files([self.module_file[module]])
+        packages = sorted(path for path in files if self.files[path].packages)
+        return packages + sorted(files - set(packages))
+
+    def missing_packages(self, paths):
+        return sorted(set(ref for path in paths for ref in self.files[path].package_refs) - set(self.package_file))
+
+    def hash_files(self, paths):
+        return hash_sources(self.root, sorted(paths))
+
+    def module_params(self, module, overrides):
+        # Values of the parameters of a module, the ones that can not be
+        # evaluated are left out (and so is everything that depends on them)
+        env = {}
+        for name, expr, local in self.files[self.module_file[module]].modules[module].params:
+            if not local and name in overrides:
+                env[name] = overrides[name]
+                continue
+            try:
+                env[name] = evaluate(expr, env)
+            except ValueError:
+                pass
+        return env
+
+    def instance_generics(self, top, overrides):
+        # Explicit generics of every module instantiated below top, evaluated
+        # with the generics of its parent. Modules instantiated more than once
+        # get the generics of the first elaborated instance found
+        generics = {top: dict(overrides)}
+        pending = [top]
+        while pending:
+            module = pending.pop(0)
+            env = self.module_params(module, generics[module])
+            decl = self.files[self.module_file[module]].modules[module]
+            for child, _, params, guards in decl.instances:
+                if child not in self.module_file or child in generics or not guards_hold(guards, env):
+                    continue
+                generics[child] = evaluate_params(params, env)
+                pending.append(child)
+        return generics
+
+    def elaborated_files(self, top, overrides):
+        # Sources of the modules elaborated below top with the given generics,
+        # plus their packages and includes. Instances in generate blocks whose
+        # condition is false are left out, every instance is followed with its
+        # own generics
+        modules = set()
+        seen = set()
+        pending = [(top, dict(overrides))]
+        while pending:
+            module, generics = pending.pop()
+            key = (module, tuple(sorted((name, str(value)) for name, value in generics.items())))
+            if key in seen:
+                continue
+            seen.add(key)
+            modules.add(self.module_file[module])
+            env = self.module_params(module, generics)
+            decl = self.files[self.module_file[module]].modules[module]
+            for child, _, params, guards in decl.instances:
+                if child in self.module_file and guards_hold(guards, env):
+                    pending.append((child, evaluate_params(params, env)))
+        return self.transitive_files(modules, self.file_imports)
+
+
+# Evaluation of constant expressions of parameters
+
+def evaluate_params(params, env):
+    # Parameters that can not be evaluated are left out
+    values = {}
+    for name, expr in params.items():
+        try:
+            values[name] = evaluate(expr, env)
+        except ValueError:
+            pass
+    return values
+
+
+RE_TOKEN = re.compile(r"\s*(?:(?P<num>\d*\s*'[sS]?[bBoOdDhH]\s*[0-9a-fA-F_xXzZ?]+|\d[\d_]*)|(?P<str>\"[^\"]*\")|"
+                      r"(?P<id>\$?[A-Za-z_]\w*)|(?P<op><<|>>|<=|>=|==|!=|&&|\|\||\*\*|[-+*/%<>!~&|^?:()]))")
+
+BINARY_OPS = [('||',), ('&&',), ('|',), ('^',), ('&',), ('==', '!='), ('<', '<=', '>', '>='), ('<<', '>>'),
+              ('+', '-'), ('*', '/', '%'), ('**',)]
+
+
+def clog2(value):
+    return 0 if value <= 1 else (value - 1).bit_length()
+
+
+def tokenize(expr):
+    tokens = []
+    pos = 0
+    expr = expr.strip()
+    while pos < len(expr):
+        m = RE_TOKEN.match(expr, pos)
+        if m is None or m.end() == pos:
+            raise ValueError('cannot evaluate ' + expr)
+        tokens.append((m.lastgroup, m.group(m.lastgroup)))
+        pos = m.end()
+    return tokens
+
+
+def evaluate(expr, env):
+    tokens = tokenize(expr)
+    pos = 0
+
+    def peek():
+        return tokens[pos][1] if pos < len(tokens) else None
+
+    def take(value=None):
+        nonlocal pos
+        if pos >= len(tokens) or (value is not None and tokens[pos][1] != value):
+            raise ValueError('cannot evaluate ' + expr)
+        pos += 1
+        return tokens[pos - 1]
+
+    def ternary():
+        cond = binary(0)
+        if peek() == '?':
+            take('?')
+            a = ternary()
+            take(':')
+            b = ternary()
+            return a if cond else b
+        return cond
+
+    def binary(level):
+        if level == len(BINARY_OPS):
+            return unary()
+        value = binary(level + 1)
+        while peek() in BINARY_OPS[level]:
+            op = take()[1]
+            rhs = binary(level + 1)
+            value = apply(op, value, rhs)
+        return value
+
+    def unary():
+        if peek() in ('-', '+', '!', '~'):
+            op = take()[1]
+            value = unary()
+            return {'-': -value, '+': value, '!': int(not value), '~': ~value}[op]
+        return primary()
+
+    def primary():
+        kind, value = take()
+        if kind == 'num':
+            return parse_sv_literal(value)
+        if kind == 'str':
+            return value
+        if kind == 'id' and value == '$clog2':
+            take('(')
+            arg = ternary()
+            take(')')
+            return clog2(arg)
+        if kind == 'id':
+            if value not in env:
+                raise ValueError('unknown parameter ' + value)
+            return env[value]
+        if value == '(':
+            inner = ternary()
+            take(')')
+            return inner
+        raise ValueError('cannot evaluate ' + expr)
+
+    def apply(op, a, b):
+        if op == '/':
+            if b == 0:
+                raise ValueError('division by zero in ' + expr)
+            return a // b
+        if op == '%':
+            if b == 0:
+                raise ValueError('division by zero in ' + expr)
+            return a % b
+        return {'||': lambda: int(bool(a) or bool(b)), '&&': lambda: int(bool(a) and bool(b)),
+                '|': lambda: a | b, '^': lambda: a ^ b, '&': lambda: a & b,
+                '==': lambda: int(a == b), '!=': lambda: int(a != b), '<': lambda: int(a < b),
+                '<=': lambda: int(a <= b), '>': lambda: int(a > b), '>=': lambda: int(a >= b),
+                '<<': lambda: a << b, '>>': lambda: a >> b, '+': lambda: a + b, '-': lambda: a - b,
+                '*': lambda: a * b, '**': lambda: a ** b}[op]()
+
+    try:
+        value = ternary()
+    except (TypeError, KeyError, IndexError):
+        raise ValueError('cannot evaluate ' + expr)
+    if pos != len(tokens):
+        raise ValueError('cannot evaluate ' + expr)
+    return value
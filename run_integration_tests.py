@@ -21,29 +21,71 @@
 # ------------------------------------------------------------------------- #
 
 import argparse
+import atexit
+import json
 import os
 import re
 import shutil
 import subprocess
 import sys
+import random
+import threading
+import time
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+from conf_planner import plan_shapes, shaped_conf, shape_str, parse_shape, load_coverage, save_coverage, num_tuples
+from elab_cache import ElabCache
+from integration_conf import generate_conf, hash_sources, conf_to_dict, conf_from_dict, shrink_candidates, shrink_granularity, conf_size
+from output_monitor import OutputMonitor, monitor_process
+from run_log import RunLog
+from test_selection import TestSelector, changed_files, watch_changes
+from timing_spans import SpanRecorder, StreamPhases, format_slowest
+from trace_replay import Trace
+from vivado_session import VivadoSessionPool, tcl_quote
+
+# Bump the format version whenever the benchmark set or the metrics change,
+# results of different versions can not be compared
+BENCHMARK_FORMAT_VERSION = 1
+BENCHMARK_SEED = 1183
+BENCHMARK_REPEATS = 2
+BENCHMARK_SUITES = [(0, 4, 1000), (1, 4, 1000)]  # task creation, configurations, max commands
+
+OUTPUT_MONITOR = OutputMonitor([('conf', r'^\[RUN TEST\]: TCL Seed '),
+                                ('desc', r'^\[RUN TEST\]: naccs '),
+                                ('iteration', r'^\[RUN TEST\]: iteration '),
+                                ('seed', r'^\[RUN TEST\]: Seed: '),
+                                ('bench', r'^\[BENCH\] '),
+                                ('timing', r'^\[TIMING\]: '),
+                                ('fatal', r'Fatal:'),
+                                # Vivado and xsim errors, e.g. a snapshot that can not be loaded
+                                ('error', r'^ERROR:'),
+                                ('warning', r'WARNING:')],
+                               # timescale warning code, module 'glbl' does not have a parameter named
+                               ignore={'warning': r'XSIM 43-4100|VRFC 10-3532'})
+
+# Parts of the xsim fatal message that change with the configuration, the rest
+# (message, file and line of the check) tells apart failures while shrinking
+RE_FATAL_VOLATILE = re.compile(r'(Time|Iteration): \d+( [munpf]?s)?')
 
 
 class Logger(object):
     def __init__(self):
         self.terminal = sys.stdout
-        self.log = open('run_tests.log', 'w+')
-        self.re_color = re.compile(r'\033\[[0,1][0-9,;]*m')
+        # Compressed and indexed, see run_log.py
+        self.log = RunLog('run_tests.log.gz')
+        self.lock = threading.Lock()
 
     def write(self, message):
-        self.terminal.write(message)
-        self.log.write(self.re_color.sub('', message))
-        self.log.flush()
-
-    def writeVerbose(self, message):
-        if args.verbose:
+        with self.lock:
             self.terminal.write(message)
-        self.log.write(self.re_color.sub('', message))
-        self.log.flush()
+            self.log.write(message)
+
+    def writeVerbose(self, message, stream=None):
+        with self.lock:
+            if args.verbose:
+                self.terminal.write(message)
+            self.log.write(message, stream)
 
     def flush(self):
         pass
@@ -58,7 +100,7 @@ class Color:
 
 class Messages:
     def error(self, msg):
-        print(Color.RED + msg + '. Check run_tests.log for more information' + Color.END)
+        print(Color.RED + msg + '. Check run_tests.log.gz for more information' + Color.END)
         sys.exit(1)
 
     def info(self, msg):
@@ -83,48 +125,455 @@ class ArgParser:
         self.parser.add_argument('--conf_seed', help='Configuration seed used to reproduce a test', type=int, default=0)
         self.parser.add_argument('--repeat_seed', help='Repetition seed used to reproduce a test', type=int, default=0)
         self.parser.add_argument('--task_creation', help='Use task creation for the test that is going to be reproduced', type=int)
+        self.parser.add_argument('--shape', help='Configuration shape of the planned test that is going to be reproduced', type=str)
+        self.parser.add_argument('--seed', help='seed of the whole test campaign, it determines every configuration seed (def: random)', type=int)
+        self.parser.add_argument('--elab_cache', help='directory of the cache of elaborated snapshots (def: test_projects/elab_cache)', type=str)
+        self.parser.add_argument('--elab_cache_max_size', help='maximum size of the cache of elaborated snapshots in MB (def: 20480)', type=int, default=20480)
+        self.parser.add_argument('--elab_cache_max_age', help='maximum age of the unused elaborated snapshots in days (def: 30)', type=int, default=30)
+        self.parser.add_argument('--sim_jobs', help='number of simulations of the same configuration run concurrently in each shard (def: number of CPUs / jobs)', type=int)
+        self.parser.add_argument('--server', help='run the shards in persistent Vivado Tcl sessions, one per job', action='store_true', default=False)
+        self.parser.add_argument('-j', '--jobs', help='number of shards run concurrently, each one in its own project directory', type=int, default=1)
+        self.parser.add_argument('--keep_going', help='keep simulating the remaining configurations of a shard after a fatal error', action='store_true', default=False)
+        self.parser.add_argument('--benchmark', help='run the fixed benchmark configurations and write their throughput and latencies in this json file (def: benchmark.json)', nargs='?', const='benchmark.json', type=str)
+        self.parser.add_argument('--baseline', help='benchmark json file to compare with, throughput regressions fail the test', type=str)
+        self.parser.add_argument('--tolerance', help='relative throughput drop over the baseline considered a regression (def: 0.05)', type=float, default=0.05)
+        self.parser.add_argument('--conf_file', help='json configuration written by --shrink used to reproduce a test', type=str)
+        self.parser.add_argument('--random_confs', help='run the legacy campaign of random configurations instead of the covering array plan', action='store_true', default=False)
+        self.parser.add_argument('--t_way', help='strength of the covering array of configuration shapes (def: 2, pairwise)', type=int, default=2)
+        self.parser.add_argument('--max_confs', help='maximum number of planned configurations, the least covered combinations go first (def: all needed)', type=int)
+        self.parser.add_argument('--repeats', help='repetitions of each planned configuration (def: 5)', type=int, default=5)
+        self.parser.add_argument('--coverage', help='json file with the shape combinations covered by previous runs (def: test_projects/conf_coverage.json)', type=str)
+        self.parser.add_argument('--trace', help='json lines workload trace replayed instead of random commands, see trace_replay.py', type=str)
+        self.parser.add_argument('--changed_since', help='run only the configurations of the campaign whose sources changed since this git revision', type=str)
+        self.parser.add_argument('--watch', help='run a campaign with the configurations affected by every change of the sources until interrupted', action='store_true', default=False)
+        self.parser.add_argument('--timing', help='write the timing spans of every phase in this json lines file prefix, plus a Chrome trace (def: run_tests_timing)', nargs='?', const='run_tests_timing', type=str)
+        self.parser.add_argument('--shrink', help='search the smallest configuration that still fails like the reproduced one and write it in this json file (def: shrunk_conf.json)', nargs='?', const='shrunk_conf.json', type=str)
 
     def parse_args(self):
         args = self.parser.parse_args()
         return args
 
 
-def exec_integration_test(num_confs, repeats, task_creation, max_commands, reproduce_conf_seed, reproduce_repeat_seed):
-    err = False
-    warn = False
+def latency_stats(values):
+    if not values:
+        return None
+    values = sorted(values)
+    return {'mean': round(sum(values) / len(values), 2),
+            'p50': values[len(values) // 2],
+            'p99': values[min(len(values) - 1, len(values) * 99 // 100)],
+            'max': values[-1]}
+
+
+# Events printed by hwruntime_tb with +benchmark, all of them in clock cycles:
+#   [BENCH] start <cycle>                  reset released
+#   [BENCH] create <cycle> <idx> <acc>     acc_creator_sim creates a new task
+#   [BENCH] dispatch <cycle> host|new <idx> <acc>  Command_In sends a task header
+#   [BENCH] taskwait <cycle> <acc>         a creator sends a taskwait
+#   [BENCH] wakeup <cycle> <acc>           the taskwait is answered
+#   [BENCH] end <cycle> <finished>
+class BenchRun:
+    def __init__(self):
+        self.start = 0
+        self.end = 0
+        self.finished = 0
+        self.dispatches = []
+        self.created = {}
+        self.dispatch_latencies = []
+        self.taskwaits = {}
+        self.taskwait_latencies = []
+
+    def parse_event(self, fields):
+        event, cycle = fields[0], int(fields[1])
+        if event == 'dispatch':
+            self.dispatches.append(cycle)
+            if fields[2] == 'new' and fields[3] in self.created:
+                self.dispatch_latencies.append(cycle - self.created.pop(fields[3]))
+        elif event == 'create':
+            self.created.setdefault(fields[2], cycle)
+        elif event == 'taskwait':
+            self.taskwaits[fields[2]] = cycle
+        elif event == 'wakeup' and fields[2] in self.taskwaits:
+            self.taskwait_latencies.append(cycle - self.taskwaits.pop(fields[2]))
+        elif event == 'start':
+            self.start = cycle
+        elif event == 'end':
+            self.end = cycle
+            self.finished = int(fields[2])
+
+    def tasks_per_cycle(self):
+        # Sustained rate between the first and the last task sent by Command_In
+        if len(self.dispatches) < 2 or self.dispatches[-1] == self.dispatches[0]:
+            return 0.0
+        return (len(self.dispatches) - 1) / (self.dispatches[-1] - self.dispatches[0])
+
+
+class ConfResult:
+    def __init__(self, conf_seed):
+        self.conf_seed = conf_seed
+        self.desc = ''
+        self.repeat_seeds = []
+        self.failed_seeds = []
+        self.warn = False
+        self.bench = {}
+
+    def bench_summary(self, task_creation):
+        runs = list(self.bench.values())
+        return {'conf_seed': self.conf_seed,
+                'task_creation': task_creation,
+                'desc': self.desc,
+                'repeat_seeds': list(self.bench.keys()),
+                'tasks': sum(len(run.dispatches) for run in runs),
+                'cycles': sum(run.end - run.start for run in runs),
+                'tasks_per_cycle': round(sum(run.tasks_per_cycle() for run in runs) / len(runs), 6),
+                'dispatch_latency': latency_stats([lat for run in runs for lat in run.dispatch_latencies]),
+                'taskwait_latency': latency_stats([lat for run in runs for lat in run.taskwait_latencies])}
+
+
+def fatal_signature(line):
+    return RE_FATAL_VOLATILE.sub('', line).strip()
+
+
+def repro_command(conf_seed, repeat_seed, task_creation):
+    # Configurations read from a file can not be regenerated from their seed
+    if args.trace is not None:
+        cmd = 'python3 run_integration_tests.py --trace {}'.format(args.trace)
+    elif args.conf_file is not None:
+        cmd = 'python3 run_integration_tests.py --conf_file {}'.format(args.conf_file)
+    else:
+        cmd = 'python3 run_integration_tests.py --conf_seed {} --task_creation {}'.format(conf_seed, task_creation)
+        if conf_seed in conf_shapes:
+            cmd += ' --shape ' + conf_shapes[conf_seed]
+    if repeat_seed:
+        cmd += ' --repeat_seed {}'.format(repeat_seed)
+    return cmd
+
+
+class ShardResult:
+    def __init__(self, name, task_creation, num_confs, stream):
+        self.name = name
+        # Log stream of the shard, its output is split in sections by conf and iteration
+        self.stream = stream
+        self.task_creation = task_creation
+        self.num_confs = num_confs
+        self.confs = []
+        self.retval = 0
+        self.err = False
+        self.warn = False
+        self.aborted = False
+        # First fatal line and command that reproduces it
+        self.fatal = None
+        self.repro = None
+        self.phases = StreamPhases(spans, name, rules=None, shard=name)
+
+    def parse_line(self, line):
+        # Returns True when the shard must be stopped
+        kind = OUTPUT_MONITOR.match(line)
+        if kind == 'conf':
+            self.confs.append(ConfResult(int(line.split()[-1])))
+            self.phases.args = {'shard': self.name, 'conf_seed': self.confs[-1].conf_seed, 'task_creation': self.task_creation}
+            sys.stdout.log.start_section(self.stream, shard=self.name, conf_seed=self.confs[-1].conf_seed, task_creation=self.task_creation)
+        elif kind == 'desc' and self.confs:
+            self.confs[-1].desc = line[len('[RUN TEST]: '):].strip()
+            self.phases.update(desc=self.confs[-1].desc)
+        elif kind == 'iteration' and self.confs:
+            sys.stdout.log.start_section(self.stream, shard=self.name, conf_seed=self.confs[-1].conf_seed,
+                                         task_creation=self.task_creation, iteration=int(line.split()[-1]))
+        elif kind == 'seed' and self.confs:
+            self.confs[-1].repeat_seeds.append(int(line.split()[-1]))
+            self.phases.update(repeat_seed=self.confs[-1].repeat_seeds[-1])
+            sys.stdout.log.update_section(self.stream, repeat_seed=self.confs[-1].repeat_seeds[-1])
+        elif kind == 'timing':
+            self.phases.feed(line)
+        elif kind == 'bench' and self.confs and self.confs[-1].repeat_seeds:
+            conf = self.confs[-1]
+            conf.bench.setdefault(conf.repeat_seeds[-1], BenchRun()).parse_event(line.split()[1:])
+        elif kind == 'fatal' or kind == 'error':
+            self.err = True
+            if self.fatal is None:
+                self.fatal = line.strip()
+            if self.confs:
+                conf = self.confs[-1]
+                repeat_seed = conf.repeat_seeds[-1] if conf.repeat_seeds else 0
+                if conf.repeat_seeds and repeat_seed not in conf.failed_seeds:
+                    conf.failed_seeds.append(repeat_seed)
+                if self.repro is None:
+                    self.repro = repro_command(conf.conf_seed, repeat_seed, self.task_creation)
+            return not args.keep_going
+        elif kind == 'warning':
+            self.warn = True
+            if self.confs:
+                self.confs[-1].warn = True
+        return False
+
+    def failed(self):
+        return self.retval != 0 or self.err
+
+
+def exec_integration_test(confs, task_creation, shard_prj_path, shard_idx=0, num_shards=1, plusargs=(), report_fatal=True):
+    name = 'shard {}/{} ({})'.format(shard_idx, num_shards, 'task creation' if task_creation else 'no task creation')
+    result = ShardResult(name, task_creation, len(confs), shard_prj_path)
+    if not os.path.exists(shard_prj_path):
+        os.makedirs(shard_prj_path)
+    prefix = '[{}] '.format(name) if num_shards > 1 else ''
+    sys.stdout.log.start_section(shard_prj_path, shard=name, task_creation=task_creation)
+
+    confs_file = shard_prj_path + '/confs.txt'
+    with open(confs_file, 'w') as f:
+        for conf in confs:
+            entry_dir = elab_cache.entry(conf.key(sources_hash))
+            conf.write_files(entry_dir)
+            f.write('conf_seed {} desc {} generics {{{}}} repeat_seeds {{{}}} entry_dir {} plusargs {{{}}}\n'.format(
+                conf.conf_seed, tcl_quote(conf.desc()),
+                ' '.join(tcl_quote(name + '=' + value) for name, value in conf.generics()),
+                ' '.join(str(seed) for seed in conf.repeat_seeds), tcl_quote(entry_dir),
+                ' '.join(plusargs)))
+
+    def check_line(line):
+        stop = result.parse_line(line)
+        sys.stdout.writeVerbose(prefix + line, shard_prj_path)
+        if stop:
+            result.aborted = True
+            if report_fatal:
+                msg.warning('{}Fatal error, stopping the shard. Reproduce it with: {}'.format(prefix, result.repro or 'the same arguments'))
+        return stop
+
+    tclargs = [os.path.abspath(os.getcwd()), confs_file, shard_prj_path, args.sim_jobs]
+    with spans.span('shard', name, shard=name, confs=len(confs)):
+        if session_pool is not None:
+            with session_pool.session() as session:
+                result.retval = session.run_script(os.getcwd() + '/scripts/run_integration_test.tcl', tclargs, shard_prj_path, check_line)
+        else:
+            p = subprocess.Popen('vivado -nojournal -nolog -notrace -mode batch -source '
+                                 + os.getcwd() + '/scripts/run_integration_test.tcl -tclargs '
+                                 + ' '.join(str(a) for a in tclargs),
+                                 cwd=shard_prj_path,
+                                 stdout=subprocess.PIPE,
+                                 stderr=subprocess.STDOUT, shell=True, start_new_session=True)
+
+            result.retval, _ = monitor_process(p, check_line)
+    sys.stdout.log.close_stream(shard_prj_path)
+
+    return result
+
+
+def run_suite(pool, rng, num_confs, repeats, task_creation, max_commands, plusargs=()):
     msg.info('Running integration test with {} configurations, {} repetitions, {}, {} max commands'.format(num_confs, repeats, 'task creation' if task_creation else 'no task creation', max_commands))
-    p = subprocess.Popen('vivado -nojournal -nolog -notrace -mode batch -source '
-                         + os.getcwd() + '/scripts/run_integration_test.tcl -tclargs '
-                         + os.path.abspath(os.getcwd()) + ' '
-                         + str(num_confs) + ' '
-                         + str(repeats) + ' '
-                         + str(task_creation) + ' '
-                         + str(max_commands) + ' '
-                         + str(reproduce_conf_seed) + ' '
-                         + str(reproduce_repeat_seed) + ' ',
-                         cwd=prj_path,
-                         stdout=subprocess.PIPE,
-                         stderr=subprocess.STDOUT, shell=True)
-
-    for line in iter(p.stdout.readline, b''):
-        line = line.decode('utf-8')
-        if line.find('Fatal:') != -1:
-            err = True                               # timescale warning code            module 'glbl' does not have a parameter named
-        elif line.find('WARNING:') != -1 and line.find('XSIM 43-4100') == -1 and line.find('VRFC 10-3532') == -1:
-            warn = True
-        sys.stdout.writeVerbose(line)
-
-    retval = p.wait()
-    if retval or err:
+    confs = [generate_conf(rng.randint(1, 2**31 - 1), task_creation, max_commands, repeats) for _ in range(num_confs)]
+    return run_confs(pool, confs, task_creation, plusargs)
+
+
+def run_plan(pool, rng, history, max_commands):
+    shapes = plan_shapes(args.t_way, history, args.max_confs, rng)
+    confs = []
+    for shape in shapes:
+        conf = shaped_conf(shape, rng.randint(1, 2**31 - 1), max_commands, args.repeats)
+        conf_shapes[conf.conf_seed] = shape_str(shape)
+        confs.append(conf)
+    msg.info('Running {}-wise covering plan with {} configurations, {} repetitions, {} max commands'.format(args.t_way, len(confs), args.repeats, max_commands))
+    # Shards keep the order of the plan, the confs covering more combinations run first
+    futures = []
+    for task_creation in (0, 1):
+        suite = [conf for conf in confs if conf.task_creation == task_creation]
+        if suite:
+            futures += run_confs(pool, suite, task_creation)
+    return futures
+
+
+def report_coverage(results, history, seed):
+    # Only configurations whose repetitions were all simulated count as covered
+    covered = [parse_shape(conf_shapes[conf.conf_seed]) for r in results for conf in r.confs
+               if conf.conf_seed in conf_shapes and len(conf.repeat_seeds) == args.repeats]
+    new = save_coverage(coverage_path, args.t_way, history, covered, seed)
+    total = num_tuples(args.t_way)
+    msg.log('{}-wise coverage: {} of {} planned configurations simulated, {} new combinations, {}/{} combinations covered over all runs ({})'.format(
+        args.t_way, len(covered), len(conf_shapes), new, sum(1 for entry in history.values() if entry['count']), total, coverage_path))
+
+
+def run_confs(pool, confs, task_creation, plusargs=()):
+    if changed is not None:
+        # Only the configurations that elaborate a changed source are run
+        affected = [conf for conf in confs if selector.affects_integration(conf.generics(), changed)]
+        msg.log('{} of {} configurations {} affected by the changes'.format(
+            len(affected), len(confs), 'with task creation' if task_creation else 'without task creation'))
+        confs = affected
+    num_confs = len(confs)
+    num_shards = min(args.jobs, num_confs)
+    futures = []
+    for idx in range(num_shards):
+        shard_prj_path = prj_path + '/shard_{}_{}'.format(task_creation, idx)
+        futures.append(pool.submit(exec_integration_test, confs[idx::num_shards], task_creation,
+                                   shard_prj_path, idx, num_shards, plusargs))
+    return futures
+
+
+def report_results(results):
+    failed = [r for r in results if r.failed()]
+    warned = [r for r in results if r.warn]
+    num_confs = sum(len(r.confs) for r in results)
+    num_runs = sum(len(c.repeat_seeds) for r in results for c in r.confs)
+
+    msg.log('Integration test summary: {} shards, {} configurations, {} simulations'.format(len(results), num_confs, num_runs))
+    for r in results:
+        for conf in r.confs:
+            if conf.failed_seeds:
+                msg.warning('  FAIL conf seed {} ({}) repeat seeds {} task creation {}'.format(conf.conf_seed, conf.desc, ' '.join(str(s) for s in conf.failed_seeds), r.task_creation))
+                msg.warning('    log: python3 run_log.py run_tests.log.gz -k conf_seed={} --seed {}'.format(conf.conf_seed, conf.failed_seeds[0]))
+            elif conf.warn:
+                msg.warning('  WARN conf seed {} ({}) repeat seeds {}'.format(conf.conf_seed, conf.desc, ' '.join(str(s) for s in conf.repeat_seeds)))
+        if r.retval and not r.err:
+            msg.warning('  FAIL {} exited with code {}'.format(r.name, r.retval))
+        if r.repro is not None:
+            msg.warning('  Reproduce the first fatal error of {} with: {}'.format(r.name, r.repro))
+        if r.aborted and r.num_confs > len(r.confs):
+            msg.warning('  {} configurations of {} were not run after the fatal error'.format(r.num_confs - len(r.confs), r.name))
+
+    if failed:
         msg.error('Test failed')
-    elif args.no_warn and warn:
+    elif args.no_warn and warned:
         msg.error('Test failed due to warning')
-    elif warn:
+    elif warned:
         msg.success('Test ok (but there are some warnings)')
     else:
         msg.success('Test ok')
 
 
+def report_benchmark(results):
+    bench = {'version': BENCHMARK_FORMAT_VERSION,
+             'benchmark_seed': BENCHMARK_SEED,
+             'sources_hash': sources_hash,
+             'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+             'confs': {}}
+    for r in results:
+        for conf in r.confs:
+            # Failed simulations are reported by report_results, their numbers are meaningless
+            if conf.bench and not conf.failed_seeds:
+                bench['confs']['{}_{}'.format(r.task_creation, conf.conf_seed)] = conf.bench_summary(r.task_creation)
+
+    with open(args.benchmark, 'w') as f:
+        json.dump(bench, f, indent=4)
+
+    def fmt_latency(stats):
+        return '{:>9} {:>9}'.format(stats['mean'], stats['p99']) if stats else '{:>9} {:>9}'.format('-', '-')
+
+    msg.log('Benchmark results written to {}'.format(args.benchmark))
+    msg.log('  {:14} {:>12} {:>9} {:>9} {:>9} {:>9}'.format('conf', 'tasks/cycle', 'lat mean', 'lat p99', 'tw mean', 'tw p99'))
+    for key, conf in bench['confs'].items():
+        msg.log('  {:14} {:>12} {} {}'.format(key, conf['tasks_per_cycle'], fmt_latency(conf['dispatch_latency']), fmt_latency(conf['taskwait_latency'])))
+
+    if args.baseline is None:
+        return
+
+    with open(args.baseline, 'r') as f:
+        baseline = json.load(f)
+    if baseline.get('version') != BENCHMARK_FORMAT_VERSION:
+        msg.error('Baseline {} has benchmark format version {}, expected {}'.format(args.baseline, baseline.get('version'), BENCHMARK_FORMAT_VERSION))
+
+    regressions = []
+    msg.log('Comparison with baseline {}'.format(args.baseline))
+    for key, conf in bench['confs'].items():
+        if key not in baseline['confs']:
+            continue
+        base = baseline['confs'][key]['tasks_per_cycle']
+        cur = conf['tasks_per_cycle']
+        change = (cur - base) / base if base else 0.0
+        line = '  {:14} tasks/cycle {} -> {} ({:+.2%})'.format(key, base, cur, change)
+        if change < -args.tolerance:
+            regressions.append(key)
+            msg.warning(line + ' REGRESSION')
+        else:
+            msg.log(line)
+    missing = [key for key in baseline['confs'] if key not in bench['confs']]
+    if missing:
+        msg.warning('  Configurations of the baseline without results: {}'.format(' '.join(missing)))
+
+    if regressions:
+        msg.error('Throughput regression in {} configurations'.format(len(regressions)))
+
+
+def run_campaign(seed):
+    msg.info('Test campaign seed {}'.format(seed))
+    rng = random.Random(seed)
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        if args.random_confs:
+            # No task creation
+            futures = run_suite(pool, rng, 10, 5, 0, 1000)
+            # Task creation with multiple levels of nesting
+            futures += run_suite(pool, rng, 10, 10, 1, 1000)
+        else:
+            history = load_coverage(coverage_path, args.t_way)
+            futures = run_plan(pool, rng, history, 1000)
+        results = [f.result() for f in futures]
+    if not args.random_confs:
+        report_coverage(results, history, seed)
+    return results
+
+
+def shrink_conf(conf):
+    # Delta debugging over the configuration (ddmin): candidates of the current
+    # granularity are simulated in parallel, in batches of one per job, and the
+    # first one that fails with the same fatal message replaces the conf. A
+    # passing round doubles the granularity until no finer split is possible.
+    # Candidates with the same generics reuse the elaborated snapshot cache
+    slots = queue.Queue()
+    for idx in range(args.jobs):
+        slots.put(prj_path + '/shrink_{}'.format(idx))
+
+    def run_candidate(candidate):
+        slot = slots.get()
+        try:
+            return exec_integration_test([candidate], candidate.task_creation, slot, report_fatal=False)
+        finally:
+            slots.put(slot)
+
+    result = run_candidate(conf)
+    if result.fatal is None:
+        msg.error('The configuration {} does not fail with a fatal error, there is nothing to shrink'.format(conf.desc()))
+    signature = fatal_signature(result.fatal)
+    msg.info('Shrinking {} max commands {}, failing with: {}'.format(conf.desc(), conf.max_commands, signature))
+
+    tested = {conf.key(''): True}
+    num_runs = 1
+    granularity = 2
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        while True:
+            candidates = []
+            for candidate, subset in shrink_candidates(conf, granularity):
+                key = candidate.key('')
+                if key not in tested:
+                    tested[key] = False
+                    candidates.append((candidate, subset))
+
+            found = None
+            for start in range(0, len(candidates), args.jobs):
+                batch = candidates[start:start + args.jobs]
+                futures = [pool.submit(run_candidate, candidate) for candidate, _ in batch]
+                num_runs += len(batch)
+                for (candidate, subset), future in zip(batch, futures):
+                    result = future.result()
+                    if result.fatal is not None and fatal_signature(result.fatal) == signature:
+                        tested[candidate.key('')] = True
+                        if found is None:
+                            found = (candidate, subset)
+                if found is not None:
+                    break
+
+            if found is not None:
+                conf, subset = found
+                granularity = 2 if subset else max(granularity - 1, 2)
+                msg.log('  still fails with {} max commands {}'.format(conf.desc(), conf.max_commands))
+            elif granularity < shrink_granularity(conf):
+                granularity = min(granularity * 2, shrink_granularity(conf))
+            else:
+                break
+
+    with open(args.shrink, 'w') as f:
+        json.dump(conf_to_dict(conf), f, indent=4)
+    msg.log('Shrunk configuration after {} simulations: {} max commands {}'.format(num_runs, conf.desc(), conf.max_commands))
+    msg.log('  ninstances {} nest graph {}'.format(conf.ninstances, conf.nest_graph))
+    msg.log('  size {} (accelerators, creators and nest graph edges; max commands)'.format(conf_size(conf)))
+    msg.success('Reproduce it with: python3 run_integration_tests.py --conf_file {}'.format(args.shrink))
+
+
 msg = Messages()
 parser = ArgParser()
 args = parser.parse_args()
@@ -133,14 +582,163 @@ sys.stdout = Logger()
 if not shutil.which('vivado'):
     msg.error('vivado not found. Please set PATH correctly')
 
+if args.jobs < 1:
+    msg.error('jobs must be at least 1')
+
+if args.sim_jobs is None:
+    args.sim_jobs = max(1, os.cpu_count() // args.jobs)
+elif args.sim_jobs < 1:
+    msg.error('sim_jobs must be at least 1')
+
 prj_path = os.getcwd() + '/test_projects'
 if not os.path.exists(prj_path):
     os.makedirs(prj_path)
 
-if args.conf_seed != 0:
-    exec_integration_test(1, 1, args.task_creation, 1000, args.conf_seed, args.repeat_seed)
+# Elaborated snapshots are reused by every configuration with the same
+# generics, as long as the testbench and RTL sources did not change
+elab_cache = ElabCache(os.path.abspath(args.elab_cache if args.elab_cache is not None else prj_path + '/elab_cache'),
+                       args.elab_cache_max_size, args.elab_cache_max_age)
+sources_hash = hash_sources(os.getcwd(), ['src', 'picos/src', 'test', 'scripts/run_integration_test.tcl'])
+# Registered before the sessions are closed so that it runs after them,
+# once no xsim uses the snapshots anymore
+atexit.register(elab_cache.evict)
+
+session_pool = VivadoSessionPool(args.jobs) if args.server else None
+# Vivado sessions also run until closed when msg.error exits the script
+if session_pool is not None:
+    atexit.register(session_pool.close)
+
+# Timing spans of every shard, configuration and simulation
+spans = SpanRecorder()
+
+# Shapes of the planned configurations by conf seed, needed to reproduce them
+conf_shapes = {}
+coverage_path = os.path.abspath(args.coverage if args.coverage is not None else prj_path + '/conf_coverage.json')
+
+if args.t_way < 1 or args.t_way > 5:
+    msg.error('t_way must be between 1 and 5')
+
+if args.repeats < 1:
+    msg.error('repeats must be at least 1')
+
+if args.shape is not None:
+    try:
+        parse_shape(args.shape)
+    except ValueError as e:
+        msg.error(str(e))
+
+if args.baseline is not None and args.benchmark is None:
+    msg.error('baseline can only be used in benchmark mode')
+
+if args.trace is not None and (args.benchmark is not None or args.shrink is not None or args.conf_seed != 0 or args.conf_file is not None):
+    msg.error('trace can not be combined with benchmark, shrink, conf_seed or conf_file')
+
+if (args.changed_since is not None or args.watch) and (args.benchmark is not None or args.trace is not None or args.conf_seed != 0 or args.conf_file is not None):
+    msg.error('changed_since and watch can only be used in campaign mode')
+
+if args.changed_since is not None and args.watch:
+    msg.error('changed_since can not be combined with watch')
+
+# Files changed since the given revision, the campaign only runs the
+# configurations that depend on them
+selector = TestSelector(os.getcwd())
+changed = None
+if args.changed_since is not None:
+    try:
+        changed = changed_files(os.getcwd(), args.changed_since)
+    except ValueError as e:
+        msg.error('Cannot get the files changed since {}: {}'.format(args.changed_since, e))
+    msg.info('{} files changed since {}'.format(len(changed), args.changed_since))
+
+if args.shrink is not None and (args.benchmark is not None or (args.conf_seed == 0 and args.conf_file is None)):
+    msg.error('shrink needs a failing test given by conf_seed or conf_file')
+
+if args.benchmark is not None:
+    msg.info('Running benchmark version {}'.format(BENCHMARK_FORMAT_VERSION))
+    rng = random.Random(BENCHMARK_SEED)
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        futures = []
+        for task_creation, num_confs, max_commands in BENCHMARK_SUITES:
+            futures += run_suite(pool, rng, num_confs, BENCHMARK_REPEATS, task_creation, max_commands, ['benchmark'])
+        results = [f.result() for f in futures]
+elif args.trace is not None:
+    if args.seed is None:
+        args.seed = random.SystemRandom().randint(1, 2**31 - 1)
+    rng = random.Random(args.seed)
+    repeat_seeds = [args.repeat_seed] if args.repeat_seed != 0 else [rng.randint(1, 2**31 - 1) for _ in range(args.repeats)]
+    try:
+        trace = Trace(args.trace)
+        conf = trace.conf(repeat_seeds)
+        # The stimulus depends only on the trace, it is shared by every repetition
+        trace_dir = prj_path + '/trace/' + trace.hash[:16]
+        trace.write_stimulus(conf, trace_dir)
+    except ValueError as e:
+        msg.error('Invalid trace {}: {}'.format(args.trace, e))
+    msg.info('Replaying trace {} ({}, {} host tasks, {} created tasks) with repeat seeds {}'.format(
+        args.trace, conf.desc(), conf.num_cmds, len(trace.tasks) - conf.num_cmds, ' '.join(str(s) for s in repeat_seeds)))
+    results = [exec_integration_test([conf], conf.task_creation, prj_path + '/trace', plusargs=['trace=' + trace_dir, 'benchmark'])]
+    for r in results:
+        for conf_result in r.confs:
+            if conf_result.bench and not conf_result.failed_seeds:
+                summary = conf_result.bench_summary(r.task_creation)
+                msg.log('Trace replay: {} tasks in {} cycles, {} tasks/cycle'.format(summary['tasks'], summary['cycles'], summary['tasks_per_cycle']))
+                for name in ('dispatch_latency', 'taskwait_latency'):
+                    if summary[name] is not None:
+                        msg.log('  {:16} mean {} p50 {} p99 {} max {}'.format(name, *(summary[name][k] for k in ('mean', 'p50', 'p99', 'max'))))
+elif args.conf_seed != 0 or args.conf_file is not None:
+    if args.conf_file is not None:
+        with open(args.conf_file, 'r') as f:
+            conf = conf_from_dict(json.load(f))
+        if args.repeat_seed != 0:
+            conf.repeat_seeds = [args.repeat_seed]
+        msg.info('Reproducing integration test of {} with repeat seeds {}'.format(args.conf_file, ' '.join(str(s) for s in conf.repeat_seeds)))
+    else:
+        if args.task_creation is None and args.shape is None:
+            msg.error('task_creation must be specified to reproduce a test')
+        msg.info('Reproducing integration test with conf seed {}, repeat seed {}'.format(args.conf_seed, args.repeat_seed))
+        if args.shape is not None:
+            conf = shaped_conf(parse_shape(args.shape), args.conf_seed, 1000, 1, args.repeat_seed)
+            conf_shapes[conf.conf_seed] = args.shape
+        else:
+            conf = generate_conf(args.conf_seed, args.task_creation, 1000, 1, args.repeat_seed)
+    if args.shrink is not None:
+        shrink_conf(conf)
+        results = None
+    else:
+        results = [exec_integration_test([conf], conf.task_creation, prj_path + '/reproduce')]
+elif args.watch:
+    msg.info('Watching the sources, press Ctrl-C to stop')
+    try:
+        for changed in watch_changes(os.getcwd()):
+            msg.info('Changed {}'.format(' '.join(sorted(changed))))
+            # The index and the elaboration cache key depend on the sources
+            selector = TestSelector(os.getcwd())
+            sources_hash = hash_sources(os.getcwd(), ['src', 'picos/src', 'test', 'scripts/run_integration_test.tcl'])
+            conf_shapes.clear()
+            seed = args.seed if args.seed is not None else random.SystemRandom().randint(1, 2**31 - 1)
+            try:
+                report_results(run_campaign(seed))
+            except SystemExit:
+                # A failed campaign does not stop watching
+                pass
+    except KeyboardInterrupt:
+        pass
+    results = None
 else:
-    # No task creation
-    exec_integration_test(10, 5, 0, 1000, 0, 0)
-    # Task creation with multiple levels of nesting
-    exec_integration_test(10, 10, 1, 1000, 0, 0)
+    if args.seed is None:
+        args.seed = random.SystemRandom().randint(1, 2**31 - 1)
+    results = run_campaign(args.seed)
+
+if session_pool is not None:
+    session_pool.close()
+
+if args.timing is not None:
+    spans.write(args.timing)
+    msg.log(format_slowest(spans.slowest('conf_seed'), 'configurations'))
+    msg.log('Timing spans written to {0}.jsonl and {0}.trace.json'.format(args.timing))
+
+# Shrink and watch modes report their own results
+if results is not None:
+    if args.benchmark is not None:
+        report_benchmark(results)
+    report_results(results)
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+# Buffered, compressed and indexed log of the build and test scripts. Writes
+# are batched in chunks that a background thread compresses into a single gzip
+# stream, so the log is a regular gzip file (zless and zgrep work). Every chunk
+# ends with a full flush of the deflate stream, which resets its history, so
+# any chunk can be inflated alone from its offset. Output of each stream
+# (e.g. a shard running in its own thread) is kept apart and written in
+# sections with a key (configuration, iteration, seed...), so the output of
+# parallel runs is not interleaved. <log>.idx has the offsets of every chunk
+# and section as json lines, and this script extracts the sections that match
+# a key without decompressing the rest of the log.
+
+import argparse
+import atexit
+import bisect
+import json
+import queue
+import re
+import struct
+import sys
+import threading
+import zlib
+
+CHUNK_SIZE = 1 << 20
+FLUSH_INTERVAL = 2.0
+COMPRESS_LEVEL = 6
+# Deflate, no flags, no mtime, unknown OS
+GZIP_HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+RE_COLOR = re.compile(r'\033\[[0,1][0-9,;]*m')
+
+
+class RunLog:
+    def __init__(self, path, chunk_size=CHUNK_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        # Uncompressed data and index records of the current chunk, offsets are
+        # in bytes of the whole uncompressed log
+        self.buffer = []
+        self.buffered = 0
+        self.offset = 0
+        self.records = []
+        # Open section of every stream as [id, key, pending data, pending size, written]
+        self.streams = {}
+        self.num_sections = 0
+        self.closed = False
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.writer, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def write(self, text, stream=None):
+        # Text of a stream goes to its open section, a section without key is
+        # opened if there is none
+        if '\033' in text:
+            text = RE_COLOR.sub('', text)
+        data = text.encode('utf-8', errors='replace')
+        with self.lock:
+            if self.closed:
+                return
+            if stream is None:
+                self.append(data)
+                return
+            section = self.streams.get(stream)
+            if section is None:
+                section = self.open_section(stream, {})
+            section[2].append(data)
+            section[3] += len(data)
+            if section[3] >= self.chunk_size:
+                self.write_extent(section)
+
+    def start_section(self, stream, **key):
+        with self.lock:
+            self.close_section(stream)
+            self.open_section(stream, key)
+
+    def update_section(self, stream, **key):
+        # Adds fields to the key of the open section, e.g. the seed of an
+        # iteration printed after its first line
+        with self.lock:
+            section = self.streams.get(stream)
+            if section is None:
+                section = self.open_section(stream, {})
+            section[1].update(key)
+
+    def close_stream(self, stream):
+        with self.lock:
+            self.close_section(stream)
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            for stream in list(self.streams):
+                self.close_section(stream)
+            self.flush_chunk()
+            self.closed = True
+        self.queue.put(None)
+        self.thread.join()
+
+    # The methods below are called with the lock held
+
+    def open_section(self, stream, key):
+        section = [self.num_sections, dict(key), [], 0, False]
+        self.num_sections += 1
+        self.streams[stream] = section
+        return section
+
+    def close_section(self, stream):
+        section = self.streams.pop(stream, None)
+        if section is None:
+            return
+        self.write_extent(section)
+        if section[4]:
+            self.records.append({'section': section[0], 'key': section[1]})
+
+    def write_extent(self, section):
+        if not section[3]:
+            return
+        self.records.append({'extent': section[0], 'start': self.offset + self.buffered, 'length': section[3]})
+        section[4] = True
+        data = b''.join(section[2])
+        section[2] = []
+        section[3] = 0
+        self.append(data)
+
+    def append(self, data):
+        self.buffer.append(data)
+        self.buffered += len(data)
+        if self.buffered >= self.chunk_size:
+            self.flush_chunk()
+
+    def flush_chunk(self):
+        if not self.buffered and not self.records:
+            return
+        self.queue.put((self.offset, b''.join(self.buffer), self.records))
+        self.offset += self.buffered
+        self.buffer = []
+        self.buffered = 0
+        self.records = []
+
+    def flush_idle(self):
+        # Pending data of idle writers is written after flush_interval,
+        # sections are split in several extents if needed
+        with self.lock:
+            for section in self.streams.values():
+                self.write_extent(section)
+            self.flush_chunk()
+
+    def writer(self):
+        # Raw deflate between a gzip header and trailer written here, so that
+        # chunk offsets are those of their deflate blocks. The trailer is only
+        # written by close, a killed run leaves a log that zcat reads up to
+        # its last chunk before reporting the unexpected end of file
+        compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15)
+        crc = 0
+        size = 0
+        with open(self.path, 'wb') as log_file, open(self.path + '.idx', 'w') as idx_file:
+            log_file.write(GZIP_HEADER)
+            pos = len(GZIP_HEADER)
+            while True:
+                try:
+                    item = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    self.flush_idle()
+                    continue
+                if item is None:
+                    break
+                start, data, records = item
+                if data:
+                    block = compressor.compress(data) + compressor.flush(zlib.Z_FULL_FLUSH)
+                    log_file.write(block)
+                    crc = zlib.crc32(data, crc)
+                    size += len(data)
+                    idx_file.write(json.dumps({'chunk': pos, 'size': len(block), 'start': start, 'length': len(data)}) + '\n')
+                    pos += len(block)
+                for record in records:
+                    idx_file.write(json.dumps(record) + '\n')
+                log_file.flush()
+                idx_file.flush()
+            log_file.write(compressor.flush(zlib.Z_FINISH) + struct.pack('<II', crc, size & 0xffffffff))
+
+
+class LogReader:
+    def __init__(self, path):
+        self.path = path
+        self.chunks = []
+        self.extents = {}
+        self.sections = []
+        with open(path + '.idx', 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # The last line may be incomplete if the run was killed
+                    break
+                if 'chunk' in record:
+                    self.chunks.append(record)
+                elif 'extent' in record:
+                    self.extents.setdefault(record['extent'], []).append((record['start'], record['length']))
+                elif 'section' in record:
+                    self.sections.append((record['section'], record['key']))
+        self.starts = [chunk['start'] for chunk in self.chunks]
+        self.cached = (None, None)
+
+    def chunk_data(self, idx):
+        if self.cached[0] != idx:
+            with open(self.path, 'rb') as f:
+                f.seek(self.chunks[idx]['chunk'])
+                block = f.read(self.chunks[idx]['size'])
+            # The block ends with a full flush, not with the end of the stream
+            self.cached = (idx, zlib.decompressobj(-15).decompress(block))
+        return self.cached[1]
+
+    def read(self, start, length):
+        parts = []
+        pos = start
+        end = start + length
+        while pos < end:
+            idx = bisect.bisect_right(self.starts, pos) - 1
+            if idx < 0:
+                break
+            chunk = self.chunks[idx]
+            parts.append(self.chunk_data(idx)[pos - chunk['start']:end - chunk['start']])
+            pos = chunk['start'] + chunk['length']
+            if idx + 1 == len(self.chunks):
+                break
+        return b''.join(parts)
+
+    def find(self, **query):
+        # Sections whose key has all the given fields, values compared as strings
+        return [(sid, key) for sid, key in self.sections
+                if all(name in key and str(key[name]) == str(value) for name, value in query.items())]
+
+    def section_text(self, sid):
+        return b''.join(self.read(start, length) for start, length in self.extents.get(sid, [])).decode('utf-8', errors='replace')
+
+    def section_size(self, sid):
+        return sum(length for _, length in self.extents.get(sid, []))
+
+
+def format_key(key):
+    return ' '.join('{}={}'.format(name, value) for name, value in key.items())
+
+
+def key_arg(value):
+    name, sep, value = value.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError('keys must be NAME=VALUE')
+    return name, value
+
+
+class ArgParser:
+    def __init__(self):
+        self.parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter,
+                                              description='Print the sections of a run log that match a key, e.g. the output of a failing seed')
+
+        self.parser.add_argument('log', help='compressed log, e.g. run_tests.log.gz')
+        self.parser.add_argument('-k', '--key', help='field of the section key as NAME=VALUE (e.g. conf_seed, iteration, repeat_seed, ip, part), can be repeated', type=key_arg, action='append', default=[])
+        self.parser.add_argument('--seed', help='repetition seed of the simulation, same as -k repeat_seed=SEED', type=str)
+        self.parser.add_argument('-l', '--list', help='list the matching sections instead of printing them (default without keys)', action='store_true', default=False)
+
+    def parse_args(self):
+        args = self.parser.parse_args()
+        return args
+
+
+if __name__ == '__main__':
+    args = ArgParser().parse_args()
+    query = dict(args.key)
+    if args.seed is not None:
+        query['repeat_seed'] = args.seed
+    try:
+        reader = LogReader(args.log)
+    except OSError as e:
+        print('Cannot read the index of {}: {}'.format(args.log, e))
+        sys.exit(1)
+    matches = reader.find(**query)
+    if not matches:
+        print('No section of {} matches {}'.format(args.log, format_key(query) or 'the query'))
+        sys.exit(1)
+    if args.list or not query:
+        for sid, key in matches:
+            print('{:>10}  {}'.format(reader.section_size(sid), format_key(key)))
+    else:
+        for sid, key in matches:
+            if len(matches) > 1:
+                print('==> {} <=='.format(format_key(key)))
+            sys.stdout.write(reader.section_text(sid))
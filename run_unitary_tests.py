@@ -21,29 +21,41 @@
 # ------------------------------------------------------------------------- #
 
 import argparse
+import atexit
 import os
-import re
 import shutil
 import sys
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from output_monitor import OutputMonitor, monitor_process
+from run_log import RunLog
+from test_selection import TestSelector, changed_files, watch_changes
+from timing_spans import SpanRecorder, StreamPhases, format_slowest
+from vivado_session import VivadoSessionPool
+
+OUTPUT_MONITOR = OutputMonitor([('error', r'(?i:error)'), ('warning', r'(?i:warning)')],
+                               ignore={'warning': r'(?i:has a timescale but)'})
 
 
 class Logger(object):
     def __init__(self):
         self.terminal = sys.stdout
-        self.log = open('run_tests.log', 'w+')
-        self.re_color = re.compile(r'\033\[[0,1][0-9,;]*m')
+        # Compressed and indexed, see run_log.py
+        self.log = RunLog('run_tests.log.gz')
+        self.lock = threading.Lock()
 
     def write(self, message):
-        self.terminal.write(message)
-        self.log.write(self.re_color.sub('', message))
-        self.log.flush()
-
-    def writeVerbose(self, message):
-        if args.verbose:
+        with self.lock:
             self.terminal.write(message)
-        self.log.write(self.re_color.sub('', message))
-        self.log.flush()
+            self.log.write(message)
+
+    def writeVerbose(self, message, stream=None):
+        with self.lock:
+            if args.verbose:
+                self.terminal.write(message)
+            self.log.write(message, stream)
 
     def flush(self):
         pass
@@ -58,7 +70,7 @@ class Color:
 
 class Messages:
     def error(self, msg):
-        print(Color.RED + msg + '. Check run_tests.log for more information' + Color.END)
+        print(Color.RED + msg + '. Check run_tests.log.gz for more information' + Color.END)
         sys.exit(1)
 
     def info(self, msg):
@@ -80,49 +92,63 @@ class ArgParser:
 
         self.parser.add_argument('-v', '--verbose', help='prints Vivado messages', action='store_true', default=False)
         self.parser.add_argument('-w', '--no_warn', help='treat warnings as errors', action='store_true', default=False)
-        self.parser.add_argument('ip', nargs='*', help='IP which testbench will be run (if none, all IPs are assumed)', default=['advanced/Lock', 'advanced/Scheduler', 'advanced/Scheduler_spawnout'])
+        self.parser.add_argument('-j', '--jobs', help='maximum number of testbenches run concurrently (default: number of CPUs)', type=int, default=os.cpu_count())
+        self.parser.add_argument('--server', help='run the testbenches in persistent Vivado Tcl sessions, one per job', action='store_true', default=False)
+        self.parser.add_argument('--timing', help='write the timing spans of every phase in this json lines file prefix, plus a Chrome trace (def: run_tests_timing)', nargs='?', const='run_tests_timing', type=str)
+        self.parser.add_argument('--changed_since', help='run only the testbenches whose sources changed since this git revision', type=str)
+        self.parser.add_argument('--watch', help='run the testbenches affected by every change of the sources until interrupted', action='store_true', default=False)
+        self.parser.add_argument('ip', nargs='*', help='IP which testbench will be run (if none, every IP with a testbench in test/ is assumed)', default=[])
 
     def parse_args(self):
         args = self.parser.parse_args()
         return args
 
 
-def exec_integration_test(num_confs, repeats, task_creation, max_commands, reproduce_conf_seed, reproduce_repeat_seed, hwruntime):
+def exec_unitary_test(full_ip_name):
+    ip_name = os.path.basename(full_ip_name)
+    ip_prj_path = prj_path + '/' + ip_name.lower() + '_tb'
+    if os.path.exists(ip_prj_path):
+        shutil.rmtree(ip_prj_path)
+    os.makedirs(ip_prj_path)
+    prefix = '[' + ip_name + '] '
+
     err = False
     warn = False
-    msg.info('Running integration test with {} configurations, {} repetitions, {}, {} max commands, {}'.format(num_confs, repeats, 'task creation' if task_creation else 'no task creation', max_commands, hwruntime))
-    p = subprocess.Popen('vivado -nojournal -nolog -notrace -mode batch -source '
-                         + os.getcwd() + '/scripts/run_integration_test.tcl -tclargs '
-                         + os.path.abspath(os.getcwd()) + ' '
-                         + str(num_confs) + ' '
-                         + str(repeats) + ' '
-                         + str(task_creation) + ' '
-                         + str(max_commands) + ' '
-                         + str(reproduce_conf_seed) + ' '
-                         + str(reproduce_repeat_seed) + ' '
-                         + hwruntime,
-                         cwd=prj_path,
-                         stdout=subprocess.PIPE,
-                         stderr=subprocess.STDOUT, shell=True)
-
-    for line in iter(p.stdout.readline, b''):
-        line = line.decode('utf-8')
-        line_casefold = line.casefold()
-        if line_casefold.find('error') != -1:
-            err = True                                       # timescale warning code                        module 'glbl' does not have a parameter named
-        elif line_casefold.find('warning') != -1 and line.find('XSIM 43-4099') == -1 and line_casefold.find("module 'glbl'") == -1:
+    # The project is created until launch_simulation starts compiling
+    phases = StreamPhases(spans, ip_name, first='project', ip=full_ip_name)
+    # The output of the testbench is a section of the log, see run_log.py
+    sys.stdout.log.start_section(full_ip_name, ip=full_ip_name)
+
+    def check_line(line):
+        # Stops the testbench at the first error
+        nonlocal err, warn
+        kind = OUTPUT_MONITOR.match(line)
+        phases.feed(line)
+        sys.stdout.writeVerbose(prefix + line, full_ip_name)
+        if kind == 'error':
+            err = True
+            msg.warning(prefix + 'Error found, stopping the testbench. Reproduce it with: python3 run_unitary_tests.py ' + full_ip_name)
+        elif kind == 'warning':
             warn = True
-        sys.stdout.writeVerbose(line)
-
-    retval = p.wait()
-    if retval or err:
-        msg.error('Test failed')
-    elif args.no_warn and warn:
-        msg.error('Test failed due to warning')
-    elif warn:
-        msg.success('Test ok (but there are some warnings)')
+        return err
+
+    tclargs = [ip_name, full_ip_name, os.path.abspath(os.getcwd()), ip_prj_path]
+    if session_pool is not None:
+        with session_pool.session() as session:
+            retval = session.run_script(os.getcwd() + '/scripts/run_test.tcl', tclargs, ip_prj_path, check_line)
     else:
-        msg.success('Test ok')
+        p = subprocess.Popen('vivado -nojournal -nolog -notrace -mode batch -source '
+                             + os.getcwd() + '/scripts/run_test.tcl -tclargs '
+                             + ' '.join(tclargs),
+                             cwd=ip_prj_path,
+                             stdout=subprocess.PIPE,
+                             stderr=subprocess.STDOUT, shell=True, start_new_session=True)
+
+        retval, _ = monitor_process(p, check_line)
+    phases.close()
+    sys.stdout.log.close_stream(full_ip_name)
+
+    return retval or err, warn
 
 
 msg = Messages()
@@ -133,40 +159,91 @@ sys.stdout = Logger()
 if not shutil.which('vivado'):
     msg.error('vivado not found. Please set PATH correctly')
 
+if args.jobs < 1:
+    msg.error('jobs must be at least 1')
+
 prj_path = os.getcwd() + '/test_projects'
 if not os.path.exists(prj_path):
     os.makedirs(prj_path)
 
-for full_ip_name in args.ip:
-    msg.info('Running test for ' + full_ip_name + ' IP')
-    ip_name = os.path.basename(full_ip_name)
 
-    err = False
-    warn = False
-    p = subprocess.Popen('vivado -nojournal -nolog -notrace -mode batch -source '
-                         + os.getcwd() + '/scripts/run_test.tcl -tclargs '
-                         + ip_name + ' '
-                         + full_ip_name + ' '
-                         + os.path.abspath(os.getcwd()),
-                         cwd=prj_path,
-                         stdout=subprocess.PIPE,
-                         stderr=subprocess.STDOUT, shell=True)
-
-    for line in iter(p.stdout.readline, b''):
-        line = line.decode('utf-8')
-        line_casefold = line.casefold()
-        if line_casefold.find('error') != -1:
-            err = True
-        elif line_casefold.find('warning') != -1 and line_casefold.find('has a timescale but') == -1:
-            warn = True
-        sys.stdout.writeVerbose(line)
-
-    retval = p.wait()
-    if retval or err:
-        msg.error('Test failed')
-    elif args.no_warn and warn:
-        msg.error('Test failed due to warning')
-    elif warn:
-        msg.success('Test ok (but there are some warnings)')
-    else:
-        msg.success('Test ok')
+def run_testbenches(ips):
+    failed = []
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        futures = {}
+        for full_ip_name in ips:
+            msg.info('Running test for ' + full_ip_name + ' IP')
+            futures[pool.submit(exec_unitary_test, full_ip_name)] = full_ip_name
+
+        for future in as_completed(futures):
+            full_ip_name = futures[future]
+            try:
+                err, warn = future.result()
+            except Exception as e:
+                err, warn = True, False
+                msg.log(full_ip_name + ': ' + str(e))
+
+            if err or (args.no_warn and warn):
+                failed.append(full_ip_name)
+                msg.warning(full_ip_name + ': Test failed' + (' due to warning' if not err else ''))
+            elif warn:
+                msg.success(full_ip_name + ': Test ok (but there are some warnings)')
+            else:
+                msg.success(full_ip_name + ': Test ok')
+    return failed
+
+
+if args.changed_since is not None and args.watch:
+    msg.error('changed_since can not be combined with watch')
+
+selector = TestSelector(os.getcwd())
+if not args.ip:
+    args.ip = selector.unit_benches()
+if not args.ip:
+    msg.error('No testbench found in test/')
+
+num_workers = min(args.jobs, len(args.ip))
+session_pool = VivadoSessionPool(num_workers) if args.server else None
+# Vivado sessions also run until closed when msg.error exits the script
+if session_pool is not None:
+    atexit.register(session_pool.close)
+
+# Timing spans of the phases of every testbench
+spans = SpanRecorder()
+
+ips = args.ip
+if args.changed_since is not None:
+    try:
+        changed = changed_files(os.getcwd(), args.changed_since)
+    except ValueError as e:
+        msg.error('Cannot get the files changed since {}: {}'.format(args.changed_since, e))
+    ips = selector.affected_benches(args.ip, changed)
+    msg.info('{} files changed since {}, {} of {} testbenches affected'.format(len(changed), args.changed_since, len(ips), len(args.ip)))
+
+failed = []
+if args.watch:
+    msg.info('Watching the sources of {} testbenches, press Ctrl-C to stop'.format(len(args.ip)))
+    try:
+        for changed in watch_changes(os.getcwd()):
+            # The index is rebuilt because the changes may add or remove instances
+            selector = TestSelector(os.getcwd())
+            ips = selector.affected_benches(args.ip, changed)
+            msg.info('Changed {}, {} testbenches affected'.format(' '.join(sorted(changed)), len(ips)))
+            watch_failed = run_testbenches(ips)
+            if watch_failed:
+                msg.warning('{} of {} tests failed: {}'.format(len(watch_failed), len(ips), ', '.join(watch_failed)))
+    except KeyboardInterrupt:
+        pass
+else:
+    failed = run_testbenches(ips)
+
+if session_pool is not None:
+    session_pool.close()
+
+if args.timing is not None:
+    spans.write(args.timing)
+    msg.log(format_slowest(spans.slowest('ip'), 'testbenches'))
+    msg.log('Timing spans written to {0}.jsonl and {0}.trace.json'.format(args.timing))
+
+if failed:
+    msg.error('{} of {} tests failed: {}'.format(len(failed), len(ips), ', '.join(failed)))
@@ -19,31 +19,111 @@
 #-------------------------------------------------------------------------#
 
 variable root_dir [lindex $argv 0]
-variable num_confs [lindex $argv 1]
-variable repeat [lindex $argv 2]
-variable task_creation [lindex $argv 3]
-variable max_commands [lindex $argv 4]
-variable reproduce_conf_seed [lindex $argv 5]
-variable reproduce_repeat_seed [lindex $argv 6]
-variable prj_dir "$root_dir/test_projects"
-
-proc gen_ran_range {min max} {
-   return [expr round(rand()*($max-$min)) + $min]
+variable confs_file [lindex $argv 1]
+variable prj_dir [lindex $argv 2]
+variable sim_jobs [lindex $argv 3]
+
+if {$prj_dir == ""} {
+   set prj_dir "$root_dir/test_projects"
+}
+if {$sim_jobs == ""} {
+   set sim_jobs 1
 }
 
-proc long_int_to_hex {bits num} {
-   set result ""
-   set div [expr int(ceil($bits/64.))]
-   for {set i 0} {$i < $div} {incr i} {
-      append result [format %016llX [expr ($num >> ($div-$i-1)*64) & 0xFFFFFFFFFFFFFFFF]]
+proc sim_output {chan i} {
+   global sim_out sim_running sim_end sim_status
+   if {[gets $chan line] >= 0} {
+      append sim_out($i) "$line\n"
+   } elseif {[eof $chan]} {
+      fconfigure $chan -blocking 1
+      # Exit code of xsim, or the signal that killed it
+      set sim_status($i) 0
+      if {[catch {close $chan} err opts]} {
+         append sim_out($i) "$err\n"
+         set code [dict get $opts -errorcode]
+         switch [lindex $code 0] {
+            CHILDSTATUS {set sim_status($i) [lindex $code 2]}
+            CHILDKILLED {set sim_status($i) [lindex $code 2]}
+            default {set sim_status($i) 1}
+         }
+      }
+      set sim_end($i) [clock milliseconds]
+      lappend sim_running done $i
    }
-   set result [string trimleft $result 0]
-   if {[string len $result] == 0} {
-      set result 0
+}
+
+# Working directory of a single simulation, with the files of the elaborated
+# snapshot linked from the cache entry. xsim writes its journal, logs and
+# webtalk files in the working directory and the snapshot directory, so every
+# simulation gets its own and they are not shared with other repetitions or
+# shards running the same configuration
+proc prepare_run_dir {run_dir xsim_dir snapshot} {
+   file delete -force $run_dir
+   file mkdir $run_dir/xsim.dir/$snapshot
+   foreach path [glob -nocomplain -directory $xsim_dir/xsim.dir/$snapshot *] {
+      set name [file tail $path]
+      if {[file extension $name] == ".log" || $name == "webtalk"} {
+         continue
+      }
+      file link -symbolic $run_dir/xsim.dir/$snapshot/$name $path
    }
-   return $result
 }
 
+# Runs one xsim process per seed over the already elaborated snapshot in
+# xsim_dir, with at most sim_jobs processes at a time. The output of each
+# simulation is printed as a whole once it finishes, so it is never interleaved
+# with other iterations. Its [TIMING] marker has the times it was started and
+# finished. A simulation whose xsim fails, e.g. it crashes or can not load the
+# snapshot, gets a Fatal line like the failing checks of the testbench. Returns
+# the number of failed simulations
+proc run_simulations {sim_dir xsim_dir snapshot seeds sim_jobs {plusargs {}}} {
+   global sim_out sim_running sim_start sim_end sim_status
+   set failed 0
+   set sim_running {}
+   set running 0
+   set next 0
+   set finished 0
+   set nsims [llength $seeds]
+   set plusarg_opts ""
+   foreach plusarg $plusargs {
+      append plusarg_opts " -testplusarg $plusarg"
+   }
+   while {$finished < $nsims} {
+      while {$running < $sim_jobs && $next < $nsims} {
+         set seed [lindex $seeds $next]
+         set sim_out($next) ""
+         set run_dir $sim_dir/run_$next
+         prepare_run_dir $run_dir $xsim_dir $snapshot
+         set sim_start($next) [clock milliseconds]
+         set cur_dir [pwd]
+         cd $run_dir
+         set chan [open "|xsim $snapshot -R -sv_seed $seed -testplusarg sim_seed=$seed$plusarg_opts -log $run_dir/xsim.log -wdb $run_dir/xsim.wdb 2>@1" r]
+         cd $cur_dir
+         fconfigure $chan -blocking 0 -buffering line
+         fileevent $chan readable [list sim_output $chan $next]
+         incr running
+         incr next
+      }
+      vwait sim_running
+      foreach {tag i} $sim_running {
+         puts "\[RUN TEST\]: iteration $i"
+         puts "\[RUN TEST\]: Seed: [lindex $seeds $i]"
+         puts "\[TIMING\]: simulation $sim_start($i) $sim_end($i)"
+         puts -nonewline $sim_out($i)
+         if {$sim_status($i) != 0} {
+            puts "Fatal: xsim exited with $sim_status($i)"
+            incr failed
+         }
+         unset sim_out($i)
+         incr running -1
+         incr finished
+      }
+      set sim_running {}
+   }
+   return $failed
+}
+
+set t_start [clock milliseconds]
 create_project -force ompps_manager_tb $prj_dir/ompps_manager_tb
 set_property simulator_language Verilog [current_project]
 set_property -name {xsim.simulate.runtime} -value {0ns} -objects [get_filesets sim_1]
@@ -52,153 +132,78 @@ add_files $root_dir/src
 add_files $root_dir/picos/src
 add_files -norecurse $root_dir/test
 
-set_property verilog_define [list \
-   CREATOR_GRAPH_PATH_D="$prj_dir/nest_graph.txt" \
-   TASKTYPE_FILE_PATH_D="$prj_dir/task_types.txt" \
-] [get_filesets sim_1]
-
 update_compile_order -fileset sim_1
+puts "\[TIMING\]: project $t_start [clock milliseconds]"
 
-for {set c 0} {$c < $num_confs} {incr c} {
-   if {$reproduce_conf_seed == 0} {
-      set seed [clock seconds]
-   } else {
-      set seed $reproduce_conf_seed
-   }
-   expr srand($seed)
-   puts "\[RUN TEST\]: Conf $c"
-   puts "\[RUN TEST\]: TCL Seed $seed"
-
-   if {$task_creation} {
-      set ncreators [gen_ran_range 1 8]
-   } else {
-      set ncreators 0
-   }
-
-   set naccs [gen_ran_range [expr $ncreators+1] 32]
-   set ntypes [gen_ran_range [expr $ncreators+1] $naccs]
-
-   set ninstances [lrepeat $ntypes 1]
-
-   puts "\[RUN TEST\]: naccs $naccs ntypes $ntypes ncreators $ncreators"
+set sim_dir [get_property directory [current_project]]/[current_project].sim/sim_1/behav/xsim
+set snapshot [get_property top [get_filesets sim_1]]_behav
 
-   for {set i 0} {[expr $i < $naccs-$ntypes]} {incr i} {
-      # Only give the remaining instances among non creator accelerators
-      set idx [expr round(rand()*($ntypes-$ncreators-1)) + $ncreators]
-      lset ninstances $idx [expr [lindex $ninstances $idx] + 1]
-   }
+# Configurations are generated by integration_conf.py, one per line as a Tcl
+# dict with the conf seed, generics, repetition seeds and the elaboration cache
+# entry where nest_graph.txt and task_types.txt have already been written
+set fd [open $confs_file r]
+set confs [split [string trim [read $fd]] "\n"]
+close $fd
 
-   set graph_str ""
-   if {$ncreators > 0} {
-      set creator_idx_list [lrepeat $ncreators 0]
-      for {set i 0} {$i < $ncreators} {incr i} {
-         lset creator_idx_list $i $i
-      }
-      # Shuffle the list
-      for {set i 0} {$i < $ncreators} {incr i} {
-         set ridx [gen_ran_range 0 [expr $ncreators-1]]
-         set tmp [lindex $creator_idx_list $i]
-         lset creator_idx_list $i [lindex $creator_idx_list $ridx]
-         lset creator_idx_list $ridx $tmp
-      }
-
-      set nest_graph [lrepeat $ncreators [lrepeat $ntypes 1]]
-      puts $creator_idx_list
-      for {set i 0} {$i < $ncreators} {incr i} {
-         set i_m  [lindex $creator_idx_list $i]
-         lset nest_graph $i $i 0
-         for {set j 0} {$j < $i} {incr j} {
-            set j_m [lindex $creator_idx_list $j]
-            lset nest_graph $i_m $j_m 0
-         }
+set c 0
+set sim_failures 0
+foreach conf $confs {
+   puts "\[RUN TEST\]: Conf $c"
+   puts "\[RUN TEST\]: TCL Seed [dict get $conf conf_seed]"
+   puts "\[RUN TEST\]: [dict get $conf desc]"
+   puts "[dict get $conf generics]"
+   incr c
+
+   set entry_dir [dict get $conf entry_dir]
+   if {![file exists $entry_dir/xsim/ready]} {
+      set_property verilog_define [list \
+         CREATOR_GRAPH_PATH_D="$entry_dir/nest_graph.txt" \
+         TASKTYPE_FILE_PATH_D="$entry_dir/task_types.txt" \
+      ] [get_filesets sim_1]
+
+      set generics [list]
+      foreach generic [dict get $conf generics] {
+         lappend generics [string map [list ' \\'] $generic]
       }
-      puts $nest_graph
-      foreach node $nest_graph {
-         append graph_str "$node "
+      set_property generic $generics [get_filesets sim_1]
+
+      set t_start [clock milliseconds]
+      launch_simulation -step compile
+      puts "\[TIMING\]: compile $t_start [clock milliseconds]"
+      set t_start [clock milliseconds]
+      launch_simulation -step elaborate
+      puts "\[TIMING\]: elaborate $t_start [clock milliseconds]"
+      set t_start [clock milliseconds]
+
+      # Another shard may be elaborating the same configuration, the first to
+      # finish wins. file rename moves the source into the target if it is an
+      # existing directory, so a rename that lost the race leaves tmp_dir
+      # inside the winner's entry and it is removed from there
+      set tmp_name xsim.tmp.[pid]
+      set tmp_dir $entry_dir/$tmp_name
+      file delete -force $tmp_dir
+      file mkdir $tmp_dir/xsim.dir
+      file copy $sim_dir/xsim.dir/$snapshot $tmp_dir/xsim.dir/$snapshot
+      close [open $tmp_dir/ready w]
+      if {[file exists $entry_dir/xsim] || [catch {file rename $tmp_dir $entry_dir/xsim}]} {
+         file delete -force $tmp_dir
       }
-   }
-
-   set fd [open $prj_dir/nest_graph.txt w]
-   puts $fd $graph_str
-   close $fd
-
-   set sched_count 0
-   set sched_accid 0
-   set sched_ttype 0
-   set accid 0
-   set max_int 4294967295
-   set task_types [list]
-   for {set i 0} {$i < $ntypes} {incr i} {
-      # FIXME: We should check that the task_type never repeats
-      set task_type [expr int(rand()*$max_int)]
-      set ninst [lindex $ninstances $i]
-      set sched_count [expr $sched_count | (($ninst-1) << $i*8)]
-      set sched_accid [expr $sched_accid | ($accid << $i*8)]
-      set sched_ttype [expr $sched_ttype | ($task_type << $i*32)]
-      incr accid $ninst
-      lappend task_types $task_type
-      puts "Acc type $task_type\tnum instances $ninst"
-   }
-   puts "sched_count $sched_count sched_accid $sched_accid sched_ttype $sched_ttype"
-   set count_bits [expr $ntypes*8]
-   set accid_bits [expr $ntypes*8]
-   set ttype_bits [expr $ntypes*32]
-   set sched_count $count_bits\\'h[long_int_to_hex $count_bits $sched_count]
-   set sched_accid $accid_bits\\'h[long_int_to_hex $accid_bits $sched_accid]
-   set sched_ttype $ttype_bits\\'h[long_int_to_hex $ttype_bits $sched_ttype]
-   puts "sched_count $sched_count sched_accid $sched_accid sched_ttype $sched_ttype"
-
-   set task_types_str ""
-   for {set i 0} {$i < $ntypes} {incr i} {
-      append task_types_str "[lindex $task_types $i] [lindex $ninstances $i]\n"
-   }
-
-   set fd [open $prj_dir/task_types.txt w]
-   puts -nonewline $fd $task_types_str
-   close $fd
-
-   if {$ncreators == 0} {
-      set NUM_CMDS $max_commands
-      set MAX_NEW_TASKS 1
+      file delete -force $entry_dir/xsim/$tmp_name
+      puts "\[TIMING\]: snapshot_store $t_start [clock milliseconds]"
    } else {
-      set NUM_CMDS 1
-      set MAX_NEW_TASKS $max_commands
+      puts "\[RUN TEST\]: Reusing elaborated snapshot $entry_dir/xsim"
    }
 
-   set_property generic [list \
-      NUM_ACCS="$naccs" \
-      NUM_CMDS="$NUM_CMDS" \
-      MAX_NEW_TASKS="$MAX_NEW_TASKS" \
-      NUM_CREATORS="$ncreators" \
-      NUM_ACC_TYPES="$ntypes" \
-      SCHED_COUNT="$sched_count" \
-      SCHED_ACCID="$sched_accid" \
-      SCHED_TTYPE="$sched_ttype" \
-   ] [get_filesets sim_1]
-
-   launch_simulation -step compile
-   launch_simulation -step elaborate
-
-   set seed 0
-   for {set i 0} {$i < $repeat} {incr i} {
-      if {$reproduce_repeat_seed == 0} {
-         set seed_aux [clock seconds]
-         if {$seed == $seed_aux} {
-            after 1000
-            set seed_aux [clock seconds]
-         }
-         set seed $seed_aux
-      } else {
-         set seed $reproduce_repeat_seed
-      }
-
-      puts "\[RUN TEST\]: iteration $i"
-      puts "\[RUN TEST\]: Seed: $seed"
-
-      set_property -name {xsim.simulate.xsim.more_options} -value [list -sv_seed $seed -testplusarg sim_seed=$seed] -objects [get_filesets sim_1]
-      launch_simulation -step simulate
-      run all
-      close_sim
+   set plusargs {}
+   if {[dict exists $conf plusargs]} {
+      set plusargs [dict get $conf plusargs]
    }
+
+   incr sim_failures [run_simulations $prj_dir/sim $entry_dir/xsim $snapshot [dict get $conf repeat_seeds] $sim_jobs $plusargs]
 }
 
+# Sourced by a persistent session the error is its return code, in batch mode
+# Vivado exits with an error
+if {$sim_failures > 0} {
+   error "xsim failed in $sim_failures simulations"
+}
@@ -23,11 +23,15 @@ variable full_name_IP [lindex $argv 1]
 #zcu102
 variable board_part "xczu9eg-ffvc900-1-e"
 variable root_dir [lindex $argv 2]
-variable prj_dir "$root_dir/test_projects"
+variable prj_dir [lindex $argv 3]
+
+if {$prj_dir == ""} {
+   set prj_dir "$root_dir/test_projects/[string tolower $name_IP]_tb"
+}
 
 
 # Create project
-create_project -force [string tolower $name_IP]_tb $prj_dir/[string tolower $name_IP]_tb -part $board_part
+create_project -force [string tolower $name_IP]_tb $prj_dir/project -part $board_part
 set_property simulator_language Verilog [current_project]
 
 import_files -norecurse $root_dir/src/$full_name_IP.sv $root_dir/test/${full_name_IP}_tb.sv
@@ -22,6 +22,11 @@ variable project_path [lindex $argv 0]
 variable name_IP [lindex $argv 1]
 variable part [lindex $argv 2]
 variable ip_repo_path [lindex $argv 3]
+variable clk_period [lindex $argv 4]
+
+if {$clk_period == ""} {
+    set clk_period 3.333
+}
 
 set name_IP_lower [ string tolower $name_IP ]
 set mod_name ${name_IP_lower}_0
@@ -40,23 +45,56 @@ if { [ glob -nocomplain $project_path/synth_project.xpr ] == "" } {
 }
 
 # Enable all feature to have a better resource utilization statistic
-set_property -dict [list \
+set ip_config [list \
    CONFIG.ENABLE_TASK_CREATION 1 \
    CONFIG.LOCK_SUPPORT 1 \
    CONFIG.ENABLE_SPAWN_QUEUES 1 \
    CONFIG.AXILITE_INTF 1 \
    CONFIG.DBG_AVAIL_COUNT_EN 1 \
    CONFIG.DBG_AVAIL_COUNT_W 64 \
-] [get_ips $mod_name]
+]
+# The remaining arguments are NAME=VALUE IP parameters that override the default ones
+foreach param [lrange $argv 5 end] {
+    set idx [string first = $param]
+    dict set ip_config CONFIG.[string range $param 0 [expr {$idx - 1}]] [string range $param [expr {$idx + 1}] end]
+}
+set_property -dict $ip_config [get_ips $mod_name]
 
+set t_start [clock milliseconds]
 reset_run synth_1
 
 launch_runs synth_1
 
 wait_on_run synth_1
+puts "\[TIMING\]: synth_design $t_start [clock milliseconds]"
 
 # Check if synthesis finished correctly
 if {[string match "*ERROR*" [get_property STATUS [get_runs synth_1]]]} {
 	error "ERROR: Hardware synthesis failed."
 }
 
+set t_start [clock milliseconds]
+open_run synth_1 -name synth_1
+
+# The IP is synthesized out of context, constrain its clock if the IP did not
+if {[llength [get_clocks -quiet -of_objects [get_ports clk]]] == 0} {
+    create_clock -period $clk_period -name clk [get_ports clk]
+}
+
+report_utilization -hierarchical -file $project_path/utilization_hierarchical.rpt
+report_timing_summary -file $project_path/timing_summary.rpt
+
+# Critical paths in a tab-separated format easier to parse than report_timing
+set fd [open $project_path/timing_paths.txt w]
+puts $fd "PERIOD\t[get_property PERIOD [get_clocks -of_objects [get_ports clk]]]"
+foreach path [get_timing_paths -setup -max_paths 10 -nworst 1] {
+    puts $fd [join [list \
+        [get_property SLACK $path] \
+        [get_property LOGIC_LEVELS $path] \
+        [get_property DATAPATH_DELAY $path] \
+        [get_property STARTPOINT_PIN $path] \
+        [get_property ENDPOINT_PIN $path] \
+    ] "\t"]
+}
+close $fd
+puts "\[TIMING\]: reports $t_start [clock milliseconds]"
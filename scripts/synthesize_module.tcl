@@ -0,0 +1,57 @@
+#-------------------------------------------------------------------------#
+#  Copyright (C) 2020-2023 Barcelona Supercomputing Center                #
+#                  Centro Nacional de Supercomputacion (BSC-CNS)          #
+#                                                                         #
+#  This file is part of OmpSs@FPGA toolchain.                             #
+#                                                                         #
+#  This program is free software: you can redistribute it and/or modify   #
+#  it under the terms of the GNU General Public License as published      #
+#  by the Free Software Foundation, either version 3 of the License,      #
+#  or (at your option) any later version.                                 #
+#                                                                         #
+#  This program is distributed in the hope that it will be useful,        #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of         #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                   #
+#  See the GNU General Public License for more details.                   #
+#                                                                         #
+#  You should have received a copy of the GNU General Public License      #
+#  along with this program. If not, see <https://www.gnu.org/licenses/>.  #
+#-------------------------------------------------------------------------#
+
+# Out of context synthesis of a single module in non-project mode. The sources
+# file has the transitive sources of the module, one per line with the
+# packages first, and the rest of arguments are its generics as NAME=VALUE
+
+variable project_path [lindex $argv 0]
+variable module [lindex $argv 1]
+variable part [lindex $argv 2]
+variable clk_period [lindex $argv 3]
+variable sources_file [lindex $argv 4]
+
+set fd [open $sources_file r]
+set sources [split [string trim [read $fd]] "\n"]
+close $fd
+
+foreach src $sources {
+    if {[file extension $src] == ".v"} {
+        read_verilog $src
+    } else {
+        read_verilog -sv $src
+    }
+}
+
+set generic_opts [list]
+foreach param [lrange $argv 5 end] {
+    lappend generic_opts -generic $param
+}
+
+set t_start [clock milliseconds]
+synth_design -top $module -part $part -mode out_of_context {*}$generic_opts
+puts "\[TIMING\]: synth_design $t_start [clock milliseconds]"
+
+if {[llength [get_ports -quiet clk]] > 0} {
+    create_clock -period $clk_period -name clk [get_ports clk]
+}
+
+report_utilization -file $project_path/utilization.rpt
+report_timing_summary -file $project_path/timing_summary.rpt
@@ -0,0 +1,43 @@
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+
+# Verilog number literals, shared by every tool that reads numbers out of
+# the sources or the Vivado reports: plain decimals and sized or unsized
+# based literals such as 32'hFFFF_0000, 'b1010 or 8'sd5. Values with unknown
+# (x, z or ?) bits raise ValueError like any other malformed literal.
+
+import re
+
+RE_SV_LITERAL = re.compile(r"^([+-]?)(?:([0-9][0-9_]*)|(?:[0-9][0-9_]*)?\s*'[sS]?([bBoOdDhH])\s*([0-9a-fA-F_xXzZ?]+))$")
+LITERAL_BASES = {'b': 2, 'o': 8, 'd': 10, 'h': 16}
+
+
+def parse_sv_literal(text):
+    m = RE_SV_LITERAL.match(text.strip())
+    if m is None:
+        raise ValueError('invalid number ' + text)
+    sign = -1 if m.group(1) == '-' else 1
+    if m.group(2) is not None:
+        return sign * int(m.group(2).replace('_', ''))
+    digits = m.group(4).replace('_', '')
+    if re.search('[xXzZ?]', digits):
+        raise ValueError('unknown bits in ' + text)
+    return sign * int(digits, LITERAL_BASES[m.group(3).lower()])
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+# Out of context synthesis of the PicosOmpSsManager submodules, all of them in
+# parallel. Each module gets the generics PicosOmpSsManager passes to it, and
+# its result is cached on the hash of its transitive sources, so only the
+# modules whose sources changed are synthesized again.
+
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from result_cache import ResultCache
+from rtl_deps import RtlIndex
+from run_log import RunLog
+from vivado_reports import get_used_resources, parse_rpt_tables, parse_timing_summary
+
+TOP_MODULE = 'PicosOmpSsManager'
+MODULES = ['Command_In', 'Command_In_copy_opt', 'Command_Out', 'Scheduler', 'Scheduler_spawnout', 'Spawn_In',
+           'Taskwait', 'Lock', 'Cutoff_Manager', 'axilite_controller', 'axis_switch_picos_finish_task',
+           'axis_switch_sched_in', 'axis_switch_taskwait_in', 'axis_switch_task_create_ack']
+# Same configuration as the IP synthesized by scripts/synthesize_ip.tcl
+TOP_GENERICS = {'ENABLE_TASK_CREATION': 1, 'LOCK_SUPPORT': 1, 'ENABLE_SPAWN_QUEUES': 1, 'AXILITE_INTF': 1,
+                'DBG_AVAIL_COUNT_EN': 1, 'DBG_AVAIL_COUNT_W': 64}
+
+
+class Logger(object):
+    def __init__(self):
+        self.terminal = sys.stdout
+        # Compressed and indexed, see run_log.py
+        self.log = RunLog('synthesize_modules.log.gz')
+        self.lock = threading.Lock()
+
+    def write(self, message):
+        with self.lock:
+            self.terminal.write(message)
+            self.log.write(message)
+
+    def flush(self):
+        pass
+
+
+class Color:
+    GREEN = '\033[0;32m'
+    YELLOW = '\033[1;33m'
+    RED = '\033[0;31m'
+    END = '\033[0m'
+
+
+class Messages:
+    def error(self, msg):
+        print(Color.RED + msg + '. Check synthesize_modules.log.gz for more information' + Color.END)
+        sys.exit(1)
+
+    def info(self, msg):
+        print(Color.YELLOW + msg + Color.END)
+
+    def warning(self, msg):
+        print(Color.YELLOW + msg + Color.END)
+
+    def success(self, msg):
+        print(Color.GREEN + msg + Color.END)
+
+    def log(self, msg):
+        print(msg)
+
+
+def generic_arg(value):
+    name, sep, value = value.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError('generics must be NAME=VALUE')
+    try:
+        return name, int(value, 0)
+    except ValueError:
+        return name, value
+
+
+class ArgParser:
+    def __init__(self):
+        self.parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter)
+
+        self.parser.add_argument('-b', '--board_part', help='board part number', type=str.lower, required=True)
+        self.parser.add_argument('-v', '--verbose', help='prints Vivado messages', action='store_true', default=False)
+        self.parser.add_argument('-j', '--jobs', help='number of modules synthesized concurrently (def: number of CPUs / 2)', type=int, default=max(1, os.cpu_count() // 2))
+        self.parser.add_argument('-m', '--modules', help='modules to synthesize (def: every submodule)', nargs='+', default=MODULES)
+        self.parser.add_argument('-g', '--generic', help='generic of {} as NAME=VALUE, can be repeated'.format(TOP_MODULE), type=generic_arg, action='append', default=[])
+        self.parser.add_argument('--clock_period', help='clock period in ns used for the synthesis timing report (def: 3.333)', type=float, default=3.333)
+        self.parser.add_argument('--cache_dir', help='directory of the results cache (def: $XDG_CACHE_HOME/pom_modules)',
+                                 default=os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'pom_modules'))
+        self.parser.add_argument('--no_cache', help='always synthesize and do not store the results in the cache', action='store_true', default=False)
+        self.parser.add_argument('-o', '--output', help='json file with the resources and timing of every module (def: module_synthesis.json)', type=str, default='module_synthesis.json')
+
+    def parse_args(self):
+        args = self.parser.parse_args()
+        return args
+
+
+def format_generic(name, value):
+    # Values that do not fit in an integer are passed as Verilog literals
+    if isinstance(value, int) and value >= 1 << 31:
+        return '{}={}\'h{:X}'.format(name, value.bit_length(), value)
+    return '{}={}'.format(name, value)
+
+
+def module_key(module, sources, generics):
+    sha = hashlib.sha256((module + '\0' + synth_context + '\0').encode('utf-8'))
+    sha.update(index.hash_files(sources).encode('utf-8'))
+    sha.update(json.dumps(generics, sort_keys=True).encode('utf-8'))
+    return sha.hexdigest()
+
+
+def synthesize_module(module):
+    sources = index.module_sources(module)
+    generics = module_generics.get(module, {})
+    key = module_key(module, sources, generics)
+    result = cache.load(key)
+    if result is not None:
+        msg.log('Reusing synthesis of ' + module)
+        result['cached'] = True
+        return result
+
+    missing = index.missing_packages(sources)
+    if missing:
+        msg.warning('{} imports missing package(s) {}, is the picos submodule checked out?'.format(module, ' '.join(missing)))
+
+    prj_path = os.path.abspath('./module_synthesis/' + args.board_part + '/' + module)
+    shutil.rmtree(prj_path, ignore_errors=True)
+    os.makedirs(prj_path)
+    with open(prj_path + '/sources.txt', 'w') as f:
+        f.write('\n'.join(os.path.join(index.root, path) for path in sources) + '\n')
+
+    msg.info('Synthesizing ' + module)
+    with open(prj_path + '/vivado.log', 'w') as log_file:
+        p = subprocess.Popen('vivado -nojournal -nolog -notrace -mode batch -source '
+                             + os.getcwd() + '/scripts/synthesize_module.tcl -tclargs '
+                             + prj_path + ' '
+                             + module + ' '
+                             + args.board_part + ' '
+                             + str(args.clock_period) + ' '
+                             + prj_path + '/sources.txt '
+                             + ' '.join(shlex.quote(format_generic(name, value)) for name, value in sorted(generics.items())),
+                             cwd=prj_path,
+                             stdout=subprocess.PIPE if args.verbose else log_file,
+                             stderr=subprocess.STDOUT, shell=True)
+
+        if args.verbose:
+            prefix = '[' + module + '] '
+            for line in iter(p.stdout.readline, b''):
+                line = line.decode('utf-8')
+                log_file.write(line)
+                sys.stdout.write(prefix + line)
+
+        retval = p.wait()
+
+    if retval:
+        msg.warning('Synthesis of ' + module + ' failed, see ' + prj_path + '/vivado.log')
+        return None
+
+    rpt_path = prj_path + '/utilization.rpt'
+    if not os.path.exists(rpt_path):
+        msg.warning('Cannot find rpt file ' + rpt_path)
+        return None
+    used_resources, missing = get_used_resources(parse_rpt_tables(rpt_path))
+    if missing is not None:
+        msg.warning('Cannot find ' + missing + ' info in rpt file ' + rpt_path)
+        return None
+
+    result = {'resources': used_resources, 'generics': generics, 'sources': sources}
+    if os.path.exists(prj_path + '/timing_summary.rpt'):
+        timing = parse_timing_summary(prj_path + '/timing_summary.rpt')
+        if timing is not None:
+            timing['Fmax_MHz'] = round(1000.0 / (args.clock_period - timing['WNS']), 2)
+            result['timing'] = timing
+
+    cache.store(key, result)
+    msg.success('Finished synthesis of ' + module)
+    result['cached'] = False
+    return result
+
+
+msg = Messages()
+parser = ArgParser()
+args = parser.parse_args()
+cache = ResultCache(args.cache_dir, not args.no_cache)
+sys.stdout = Logger()
+
+if not shutil.which('vivado'):
+    msg.error('vivado not found. Please set PATH correctly')
+
+if args.jobs < 1:
+    msg.error('jobs must be at least 1')
+
+index = RtlIndex(os.getcwd(), ['src', 'picos/src'])
+unknown = [module for module in args.modules if module not in index.module_file]
+if unknown:
+    msg.error('Unknown module(s) ' + ' '.join(unknown))
+
+top_generics = dict(TOP_GENERICS)
+top_generics.update(args.generic)
+module_generics = index.instance_generics(TOP_MODULE, top_generics)
+
+with open(os.path.join(os.getcwd(), 'scripts/synthesize_module.tcl'), 'rb') as f:
+    synth_context = '\0'.join([hashlib.sha256(f.read()).hexdigest(), args.board_part, str(args.clock_period),
+                               os.path.realpath(shutil.which('vivado'))])
+
+msg.info('Synthesizing {} modules out of context for part {}'.format(len(args.modules), args.board_part))
+with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+    results = dict(zip(args.modules, pool.map(synthesize_module, args.modules)))
+
+with open(args.output, 'w') as f:
+    json.dump({'board_part': args.board_part, 'clock_period': args.clock_period, 'generics': top_generics,
+               'modules': {module: res for module, res in results.items() if res is not None}}, f, indent=4)
+
+# Modules that instantiate others include their resources
+msg.log('Out of context synthesis of {} submodules:'.format(TOP_MODULE))
+msg.log('  {:<30} {:>8} {:>8} {:>8} {:>6} {:>8} {:>8}  {}'.format('module', 'LUT', 'FF', 'BRAM_18K', 'DSP', 'WNS', 'Fmax', 'includes'))
+for module, res in results.items():
+    if res is None:
+        msg.log('  {:<30} failed'.format(module))
+        continue
+    resources = res['resources']
+    timing = res.get('timing')
+    includes = sorted(m for m in args.modules if m != module and index.module_file[m] in res['sources'])
+    msg.log('  {:<30} {:>8} {:>8} {:>8} {:>6} {:>8} {:>8}  {}{}'.format(
+        module, resources['LUT'], resources['FF'], resources['BRAM_18K'], resources['DSP48E'],
+        timing['WNS'] if timing else '-', timing['Fmax_MHz'] if timing else '-',
+        ' '.join(includes), ' (cached)' if res['cached'] else ''))
+
+failed = [module for module, res in results.items() if res is None]
+if failed:
+    msg.error('Synthesis failed for module(s) {}, results written to {}'.format(' '.join(failed), args.output))
+msg.success('Results written to ' + args.output)
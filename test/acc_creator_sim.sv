@@ -76,6 +76,10 @@ module acc_creator_sim #(
     int wait_time;
     int finalMode;
     NewTask newTask;
+    int traceId;
+    int traceChild;
+    int argBeat;
+    reg [63:0] firstArg;
 
     assign inStream.ready = state == IDLE || state == READ_HWINS_ADDR || state == READ_TID || state == READ_PTID || state == READ_ARGS;
     assign outStream.valid = state == SEND_COMMAND || state == SEND_TID || state == SEND_PTID;
@@ -232,6 +236,7 @@ module acc_creator_sim #(
 
             READ_PTID: begin
                 ptid <= inStream.data;
+                argBeat = 0;
                 if (inStream.valid & inStream.last) begin
                     state <= WAIT_TIME;
                 end else if (inStream.valid) begin
@@ -240,14 +245,32 @@ module acc_creator_sim #(
             end
 
             READ_ARGS: begin
+                if (inStream.valid) begin
+                    // Every argument is a flags beat followed by the value
+                    if (argBeat == 1) begin
+                        firstArg = inStream.data;
+                    end
+                    argBeat = argBeat+1;
+                end
                 if (inStream.valid && inStream.last) begin
+                    if (trace) begin
+                        // Host tasks carry the trace id, created tasks their newTasks index
+                        traceId = firstArg[32] ? firstArg[31:0] : newTaskTrace[firstArg[31:0]];
+                        tasksToCreate = traceTasks[traceId][47:32];
+                        traceChild = traceTasks[traceId][31:0];
+                        if (tasksToCreate > 0) begin
+                            wait_time <= traceChildren[traceChild][63:32];
+                        end
+                    end
                     state <= WAIT_TIME;
                 end
             end
 
             WAIT_TIME: begin
                 count <= count+1;
-                if (count == wait_time) begin
+                if (trace && tasksToCreate == 0) begin
+                    state <= SEND_COMMAND;
+                end else if (count == wait_time) begin
                     state <= CREATE_NTASK_IDX;
                 end
             end
@@ -261,9 +284,14 @@ module acc_creator_sim #(
                 if (new_task_idx >= maxNewTasks) begin
                    state <= SEND_TASKWAIT_1;
                 end else begin
-                    do begin
-                        accTypeIdx = {$random(random_seed)}%accTypes.size();
-                    end while (!creationGraph[ID*accTypes.size() + accTypeIdx]);
+                    if (trace) begin
+                        accTypeIdx = traceTasks[traceChildren[traceChild][31:0]][55:48];
+                        newTaskTrace[new_task_idx] = traceChildren[traceChild][31:0];
+                    end else begin
+                        do begin
+                            accTypeIdx = {$random(random_seed)}%accTypes.size();
+                        end while (!creationGraph[ID*accTypes.size() + accTypeIdx]);
+                    end
 
                     finalMode = 0;
 
@@ -297,6 +325,9 @@ module acc_creator_sim #(
                         newTasks[new_task_idx].copyArgIdx[i] = accTypes[accTypeIdx].copArgIdx[i];
                     end
                     newTasks[new_task_idx].state = NTASK_CREATED;
+                    if (benchmark) begin
+                        $display("[BENCH] create %0d %0d %0d", cycleCount, new_task_idx, ID);
+                    end
                     state <= SEND_NTASK_HEADER;
                     newTask = newTasks[new_task_idx];
                 end
@@ -387,7 +418,15 @@ module acc_creator_sim #(
                     if (spawn_in.data[7:0] == ACK_OK_CODE) begin //Accept
                         taskNum = taskNum+1;
                         createdTasks = createdTasks+1;
-                        if (createdTasks < tasksToCreate && !finalMode) begin
+                        if (trace) begin
+                            traceChild = traceChild+1;
+                        end
+                        if (trace && createdTasks < tasksToCreate && !finalMode) begin
+                            // The next child waits for its gap
+                            count <= 0;
+                            wait_time <= traceChildren[traceChild][63:32];
+                            state <= WAIT_TIME;
+                        end else if (createdTasks < tasksToCreate && !finalMode) begin
                             state <= CREATE_NTASK_IDX;
                         end else begin
                             state <= SEND_TASKWAIT_1;
@@ -406,6 +445,9 @@ module acc_creator_sim #(
 
             SEND_TASKWAIT_1: begin
                 if (taskwait_out.ready) begin
+                    if (benchmark) begin
+                        $display("[BENCH] taskwait %0d %0d", cycleCount, ID);
+                    end
                     state <= SEND_TASKWAIT_2;
                 end
             end
@@ -418,6 +460,9 @@ module acc_creator_sim #(
 
             WAIT_TASKWAIT: begin
                 if (taskwait_in.valid) begin
+                    if (benchmark) begin
+                        $display("[BENCH] wakeup %0d %0d", cycleCount, ID);
+                    end
                     taskNum = 0;
                     if (new_task_idx < maxNewTasks && createdTasks < tasksToCreate) begin
                         state <= CREATE_NTASK_IDX;
@@ -50,6 +50,7 @@ module cmdin_acc_check #(
     reg [63:0] tid;
     reg [63:0] ptid;
     int isAccTask;
+    int headerCycle;
     NewTask newTask;
 
     initial begin
@@ -78,6 +79,7 @@ module cmdin_acc_check #(
                     compf = cmdin.data[COMPF_H:COMPF_L];
                     code = cmdin.data[CMD_TYPE_H:CMD_TYPE_L];
                     num_slots = cmdin.data[31:8];
+                    headerCycle = cycleCount;
                     state = TID;
                 end
             end
@@ -109,6 +111,9 @@ module cmdin_acc_check #(
                             assert(commands[idx].acc_id == cmdin.dest) else begin
                                 $error("Task sent to the incorrect accelerator, expected %0d but tdest is %0d", commands[idx].acc_id, cmdin.dest); $fatal;
                             end
+                            if (benchmark) begin
+                                $display("[BENCH] dispatch %0d host %0d %0d", headerCycle, idx, cmdin.dest);
+                            end
                             state = PTID;
                         end
                     end else begin
@@ -205,6 +210,9 @@ module cmdin_acc_check #(
                                 $error("Invalid task state"); $fatal;
                             end
                             newTasks[idx].state = NTASK_READY;
+                            if (benchmark) begin
+                                $display("[BENCH] dispatch %0d new %0d %0d", headerCycle, idx, cmdin.dest);
+                            end
                         end
                         cmdFlag[5] = accTypes[accTypeIdx].copDirs[accTypes[accTypeIdx].argCopIdx[argIdx]][1];
                         cmdFlag[4] = accTypes[accTypeIdx].copDirs[accTypes[accTypeIdx].argCopIdx[argIdx]][0];
@@ -68,6 +68,7 @@ module cmdin_sim #(
     reg [5:0] read_idx[NUM_ACCS];
     int avail_slots[NUM_ACCS];
     Command curCommand;
+    int startCycle;
 
     initial begin
         int i, j;
@@ -83,6 +84,7 @@ module cmdin_sim #(
         #1
         acc_id = commands[0].acc_id;
         #699
+        startCycle = cycleCount;
         state = CHECK_AVAIL_SLOT;
     end
 
@@ -170,7 +172,10 @@ module cmdin_sim #(
                 int needed_slots;
                 needed_slots = getCmdLength(commands[cmd_idx].code, commands[cmd_idx].nArgs);
 
-                if (avail_slots[acc_id] < needed_slots) begin
+                // Trace commands are not issued before their cycle
+                if (cycleCount - startCycle < commands[cmd_idx].issueCycle) begin
+                    state <= CHECK_AVAIL_SLOT;
+                end else if (avail_slots[acc_id] < needed_slots) begin
                     state <= FREE_SLOT;
                 end else begin
                     curCommand = commands[cmd_idx];
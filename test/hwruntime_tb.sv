@@ -62,7 +62,6 @@ module hwruntime_tb #(
     reg rst;
     int totalTasks;
     int finished_cmds;
-    int cycleCount;
 
     MemoryPort32 #(.WIDTH(64)) cmdinPortA();
     MemoryPort32 #(.WIDTH(64)) cmdoutPortA();
@@ -75,6 +74,11 @@ module hwruntime_tb #(
     GenAxis #(.DATA_WIDTH(64), .DEST_WIDTH(ACC_BITS)) taskwait_out();
     GenAxis #(.DATA_WIDTH(64), .ID_WIDTH(ACC_BITS), .DEST_WIDTH(3)) taskwait_in();
     int tasktype, numinstances;
+    string traceDir;
+    bit [63:0] traceTypeMem[NUM_ACC_TYPES];
+    bit [63:0] traceHostMem[NUM_CMDS];
+    bit [63:0] traceTaskMem[NUM_CMDS+MAX_NEW_TASKS];
+    bit [63:0] traceChildMem[MAX_NEW_TASKS];
 
     initial begin
         int i, j, k, num_period_accs, dir, copArgIdx;
@@ -89,9 +93,27 @@ module hwruntime_tb #(
         if ($value$plusargs("sim_seed=%d", random_seed)) begin
             $display("Found seed %0d", random_seed);
         end
+        benchmark = $test$plusargs("benchmark");
+        trace = $value$plusargs("trace=%s", traceDir);
+        if (trace) begin
+            $display("Replaying trace %s", traceDir);
+            $readmemh({traceDir, "/trace_types.mem"}, traceTypeMem);
+            $readmemh({traceDir, "/trace_host.mem"}, traceHostMem);
+            $readmemh({traceDir, "/trace_tasks.mem"}, traceTaskMem);
+            $readmemh({traceDir, "/trace_children.mem"}, traceChildMem);
+            traceTasks = new[NUM_CMDS+MAX_NEW_TASKS];
+            traceChildren = new[MAX_NEW_TASKS];
+            for (i = 0; i < NUM_CMDS+MAX_NEW_TASKS; i = i+1) begin
+                traceTasks[i] = traceTaskMem[i];
+            end
+            for (i = 0; i < MAX_NEW_TASKS; i = i+1) begin
+                traceChildren[i] = traceChildMem[i];
+            end
+        end
 
         if (NUM_CREATORS > 0) begin
             newTasks = new[MAX_NEW_TASKS+NUM_CREATORS+2];
+            newTaskTrace = new[MAX_NEW_TASKS+NUM_CREATORS+2];
             newTaskIdx = 0;
             maxNewTasks = MAX_NEW_TASKS;
         end
@@ -121,7 +143,11 @@ module hwruntime_tb #(
         accTypeIdx = 0;
         for (i = 0; i < NUM_ACC_TYPES; i = i+1) begin
             aux = $fscanf(fd, "%d %d", accTypes[i].taskType, accTypes[i].numInstances);
-            accTypes[i].nArgs = $urandom_range(NUM_CREATORS == 0 ? 0 : 1, 15); //We need one argument to store the index of a new task
+            if (trace) begin
+                accTypes[i].nArgs = traceTypeMem[i][7:0];
+            end else begin
+                accTypes[i].nArgs = $urandom_range(NUM_CREATORS == 0 ? 0 : 1, 15); //We need one argument to store the index of a new task
+            end
             accTypes[i].nDeps = $urandom_range(8);
             accTypes[i].nCops = accTypes[i].nArgs > 0 ? $urandom_range(accTypes[i].nArgs) : 0; //A copy is associated to an argument
             for (j = accTypeIdx; j < accTypeIdx+accTypes[i].numInstances; j = j+1) begin
@@ -202,7 +228,9 @@ module hwruntime_tb #(
         totalTasks = 0;
         commands = new[NUM_CMDS];
         for (i = 0; i < NUM_CMDS; i = i+1) begin
-            if (NUM_CREATORS == 0) begin
+            if (trace) begin
+                commands[i].acc_id = traceHostMem[i][31:24];
+            end else if (NUM_CREATORS == 0) begin
                 commands[i].acc_id = $urandom_range(NUM_ACCS-1);
             end else begin
                 do begin
@@ -214,13 +242,14 @@ module hwruntime_tb #(
             commands[i].tid[63:56] = 8'd0;
             commands[i].tid[55:32] = i;
             j = $urandom_range(100);
-            if (j < 5 && i < NUM_CMDS-1) begin //Last command must block to be able to detect simulation finalization in time
+            commands[i].issueCycle = 0;
+            if (j < 5 && i < NUM_CMDS-1 && !trace) begin //Last command must block to be able to detect simulation finalization in time
                 commands[i].code = OmpSsManager::SETUP_HW_INST_CODE;
                 commands[i].period[23:0] = $urandom; //Number of slots
                 commands[i].period[31:24] = 0;
             end else begin
                 totalTasks = totalTasks+1;
-                if (accPeriodic[commands[i].acc_id]) begin
+                if (accPeriodic[commands[i].acc_id] && !trace) begin
                     commands[i].code = OmpSsManager::EXEC_PERI_TASK_CODE;
                     commands[i].period = $urandom;
                     commands[i].repetitions = $urandom;
@@ -235,10 +264,20 @@ module hwruntime_tb #(
                     commands[i].argFlags[j][7:4] = 4'h0 | $urandom_range(3);
                     commands[i].argFlags[j][3:0] = 4'h0 | $urandom_range(3);
                 end
+                if (trace) begin
+                    // Creators find the trace task in the first argument
+                    if (commands[i].nArgs > 0) begin
+                        commands[i].args[0] = {32'd1, 8'd0, traceHostMem[i][23:0]};
+                    end
+                    commands[i].issueCycle = traceHostMem[i][63:32];
+                end
             end
         end
         #200
         rst = 0;
+        if (benchmark) begin
+            $display("[BENCH] start %0d", cycleCount);
+        end
     end
 
     always begin
@@ -255,6 +294,9 @@ module hwruntime_tb #(
 
     always @(finished_cmds) begin
         if (finished_cmds == totalTasks) begin
+            if (benchmark) begin
+                $display("[BENCH] end %0d %0d", cycleCount, finished_cmds);
+            end
             $finish;
         end
     end
@@ -60,6 +60,7 @@ package Glb;
         int acc_id;
         int period;
         int repetitions;
+        int issueCycle;
     } Command;
     Command commands[];
 
@@ -109,6 +110,18 @@ package Glb;
 
     longint random_seed;
 
+    // Clock cycles since the beginning of the simulation, and whether the
+    // testbench prints the [BENCH] events used by the benchmark mode
+    int cycleCount;
+    bit benchmark;
+
+    // Trace replay with +trace=<dir>, see trace_replay.py for the format of
+    // the words. newTaskTrace is the trace id of every created task
+    bit trace;
+    bit [63:0] traceTasks[];
+    bit [63:0] traceChildren[];
+    int newTaskTrace[];
+
     int pom;
 
 endpackage
@@ -0,0 +1,149 @@
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+# Selection of the testbenches affected by a set of changed files. Every unit
+# testbench depends on the sources it elaborates and every integration
+# configuration on the sources elaborated with its generics, e.g. Lock is only
+# elaborated with LOCK_SUPPORT, so changes to it do not run any integration
+# configuration. Files that are compiled but not elaborated are not taken into
+# account, their unit testbenches catch the compilation errors.
+
+import os
+import subprocess
+import time
+
+from rtl_deps import RtlIndex, evaluate
+
+RTL_DIRS = ['src', 'test', 'picos/src']
+# scripts/run_test.tcl imports both packages in every unit testbench
+UNIT_FILES = ['scripts/run_test.tcl', 'src/pom_pkg.sv', 'picos/src/picos_pkg.sv']
+INTEGRATION_TOP = 'hwruntime_tb'
+INTEGRATION_FILES = ['scripts/run_integration_test.tcl', 'integration_conf.py', 'conf_planner.py']
+# Paths whose changes can affect a testbench, picos is a submodule
+SOURCE_PATHS = ['src', 'test', 'picos', 'scripts', 'integration_conf.py', 'conf_planner.py']
+
+
+def changed_files(root, rev):
+    # Source files that differ from rev in the working tree, untracked ones
+    # included. A changed submodule is reported as its directory
+    cmds = [['git', 'diff', '--name-only', rev, '--'] + SOURCE_PATHS,
+            ['git', 'ls-files', '--others', '--exclude-standard', '--'] + SOURCE_PATHS]
+    changed = set()
+    for cmd in cmds:
+        p = subprocess.run(cmd, cwd=root, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        if p.returncode:
+            raise ValueError(p.stderr.strip() or ' '.join(cmd) + ' failed')
+        changed.update(line for line in p.stdout.splitlines() if line)
+    return changed
+
+
+def is_affected(files, changed):
+    for path in changed:
+        prefix = path.rstrip('/') + '/'
+        if path in files or any(f.startswith(prefix) for f in files):
+            return True
+    return False
+
+
+class TestSelector:
+    # Not a test class, pytest collects this module from the repository root
+    __test__ = False
+
+    def __init__(self, root):
+        self.index = RtlIndex(root, RTL_DIRS)
+        self.integration_deps = {}
+
+    def unit_benches(self):
+        # test/<ip>_tb.sv is the testbench of src/<ip>.sv
+        benches = []
+        for path in sorted(self.index.files):
+            if path.startswith('test/') and path.endswith('_tb.sv'):
+                ip = path[len('test/'):-len('_tb.sv')]
+                if 'src/' + ip + '.sv' in self.index.files:
+                    benches.append(ip)
+        return benches
+
+    def unit_files(self, ip):
+        tb = 'test/' + ip + '_tb.sv'
+        module = os.path.basename(ip) + '_tb'
+        if tb not in self.index.files:
+            return set(UNIT_FILES)
+        if self.index.module_file.get(module) == tb:
+            files = self.index.elaborated_files(module, {})
+        else:
+            files = self.index.transitive_files([tb])
+        return files | set(UNIT_FILES)
+
+    def integration_files(self, generics):
+        # generics are the (name, value) pairs of IntegrationConf.generics()
+        key = tuple(generics)
+        if key not in self.integration_deps:
+            overrides = {}
+            for name, value in generics:
+                try:
+                    overrides[name] = evaluate(value, {})
+                except ValueError:
+                    pass
+            files = self.index.elaborated_files(INTEGRATION_TOP, overrides)
+            self.integration_deps[key] = files | set(INTEGRATION_FILES)
+        return self.integration_deps[key]
+
+    def affected_benches(self, ips, changed):
+        return [ip for ip in ips if is_affected(self.unit_files(ip), changed)]
+
+    def affects_integration(self, generics, changed):
+        return is_affected(self.integration_files(generics), changed)
+
+
+def snapshot(root):
+    files = {}
+    paths = [os.path.join(root, name) for name in SOURCE_PATHS if os.path.isfile(os.path.join(root, name))]
+    for watch_dir in SOURCE_PATHS:
+        for dirpath, dirnames, filenames in os.walk(os.path.join(root, watch_dir)):
+            dirnames[:] = [name for name in dirnames if not name.startswith('.')]
+            paths += [os.path.join(dirpath, name) for name in filenames if not name.startswith('.')]
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        files[os.path.relpath(path, root)] = (st.st_mtime_ns, st.st_size)
+    return files
+
+
+def watch_changes(root, interval=1.0):
+    # Yields the files changed, added or removed since the previous yield.
+    # Polls every interval seconds and waits until the files stop changing
+    # for one interval, so that a save of several files is a single change
+    last = snapshot(root)
+    while True:
+        time.sleep(interval)
+        current = snapshot(root)
+        if current == last:
+            continue
+        while True:
+            time.sleep(interval)
+            settled = snapshot(root)
+            if settled == current:
+                break
+            current = settled
+        changed = set(path for path in set(last) | set(current) if last.get(path) != current.get(path))
+        last = current
+        yield changed
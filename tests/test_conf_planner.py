@@ -0,0 +1,87 @@
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+
+import random
+
+import pytest
+
+from conf_planner import FACTORS, all_shapes, num_tuples, plan_shapes, shape_str, shape_tuples, shaped_conf
+from integration_conf import MAX_ACCS, MAX_CREATORS, valid_conf
+
+SEEDS = range(60)
+
+
+@pytest.mark.parametrize('t', [1, 2, 3])
+def test_plan_covers_every_tuple(t):
+    for seed in range(3):
+        plan = plan_shapes(t, rng=random.Random(seed))
+        covered = set(tup for shape in plan for tup in shape_tuples(shape, t))
+        assert len(covered) == num_tuples(t)
+        assert len(plan) <= len(all_shapes())
+
+
+def test_plan_history_and_limit():
+    # Tuples never covered go first when the number of confs is limited
+    t = 2
+    full = plan_shapes(t, rng=random.Random(0))
+    history = {tup: {'count': 1} for shape in full[:len(full) // 2] for tup in shape_tuples(shape, t)}
+    plan = plan_shapes(t, history, max_confs=3, rng=random.Random(0))
+    assert len(plan) == 3
+    assert any(tup not in history for tup in shape_tuples(plan[0], t))
+
+
+def test_all_shapes_cover_every_level():
+    shapes = all_shapes()
+    for name, levels in FACTORS:
+        assert set(shape[name] for shape in shapes) == set(levels)
+
+
+@pytest.mark.parametrize('shape', all_shapes(), ids=shape_str)
+def test_shaped_conf(shape):
+    for seed in SEEDS:
+        conf = shaped_conf(shape, seed, 10, 2)
+        assert valid_conf(conf)
+        assert conf.ntypes == len(conf.ninstances) == len(conf.task_types) == len(set(conf.task_types))
+        assert conf.naccs == sum(conf.ninstances) <= MAX_ACCS
+        assert all(n >= 1 for n in conf.ninstances)
+        assert conf.ninstances[:conf.ncreators] == [1] * conf.ncreators
+        assert len(conf.nest_graph) == conf.ncreators and all(len(row) == conf.ntypes for row in conf.nest_graph)
+        assert conf.task_creation == (1 if conf.ncreators else 0)
+        assert len(conf.repeat_seeds) == 2
+
+        # The conf has the levels of its shape
+        ncreators, naccs, ntypes = conf.ncreators, conf.naccs, conf.ntypes
+        assert {'none': ncreators == 0, 'one': ncreators == 1, 'mid': 1 < ncreators < MAX_CREATORS,
+                'max': ncreators == MAX_CREATORS}[shape['creators']]
+        assert {'min': naccs == ncreators + 1, 'mid': ncreators + 1 < naccs < MAX_ACCS,
+                'max': naccs == MAX_ACCS}[shape['accs']]
+        assert {'min': ntypes == ncreators + 1, 'mid': ncreators + 1 < ntypes < naccs,
+                'one_per_acc': ntypes == naccs}[shape['types']]
+        leaves = conf.ninstances[ncreators:]
+        if shape['instances'] == 'single':
+            assert max(leaves) == 1
+        elif shape['instances'] == 'skewed':
+            assert sorted(leaves)[:-1] == [1] * (len(leaves) - 1)
+        else:
+            assert max(leaves) - min(leaves) <= 1
+        edges = sum(conf.nest_graph[c][d] for c in range(ncreators) for d in range(ncreators))
+        assert edges == {'none': 0, 'single': 0, 'flat': 0, 'chain': ncreators - 1,
+                         'full': ncreators * (ncreators - 1) // 2}[shape['nesting']]
@@ -0,0 +1,94 @@
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+
+import os
+import time
+
+from elab_cache import ElabCache
+
+MB = 1024 * 1024
+
+
+def elaborate(cache, key, size_mb, used):
+    # What the Tcl script leaves in a new entry, used at the given time
+    entry_path = cache.entry(key)
+    os.makedirs(os.path.join(entry_path, 'xsim', 'xsim.dir'))
+    with open(os.path.join(entry_path, 'xsim', 'xsim.dir', 'snapshot'), 'wb') as f:
+        f.write(b'\0' * int(size_mb * MB))
+    with open(os.path.join(entry_path, 'xsim', 'ready'), 'w'):
+        pass
+    os.utime(os.path.join(entry_path, 'last_used'), (used, used))
+    return entry_path
+
+
+def test_store_and_hit(tmp_path):
+    cache = ElabCache(str(tmp_path / 'cache'), 10, 30)
+    assert not cache.ready('a')
+    entry_path = elaborate(cache, 'a', 1, time.time() - 3600)
+    assert entry_path == str(tmp_path / 'cache' / 'a')
+    assert cache.ready('a')
+
+    # A hit keeps the snapshot and refreshes the entry
+    assert cache.entry('a') == entry_path
+    assert cache.ready('a')
+    assert time.time() - os.path.getmtime(os.path.join(entry_path, 'last_used')) < 60
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = ElabCache(str(tmp_path / 'cache'), 2, 30)
+    now = time.time()
+    elaborate(cache, 'old', 1, now - 300)
+    elaborate(cache, 'mid', 1, now - 200)
+    elaborate(cache, 'new', 1, now - 100)
+    # The hit makes the oldest entry the most recently used one
+    cache.entry('old')
+
+    cache.evict()
+    assert sorted(os.listdir(str(tmp_path / 'cache'))) == ['new', 'old']
+    assert cache.ready('old') and cache.ready('new')
+
+
+def test_evict_keeps_the_newest_entry(tmp_path):
+    cache = ElabCache(str(tmp_path / 'cache'), 1, 30)
+    now = time.time()
+    elaborate(cache, 'a', 2, now - 200)
+    elaborate(cache, 'b', 2, now - 100)
+    cache.evict()
+    assert os.listdir(str(tmp_path / 'cache')) == ['b']
+
+
+def test_evict_old_entries(tmp_path):
+    cache = ElabCache(str(tmp_path / 'cache'), 100, 1)
+    now = time.time()
+    elaborate(cache, 'stale', 0.1, now - 2 * 24 * 3600)
+    elaborate(cache, 'fresh', 0.1, now - 3600)
+    # Entries of a previous version of the script have no last_used file
+    legacy = elaborate(cache, 'legacy', 0.1, now)
+    os.remove(os.path.join(legacy, 'last_used'))
+    os.utime(legacy, (now - 3 * 24 * 3600, now - 3 * 24 * 3600))
+
+    cache.evict()
+    assert os.listdir(str(tmp_path / 'cache')) == ['fresh']
+
+
+def test_evict_missing_cache(tmp_path):
+    ElabCache(str(tmp_path / 'cache'), 1, 1).evict()
+    assert not os.path.exists(str(tmp_path / 'cache'))
@@ -0,0 +1,74 @@
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+
+import itertools
+
+import pytest
+
+from integration_conf import (MAX_ACCS, conf_size, generate_conf, remove_types, shrink_candidates,
+                              shrink_granularity, valid_conf)
+
+CONFS = [generate_conf(seed, task_creation, max_commands, 2)
+         for seed, task_creation, max_commands in itertools.product(range(40), (0, 1), (1, 5, 100))]
+
+
+def check_structure(conf):
+    assert conf.ntypes == len(conf.ninstances) == len(conf.task_types)
+    assert conf.naccs == sum(conf.ninstances) <= MAX_ACCS
+    assert len(set(conf.task_types)) == conf.ntypes
+    assert all(n >= 1 for n in conf.ninstances)
+    # Creators are the first types, with a single instance and a row of the nest graph each
+    assert conf.ninstances[:conf.ncreators] == [1] * conf.ncreators
+    assert len(conf.nest_graph) == conf.ncreators
+    assert all(len(row) == conf.ntypes for row in conf.nest_graph)
+    assert conf.task_creation == (1 if conf.ncreators else 0)
+
+
+def strictly_smaller(a, b):
+    return all(x <= y for x, y in zip(a, b)) and a != b
+
+
+@pytest.mark.parametrize('conf', CONFS, ids=lambda c: 'seed{}_tc{}_cmds{}'.format(c.conf_seed, c.task_creation, c.max_commands))
+def test_shrink_candidates(conf):
+    check_structure(conf)
+    for granularity in sorted({2, 3, 4, shrink_granularity(conf)}):
+        for candidate, _ in shrink_candidates(conf, granularity):
+            assert valid_conf(candidate)
+            check_structure(candidate)
+            assert strictly_smaller(conf_size(candidate), conf_size(conf))
+            assert candidate.repeat_seeds == conf.repeat_seeds
+
+
+@pytest.mark.parametrize('conf', [c for c in CONFS if c.ncreators and c.max_commands == 1][:20], ids=lambda c: 'seed{}'.format(c.conf_seed))
+def test_remove_types(conf):
+    for n in range(1, min(conf.ntypes, 4)):
+        for types in itertools.combinations(range(conf.ntypes), n):
+            reduced = remove_types(conf, list(types))
+            keep = [t for t in range(conf.ntypes) if t not in types]
+            creators = [t for t in keep if t < conf.ncreators]
+            assert reduced.ncreators == len(creators)
+            assert reduced.ninstances == [conf.ninstances[t] for t in keep]
+            assert reduced.task_types == [conf.task_types[t] for t in keep]
+            # Rows and columns of the nest graph follow the types that are kept
+            for i, c in enumerate(creators):
+                assert reduced.nest_graph[i] == [conf.nest_graph[c][t] for t in keep]
+            if reduced.ntypes > reduced.ncreators:
+                check_structure(reduced)
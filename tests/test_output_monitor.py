@@ -0,0 +1,119 @@
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+
+# OutputMonitor rules and monitor_process driven by short sh children
+
+import os
+import subprocess
+import time
+
+import pytest
+
+from output_monitor import OutputMonitor, monitor_process
+
+RULES = [('fatal', r'^Fatal:|\$finish called'), ('error', r'^ERROR:'), ('warning', r'^WARNING:'), ('pass', r'\[TEST PASSED\]')]
+
+
+def start(script):
+    return subprocess.Popen(['sh', '-c', script], start_new_session=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+
+def alive(pid):
+    # Killed processes reparented to a pid 1 that does not reap them stay as zombies
+    try:
+        with open('/proc/{}/stat'.format(pid)) as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+@pytest.mark.parametrize('line,kind', [
+    ('Fatal: assertion failed\n', 'fatal'),
+    ('ERROR: [XSIM 43-3322] Static elaboration failed\n', 'error'),
+    ('WARNING: [Synth 8-7080] Parallel synthesis criteria is not met\n', 'warning'),
+    ('[TEST PASSED] conf 3\n', 'pass'),
+    ('INFO: [Common 17-206] Exiting Vivado\n', None),
+    # The first rule wins wherever the other ones match in the line
+    ('WARNING: $finish called at time 10 ns\n', 'fatal'),
+    # Anchored rules still only match at the beginning of the line
+    ('[TEST PASSED] ERROR: counters\n', 'pass'),
+    ('ERROR: [TEST PASSED] missing\n', 'error'),
+])
+def test_rule_priority(line, kind):
+    assert OutputMonitor(RULES).match(line) == kind
+
+
+def test_ignore():
+    monitor = OutputMonitor(RULES, ignore={'warning': r'\[Synth 8-7080\]|\[Vivado 12-584\]'})
+    assert monitor.match('WARNING: [Synth 8-7080] Parallel synthesis criteria is not met\n') is None
+    assert monitor.match('WARNING: [Vivado 12-584] No ports matched\n') is None
+    assert monitor.match('WARNING: [Synth 8-3331] design has unconnected port\n') == 'warning'
+    # Ignored lines of a kind are not reported as a later kind either
+    assert OutputMonitor(RULES, ignore={'error': 'ignored'}).match('ERROR: ignored [TEST PASSED]\n') is None
+    assert monitor.match('ERROR: [Synth 8-7080]\n') == 'error'
+
+
+def test_lines_and_exit_code():
+    monitor = OutputMonitor(RULES)
+    lines = []
+    p = start('echo "INFO: start"; echo "WARNING: slow"; echo "[TEST PASSED]"; exit 3')
+    retval, aborted = monitor_process(p, lambda line: lines.append((line, monitor.match(line))))
+    assert (retval, aborted) == (3, False)
+    assert lines == [('INFO: start\n', None), ('WARNING: slow\n', 'warning'), ('[TEST PASSED]\n', 'pass')]
+
+
+def test_partial_lines():
+    # Lines written in several pieces are only reported once complete, and
+    # the last line is reported at EOF even without a newline
+    lines = []
+    p = start('printf "ERR"; sleep 0.2; printf "OR: split\\nfirst"; sleep 0.2; printf " second\\nno newline"')
+    retval, aborted = monitor_process(p, lambda line: lines.append(line))
+    assert (retval, aborted) == (0, False)
+    assert lines == ['ERROR: split\n', 'first second\n', 'no newline']
+    assert OutputMonitor(RULES).match(lines[0]) == 'error'
+
+
+def test_fatal_kills_process_tree(tmp_path):
+    # The shell starts a child that would outlive it and keep writing
+    pid_path = str(tmp_path / 'pid')
+    monitor = OutputMonitor(RULES)
+    lines = []
+
+    def on_line(line):
+        lines.append(line)
+        return monitor.match(line) == 'fatal'
+
+    start_time = time.time()
+    p = start('(while true; do echo "INFO: child"; sleep 0.05; done) & echo $! > {}; '
+              'sleep 0.3; echo "Fatal: error in the test"; sleep 30; echo "INFO: not reached"'.format(pid_path))
+    retval, aborted = monitor_process(p, on_line)
+    assert aborted
+    assert retval == -9
+    assert time.time() - start_time < 10
+    assert lines[-1] == 'Fatal: error in the test\n'
+    assert 'INFO: not reached\n' not in lines
+
+    with open(pid_path) as f:
+        child_pid = int(f.read())
+    deadline = time.time() + 5
+    while alive(child_pid) and time.time() < deadline:
+        time.sleep(0.05)
+    assert not alive(child_pid)
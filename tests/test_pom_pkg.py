@@ -0,0 +1,40 @@
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+
+import pytest
+
+import pom_pkg
+
+
+def test_parse_localparams(tmp_path):
+    path = tmp_path / 'pkg.sv'
+    path.write_text("package p;\n"
+                    "    localparam A = 3;\n"
+                    "    localparam B = 8'h1F; //comment\n"
+                    "    localparam C = A + 1;\n"
+                    "endpackage\n")
+    assert pom_pkg.parse_localparams(str(path)) == {'A': 3, 'B': 0x1F}
+
+
+def test_localparam():
+    assert pom_pkg.localparam('EXEC_TASK_CODE') == pom_pkg.EXEC_TASK_CODE == pom_pkg.PARAMS['EXEC_TASK_CODE']
+    with pytest.raises(ImportError, match='NOT_A_LOCALPARAM'):
+        pom_pkg.localparam('NOT_A_LOCALPARAM')
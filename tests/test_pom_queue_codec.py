@@ -0,0 +1,198 @@
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+
+# Words are built by hand with the layouts the testbenches write and read
+# (test/cmdin_sim.sv and test/spawn_sim.sv), not with the encoders under test
+
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import pom_queue_codec as codec
+from pom_pkg import COPY_WORDS, EXEC_PERI_TASK_CODE, EXEC_TASK_CODE, SETUP_HW_INST_CODE
+
+VALID = 0x80
+
+
+def spawnout_entry(rng):
+    nargs = rng.randint(1, 4)
+    ndeps = rng.randint(0, 3)
+    ncops = rng.randint(0, 3)
+    tid = rng.getrandbits(64)
+    ptid = rng.getrandbits(64)
+    task_type = rng.getrandbits(32)
+    words = [VALID << 56 | ncops << 24 | ndeps << 16 | nargs << 8, tid, ptid, 1 << 33 | task_type]
+    words += [rng.getrandbits(64) for _ in range(ndeps)]
+    for i in range(ncops):
+        words += [rng.getrandbits(64), rng.randint(1, 1 << 20) << 32 | i << 8 | rng.getrandbits(8)]
+    words += [rng.getrandbits(64) for _ in range(nargs)]
+    return words, {'num_args': nargs, 'num_deps': ndeps, 'num_cops': ncops, 'tid': tid, 'task_type': task_type}
+
+
+def cmdin_entry(rng):
+    code = rng.choice([EXEC_TASK_CODE, EXEC_PERI_TASK_CODE, SETUP_HW_INST_CODE])
+    tid = rng.getrandbits(64)
+    if code == SETUP_HW_INST_CODE:
+        return [VALID << 56 | code, tid], {'code': code, 'num_args': 0, 'tid': tid, 'args': []}
+    nargs = rng.randint(0, 4)
+    compf = rng.getrandbits(8)
+    destid = rng.getrandbits(8)
+    words = [VALID << 56 | destid << 40 | compf << 32 | nargs << 8 | code, tid, rng.getrandbits(64)]
+    if code == EXEC_PERI_TASK_CODE:
+        words.append(rng.getrandbits(32) << 32 | rng.getrandbits(32))
+    args = [(i, rng.getrandbits(8), rng.getrandbits(64)) for i in range(nargs)]
+    for i, flags, arg in args:
+        words += [i << 32 | flags, arg]
+    return words, {'code': code, 'num_args': nargs, 'compf': compf, 'destid': destid, 'tid': tid, 'args': args}
+
+
+def fill_queue(rng, make_entry, queue_len, start, wrap):
+    # Entries from start until the next one does not fit, the rest of the queue is empty
+    queue = [0] * queue_len
+    pos = start
+    end = start + queue_len if wrap else queue_len
+    expected = []
+    while True:
+        words, fields = make_entry(rng)
+        # One empty word is left to end the walk
+        if pos + len(words) >= end:
+            break
+        for k, word in enumerate(words):
+            queue[(pos + k) % queue_len] = word
+        fields['col'] = pos % queue_len
+        fields['length'] = len(words)
+        expected.append(fields)
+        pos += len(words)
+    return np.array(queue, dtype='<u8'), expected
+
+
+def test_spawnout_slot_size():
+    # 4 header words, deps, COPY_WORDS per copy and args, as Scheduler_spawnout reserves them
+    assert COPY_WORDS == 2
+    rng = random.Random(0)
+    for _ in range(100):
+        words, fields = spawnout_entry(rng)
+        headers = np.array([words[0]], dtype='<u8')
+        assert codec.entry_lengths('spawnout', headers)[0] == len(words) == \
+            4 + fields['num_deps'] + fields['num_args'] + COPY_WORDS * fields['num_cops']
+
+
+@pytest.mark.parametrize('wrap,start', [(False, 0), (False, 5), (True, 0), (True, 37), (True, 60)])
+def test_spawnout_queue(wrap, start):
+    rng = random.Random(start)
+    for _ in range(20):
+        queue, expected = fill_queue(rng, spawnout_entry, 64, start, wrap)
+        entries = codec.decode_entries(queue, 'spawnout', start, wrap)
+        types = codec.decode_spawnout_types(queue, entries)
+        assert len(entries) == len(expected)
+        for k, fields in enumerate(expected):
+            assert entries['col'][k] == fields['col']
+            assert entries['length'][k] == fields['length']
+            assert types['task_type'][k] == fields['task_type']
+            assert types['arch'][k] == 2
+            for name in ('num_args', 'num_deps', 'num_cops', 'tid'):
+                assert entries[name][k] == fields[name]
+
+
+def test_wrapped_entry_ends_linear_walk():
+    # An entry that goes on at the beginning of the queue is only found with wrap
+    rng = random.Random(1)
+    words, _ = spawnout_entry(rng)
+    queue = np.zeros(16, dtype='<u8')
+    start = 16 - 2
+    for k, word in enumerate(words):
+        queue[(start + k) % 16] = word
+    assert len(codec.decode_entries(queue, 'spawnout', start)) == 0
+    entries = codec.decode_entries(queue, 'spawnout', start, wrap=True)
+    assert list(entries['col']) == [start] and entries['tid'][0] == words[1]
+
+
+def test_full_wrapped_queue_stops_at_start():
+    # Back to back entries all around the queue, the walk must not go round twice
+    words = [VALID << 56 | 1 << 8, 7, 8, 9, 10]
+    queue = np.array(words * 4, dtype='<u8')
+    entries = codec.decode_entries(queue, 'spawnout', 10, wrap=True)
+    assert list(entries['col']) == [10, 15, 0, 5]
+
+
+@pytest.mark.parametrize('wrap,start', [(False, 0), (True, 50)])
+def test_cmdin_subqueues(wrap, start):
+    rng = random.Random(2)
+    rows = [fill_queue(rng, cmdin_entry, 64, start, wrap) for _ in range(8)]
+    queue = np.stack([row for row, _ in rows])
+    entries = codec.decode_entries(queue, 'cmdin', start, wrap)
+    expected = [(r, fields) for r, (_, row_fields) in enumerate(rows) for fields in row_fields]
+    assert len(entries) == len(expected)
+    for k, (r, fields) in enumerate(expected):
+        assert entries['row'][k] == r and entries['col'][k] == fields['col']
+        assert entries['length'][k] == fields['length']
+        for name in ('code', 'num_args', 'tid'):
+            assert entries[name][k] == fields[name]
+        if fields['code'] != SETUP_HW_INST_CODE:
+            assert entries['compf'][k] == fields['compf'] and entries['destid'][k] == fields['destid']
+
+    args = codec.cmdin_args(queue, entries)
+    tasks = [fields for _, fields in expected if fields['code'] != SETUP_HW_INST_CODE]
+    flat = [arg for fields in tasks for arg in fields['args']]
+    assert len(args['arg']) == len(flat)
+    assert [(int(i), int(f), int(a)) for i, f, a in zip(args['arg_idx'], args['flags'], args['arg'])] == flat
+
+
+def test_encode_cmdin_tasks_round_trip():
+    rng = random.Random(3)
+    tids = [rng.getrandbits(64) for _ in range(6)]
+    args = [[rng.getrandbits(64) for _ in range(3)] for _ in tids]
+    flags = [[rng.getrandbits(8) for _ in range(3)] for _ in tids]
+    words = codec.encode_cmdin_tasks(tids, args, flags, compf=1, destid=0x11, queue_len=64)
+    expected = []
+    for tid, task_args, task_flags in zip(tids, args, flags):
+        expected += [VALID << 56 | 0x11 << 40 | 1 << 32 | 3 << 8 | EXEC_TASK_CODE, tid, 0]
+        for i in range(3):
+            expected += [i << 32 | task_flags[i], task_args[i]]
+    expected += [0] * (-len(expected) % 64)
+    assert words.tolist() == expected
+
+    entries = codec.decode_entries(words.reshape(-1, 64), 'cmdin')
+    assert entries['tid'].tolist() == tids
+    decoded = codec.cmdin_args(words.reshape(-1, 64), entries)
+    assert decoded['arg'].tolist() == [a for task_args in args for a in task_args]
+    assert decoded['flags'].tolist() == [f for task_flags in flags for f in task_flags]
+
+
+@pytest.mark.parametrize('name', sorted(codec.WORD_FORMATS))
+def test_word_format_round_trip(name):
+    fmt = codec.word_format(name)
+    rng = random.Random(name)
+    values = {field: np.array([rng.getrandbits(width) for _ in range(50)], dtype=np.uint64)
+              for field, (_, width) in fmt.fields.items()}
+    words = fmt.encode(**values)
+    expected = [sum(int(values[field][k]) << lo for field, (lo, _) in fmt.fields.items()) for k in range(50)]
+    assert words.tolist() == expected
+    decoded = fmt.decode(words)
+    for field in fmt.fields:
+        assert decoded[field].tolist() == values[field].tolist()
+
+
+def test_encode_rejects_wide_values():
+    with pytest.raises(ValueError):
+        codec.word_format('cmdout_header').encode(code=1 << 8)
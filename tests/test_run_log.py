@@ -0,0 +1,166 @@
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import zlib
+
+from conftest import ROOT
+from run_log import LogReader, RunLog
+
+NUM_THREADS = 6
+NUM_SECTIONS = 5
+
+
+def section_lines(thread, section):
+    return ['thread {} section {} line {} {}\n'.format(thread, section, i, 'x' * (i % 37)) for i in range(40 + 13 * thread)]
+
+
+def write_log(path, chunk_size=512):
+    # Threads write their sections line by line at the same time, the chunks
+    # are small so that every section is split in several extents and chunks
+    log = RunLog(path, chunk_size=chunk_size, flush_interval=0.05)
+    start = threading.Barrier(NUM_THREADS)
+
+    def writer(thread):
+        stream = 'stream{}'.format(thread)
+        start.wait()
+        for section in range(NUM_SECTIONS):
+            log.start_section(stream, thread=thread, section=section)
+            for i, line in enumerate(section_lines(thread, section)):
+                # Colors are removed from the log
+                log.write('\033[0;32m' + line + '\033[0m' if i % 5 == 0 else line, stream)
+                if i == 3:
+                    log.update_section(stream, seed=1000 * thread + section)
+        log.close_stream(stream)
+
+    threads = [threading.Thread(target=writer, args=(t,)) for t in range(NUM_THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    log.close()
+
+
+def check_sections(reader, complete=True):
+    found = 0
+    for thread in range(NUM_THREADS):
+        for section in range(NUM_SECTIONS):
+            matches = reader.find(thread=thread, section=section)
+            if not complete and not matches:
+                continue
+            assert len(matches) == 1
+            sid, key = matches[0]
+            assert key == {'thread': thread, 'section': section, 'seed': 1000 * thread + section}
+            text = ''.join(section_lines(thread, section))
+            assert reader.section_text(sid) == text
+            assert reader.section_size(sid) == len(text)
+            found += 1
+    return found
+
+
+def test_whole_file_and_sections(tmp_path):
+    path = str(tmp_path / 'run.log.gz')
+    write_log(path)
+    with open(path, 'rb') as f:
+        whole = f.read()
+    # The whole log is a single gzip stream
+    text = zlib.decompress(whole, 31)
+    reader = LogReader(path)
+    assert len(reader.chunks) > NUM_THREADS * NUM_SECTIONS
+
+    # Chunks are contiguous after the gzip header, each one inflated alone
+    pos = 10
+    offset = 0
+    for idx, chunk in enumerate(reader.chunks):
+        assert chunk['chunk'] == pos and chunk['start'] == offset
+        assert reader.chunk_data(idx) == text[offset:offset + chunk['length']]
+        pos += chunk['size']
+        offset += chunk['length']
+    # Only the end of the stream and the trailer follow the last chunk
+    assert len(whole) - pos < 16 and offset == len(text)
+    expected = ''.join(line for t in range(NUM_THREADS) for s in range(NUM_SECTIONS) for line in section_lines(t, s))
+    assert sorted(text.decode().splitlines()) == sorted(expected.splitlines())
+    assert b'\033' not in text
+
+    # Extents of every section are in order and most sections span several chunks
+    spanning = 0
+    for sid, extents in reader.extents.items():
+        starts = [start for start, _ in extents]
+        assert starts == sorted(starts)
+        chunks = set(reader.starts.index(max(s for s in reader.starts if s <= start)) for start in starts)
+        spanning += len(chunks) > 1
+    assert spanning >= NUM_THREADS * NUM_SECTIONS // 2
+
+    assert check_sections(reader) == NUM_THREADS * NUM_SECTIONS
+    assert reader.find(thread=99) == []
+    # Values are compared as strings, like the keys given to the command line
+    assert len(reader.find(seed='1002')) == 1
+
+
+def test_truncated_index(tmp_path):
+    path = str(tmp_path / 'run.log.gz')
+    write_log(path)
+    with open(path + '.idx', 'r') as f:
+        lines = f.readlines()
+    reader = LogReader(path)
+    full = check_sections(reader)
+    # A killed run has no end of stream nor gzip trailer
+    end = reader.chunks[-1]['chunk'] + reader.chunks[-1]['size']
+    with open(path, 'r+b') as f:
+        f.truncate(end)
+    assert check_sections(LogReader(path)) == full
+    for cut in (0, len(lines) // 3, len(lines) // 2, len(lines) - 1):
+        # Cut in the middle of a line, like a run that was killed
+        with open(path + '.idx', 'w') as f:
+            f.write(''.join(lines[:cut]) + lines[cut][:len(lines[cut]) // 2])
+        reader = LogReader(path)
+        assert len(reader.chunks) == sum(1 for line in lines[:cut] if '"chunk"' in line)
+        # The sections that were recorded are still intact
+        assert check_sections(reader, complete=False) == sum(1 for line in lines[:cut] if '"section"' in line) <= full
+
+
+def test_unkeyed_writes_and_command_line(tmp_path):
+    path = str(tmp_path / 'run.log.gz')
+    log = RunLog(path, chunk_size=64)
+    log.write('first line\n')
+    log.write('in a stream\n', 'a')
+    log.start_section('a', conf_seed=7)
+    log.write('conf 7\n', 'a')
+    log.close()
+    with open(path, 'rb') as f:
+        text = zlib.decompress(f.read(), 31)
+    assert text == b'first line\nin a stream\nconf 7\n'
+
+    cmd = [sys.executable, os.path.join(ROOT, 'run_log.py'), path]
+    out = subprocess.run(cmd + ['-k', 'conf_seed=7'], stdout=subprocess.PIPE, universal_newlines=True)
+    assert out.returncode == 0 and out.stdout == 'conf 7\n'
+    out = subprocess.run(cmd + ['-k', 'conf_seed=8'], stdout=subprocess.PIPE, universal_newlines=True)
+    assert out.returncode == 1
+    out = subprocess.run(cmd + ['-l'], stdout=subprocess.PIPE, universal_newlines=True)
+    assert out.returncode == 0 and 'conf_seed=7' in out.stdout
+    # The section without key is listed too
+    assert len(out.stdout.splitlines()) == 2
+    records = [json.loads(line) for line in open(path + '.idx')]
+    assert sum('section' in record for record in records) == 2
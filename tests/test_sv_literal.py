@@ -0,0 +1,45 @@
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+
+import pytest
+
+from sv_literal import parse_sv_literal
+
+
+@pytest.mark.parametrize('text,value', [
+    ('42', 42),
+    ('1_000', 1000),
+    ('-7', -7),
+    ("32'hFFFF_0000", 0xFFFF0000),
+    ("'b1010", 10),
+    ("8'sd5", 5),
+    ("12'o17", 15),
+    ("4 'h F", 15),
+    (' 3\n', 3),
+])
+def test_parse(text, value):
+    assert parse_sv_literal(text) == value
+
+
+@pytest.mark.parametrize('text', ["4'bx01", "8'hz", "2'b?1", "4'b2", "4'q1", '1.5', '', 'Slice', "Slice'"])
+def test_invalid(text):
+    with pytest.raises(ValueError):
+        parse_sv_literal(text)
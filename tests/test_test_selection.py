@@ -0,0 +1,124 @@
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+
+# Selection over the real src/ and test/ trees, so these tests follow the RTL:
+# a new testbench or instance changes what they expect
+
+import pytest
+
+from conftest import ROOT
+from integration_conf import generate_conf
+from rtl_deps import RtlIndex, evaluate
+from test_selection import TestSelector, is_affected
+
+UNIT_BENCHES = ['advanced/Lock', 'advanced/Scheduler', 'advanced/Scheduler_spawnout']
+# Both with and without task creation
+CONFS = [generate_conf(seed, task_creation, 10, 1) for seed in range(10) for task_creation in (0, 1)]
+
+selector = TestSelector(ROOT)
+
+
+def selection(changed):
+    benches = sorted(selector.affected_benches(selector.unit_benches(), changed))
+    confs = [conf for conf in CONFS if selector.affects_integration(conf.generics(), changed)]
+    return benches, confs
+
+
+def test_unit_benches():
+    assert sorted(selector.unit_benches()) == UNIT_BENCHES
+
+
+def test_package_selects_everything():
+    benches, confs = selection({'src/pom_pkg.sv'})
+    assert benches == UNIT_BENCHES
+    assert confs == CONFS
+
+
+def test_spawn_in_selects_creator_confs():
+    # Spawn_In is only elaborated with task creation and has no unit testbench
+    benches, confs = selection({'src/advanced/Spawn_In.sv'})
+    assert benches == []
+    assert confs == [conf for conf in CONFS if conf.ncreators > 0]
+    assert confs
+
+
+def test_lock_selects_its_bench():
+    # hwruntime_tb never enables LOCK_SUPPORT
+    assert selection({'src/advanced/Lock.sv'}) == (['advanced/Lock'], [])
+
+
+@pytest.mark.parametrize('changed,benches', [
+    ('src/advanced/Scheduler_spawnout.sv', ['advanced/Scheduler', 'advanced/Scheduler_spawnout']),
+    ('src/advanced/Scheduler.sv', ['advanced/Scheduler']),
+    ('test/advanced/Scheduler_tb.sv', ['advanced/Scheduler']),
+    ('scripts/run_test.tcl', UNIT_BENCHES),
+    # A changed submodule is reported as its directory
+    ('picos', UNIT_BENCHES),
+    ('README.md', []),
+])
+def test_unit_selection(changed, benches):
+    assert selection({changed})[0] == benches
+
+
+@pytest.mark.parametrize('changed,all_confs', [
+    ('test/cmdin_sim.sv', True),
+    ('src/Command_In.sv', True),
+    ('scripts/run_integration_test.tcl', True),
+    ('integration_conf.py', True),
+    ('test/advanced/Scheduler_tb.sv', False),
+    ('scripts/run_test.tcl', False),
+])
+def test_integration_selection(changed, all_confs):
+    assert selection({changed})[1] == (CONFS if all_confs else [])
+
+
+def test_is_affected_prefix():
+    files = {'src/advanced/Lock.sv'}
+    assert is_affected(files, {'src/advanced'})
+    assert is_affected(files, {'src/advanced/'})
+    assert not is_affected(files, {'src/adv'})
+
+
+def test_elaborated_files_follow_generics():
+    index = RtlIndex(ROOT, ['src', 'picos/src'])
+    base = index.elaborated_files('PicosOmpSsManager', {'ENABLE_TASK_CREATION': 0, 'LOCK_SUPPORT': 0})
+    assert 'src/Command_In.sv' in base and 'src/pom_pkg.sv' in base
+    assert not any(path.startswith('src/advanced/') for path in base)
+    full = index.elaborated_files('PicosOmpSsManager', {'ENABLE_TASK_CREATION': 1, 'LOCK_SUPPORT': 1, 'ENABLE_SPAWN_QUEUES': 1})
+    assert {'src/advanced/Lock.sv', 'src/advanced/Spawn_In.sv', 'src/advanced/Taskwait.sv'} <= full
+    generics = index.instance_generics('PicosOmpSsManager', {'ENABLE_TASK_CREATION': 1, 'LOCK_SUPPORT': 0})
+    assert 'Scheduler' in generics and 'Lock' not in generics
+
+
+def test_module_sources():
+    index = RtlIndex(ROOT, ['src', 'picos/src'])
+    assert set(index.module_sources('Scheduler')) == {'src/advanced/Scheduler.sv', 'src/advanced/Scheduler_spawnout.sv', 'src/pom_pkg.sv'}
+
+
+@pytest.mark.parametrize('expr,env,value', [
+    ('2*(3+4)-1', {}, 13),
+    ('A+1', {'A': 3}, 4),
+    ("8'hFF", {}, 255),
+    ('A ? 1 : 2', {'A': 0}, 2),
+    ('$clog2(17)', {}, 5),
+])
+def test_evaluate(expr, env, value):
+    assert evaluate(expr, env) == value
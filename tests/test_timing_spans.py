@@ -0,0 +1,151 @@
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+
+import json
+
+import pytest
+
+from timing_spans import SpanRecorder, StreamPhases, format_slowest
+
+T0 = 1700000000.0
+
+
+def read_trace(prefix):
+    with open(prefix + '.jsonl') as f:
+        spans = [json.loads(line) for line in f]
+    with open(prefix + '.trace.json') as f:
+        trace = json.load(f)
+    return spans, trace['traceEvents']
+
+
+def check_nesting(events):
+    # Spans of the same thread must be nested or disjoint
+    by_tid = {}
+    for event in events:
+        if event['ph'] == 'X':
+            by_tid.setdefault(event['tid'], []).append((event['ts'], event['ts'] + event['dur']))
+    for intervals in by_tid.values():
+        stack = []
+        for start, end in sorted(intervals, key=lambda i: (i[0], -i[1])):
+            while stack and stack[-1] <= start:
+                stack.pop()
+            assert not stack or end <= stack[-1]
+            stack.append(end)
+
+
+def test_overlapping_spans(tmp_path):
+    recorder = SpanRecorder()
+    # Added out of order, as the threads of the scripts do
+    recorder.add('sim', T0 + 5, T0 + 12, 'shard', seed=2)
+    recorder.add('shard', T0, T0 + 10, 'shard')
+    recorder.add('conf', T0 + 1, T0 + 4, 'shard', conf_seed=7)
+    recorder.add('sim', T0 + 2, T0 + 3, 'shard', seed=1)
+    recorder.add('sim', T0 + 11, T0 + 13, 'shard', seed=3)
+    recorder.add('conf', T0 + 4, T0 + 6, 'shard', conf_seed=8)
+    recorder.add('sim', T0 + 7, T0 + 13, 'shard', seed=4)
+    recorder.add('build', T0 + 1, T0 + 2, 'main')
+    prefix = str(tmp_path / 'timing')
+    recorder.write(prefix)
+    spans, events = read_trace(prefix)
+
+    assert [span['start'] - T0 for span in spans] == [0, 1, 1, 2, 4, 5, 7, 11]
+    assert spans[1] == {'name': 'conf', 'start': T0 + 1, 'end': T0 + 4, 'dur': 3, 'lane': 'shard', 'args': {'conf_seed': 7}}
+
+    check_nesting(events)
+    names = {event['tid']: event['args']['name'] for event in events if event['name'] == 'thread_name'}
+    assert names == {1: 'shard', 2: 'main', 3: 'shard #2', 4: 'shard #3'}
+    tids = [(event['name'], event['ts'], event['tid']) for event in events if event['ph'] == 'X']
+    assert tids == [('shard', 0, 1), ('conf', 1000000, 1), ('build', 1000000, 2), ('sim', 2000000, 1),
+                    ('conf', 4000000, 1),
+                    # Ends after the second conf span that is still open
+                    ('sim', 5000000, 3),
+                    # Overlaps the spans open in both threads
+                    ('sim', 7000000, 4),
+                    # Starts after every span of the first thread ended
+                    ('sim', 11000000, 1)]
+    assert [event['dur'] for event in events if event['ph'] == 'X'] == [10000000, 3000000, 1000000, 1000000, 2000000, 7000000, 6000000, 2000000]
+    assert events[0] == {'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': 'pom'}}
+
+
+def test_write_empty(tmp_path):
+    prefix = str(tmp_path / 'timing')
+    SpanRecorder().write(prefix)
+    spans, events = read_trace(prefix)
+    assert spans == []
+    assert [event['name'] for event in events] == ['process_name']
+
+
+def test_slowest():
+    recorder = SpanRecorder()
+    recorder.add('elaborate', T0, T0 + 5, 'a', conf_seed=1)
+    recorder.add('simulate', T0 + 5, T0 + 7, 'a', conf_seed=1)
+    recorder.add('simulate', T0, T0 + 6, 'b', conf_seed=2)
+    recorder.add('shard', T0, T0 + 20, 'a', conf_seed=2)
+    recorder.add('build', T0, T0 + 1, 'main')
+    slowest = recorder.slowest('conf_seed', exclude=('shard',))
+    assert slowest == [(1, 7, {'elaborate': 5, 'simulate': 2}), (2, 6, {'simulate': 6})]
+    assert recorder.slowest('conf_seed', n=1, exclude=('shard',)) == slowest[:1]
+    assert format_slowest(slowest, 'configurations').splitlines() == [
+        'Slowest configurations',
+        '  1                  7.0s  elaborate 5.0s, simulate 2.0s',
+        '  2                  6.0s  simulate 6.0s']
+
+
+def test_timing_markers():
+    recorder = SpanRecorder()
+    phases = StreamPhases(recorder, 'shard 0/1', rules=None, conf_seed=3)
+    phases.feed('[TIMING]: elaborate 1700000000000 1700000002500\n')
+    phases.update(seed=9)
+    phases.feed('[TIMING]: simulate 1700000002500 1700000003125 extra words\n')
+    # Only well formed markers at the beginning of a line are spans
+    phases.feed('INFO: [TIMING]: simulate 1 2\n')
+    phases.feed('[TIMING]: simulate 1700000002500\n')
+    phases.feed('[TIMING]: simulate start end\n')
+    phases.close()
+    assert [(span['name'], span['start'], span['end'], span['lane'], span['args']) for span in recorder.spans] == [
+        ('elaborate', T0, T0 + 2.5, 'shard 0/1', {'conf_seed': 3}),
+        ('simulate', T0 + 2.5, T0 + 3.125, 'shard 0/1', {'conf_seed': 3, 'seed': 9})]
+
+
+def test_vivado_phases(monkeypatch):
+    clock = [T0]
+    monkeypatch.setattr('timing_spans.time.time', lambda: clock[0])
+    recorder = SpanRecorder()
+    phases = StreamPhases(recorder, 'unit', first='setup', test='Lock')
+    for line, now in [("INFO: [USF-XSim-61] Executing 'COMPILE and ANALYZE' step in 'sim'\n", T0 + 1),
+                      ('INFO: compiling\n', T0 + 2),
+                      ("INFO: [USF-XSim-69] Executing 'ELABORATE' step in 'sim'\n", T0 + 4),
+                      ("INFO: [USF-XSim-98] Executing 'SIMULATE' step in 'sim'\n", T0 + 9)]:
+        clock[0] = now
+        phases.feed(line)
+    clock[0] = T0 + 10
+    phases.close()
+    phases.close()
+    assert [(span['name'], span['start'] - T0, span['end'] - T0) for span in recorder.spans] == [
+        ('setup', 0, 1), ('compile', 1, 4), ('elaborate', 4, 9), ('simulate', 9, 10)]
+    assert all(span['args'] == {'test': 'Lock'} for span in recorder.spans)
+
+
+@pytest.mark.parametrize('line', ['[TIMING] elaborate 1 2\n', '[TIMING]: elaborate -1 2\n', ' [TIMING]: elaborate 1 2\n'])
+def test_not_timing_markers(line):
+    recorder = SpanRecorder()
+    StreamPhases(recorder, 'lane', rules=None).feed(line)
+    assert recorder.spans == []
@@ -0,0 +1,77 @@
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+
+import json
+
+import pytest
+
+from integration_conf import MAX_TASK_TYPE
+from trace_replay import Trace, MAX_CHILDREN, MAX_GAP
+
+
+def write_trace(path, records):
+    with open(str(path), 'w') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+    return str(path)
+
+
+def test_valid_trace(tmp_path):
+    trace = Trace(write_trace(tmp_path / 'trace.jsonl', [
+        {'id': 1, 'type': 7, 'nargs': 1, 'gap': 10},
+        {'id': 2, 'type': MAX_TASK_TYPE, 'nargs': 2, 'parent': 1, 'gap': MAX_GAP},
+        {'id': 3, 'type': 7, 'nargs': 1, 'gap': MAX_GAP - 10},
+    ]))
+    conf = trace.conf([1])
+    trace.write_stimulus(conf, str(tmp_path / 'stimulus'))
+    with open(str(tmp_path / 'stimulus' / 'trace_host.mem')) as f:
+        assert [line.strip() for line in f] == ['0000000A00000000', '7FFFFFFF00000001']
+    with open(str(tmp_path / 'stimulus' / 'trace_children.mem')) as f:
+        assert [line.strip() for line in f] == ['7FFFFFFF00000002']
+
+
+@pytest.mark.parametrize('records,error', [
+    ([{'id': 1, 'type': -1, 'nargs': 0}], 'type must be'),
+    ([{'id': 1, 'type': MAX_TASK_TYPE + 1, 'nargs': 0}], 'type must be'),
+    ([{'id': 1, 'type': 1, 'nargs': 0, 'gap': -1}], 'gap must be'),
+    ([{'id': 1, 'type': 1, 'nargs': 0, 'gap': MAX_GAP + 1}], 'gap must be'),
+    # Issue cycles add up the gaps of the host tasks
+    ([{'id': 1, 'type': 1, 'nargs': 0, 'gap': MAX_GAP}, {'id': 2, 'type': 1, 'nargs': 0, 'gap': 1}], 'issue cycle'),
+    ([{'id': 1, 'type': 1, 'nargs': 16}], 'nargs must be'),
+    ([{'id': 1, 'type': 1, 'nargs': 0, 'parent': 5}], 'unknown parent'),
+])
+def test_invalid_task(tmp_path, records, error):
+    with pytest.raises(ValueError, match=error):
+        Trace(write_trace(tmp_path / 'trace.jsonl', records))
+
+
+def test_too_many_children(tmp_path):
+    records = [{'id': 0, 'type': 1, 'nargs': 1}]
+    records += [{'id': i, 'type': 2, 'nargs': 1, 'parent': 0} for i in range(1, MAX_CHILDREN + 2)]
+    with pytest.raises(ValueError, match='children'):
+        Trace(write_trace(tmp_path / 'trace.jsonl', records))
+
+
+def test_too_many_tasks(tmp_path, monkeypatch):
+    monkeypatch.setattr('trace_replay.MAX_TRACE_IDS', 3)
+    records = [{'id': i, 'type': 1, 'nargs': 0} for i in range(4)]
+    with pytest.raises(ValueError, match='at most 3'):
+        Trace(write_trace(tmp_path / 'trace.jsonl', records))
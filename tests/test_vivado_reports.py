@@ -0,0 +1,220 @@
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+
+import pytest
+
+from vivado_reports import get_rpt_table, get_used_resources, parse_rpt_tables, parse_timing_summary
+
+UTILIZATION = '''Copyright 1986-2021 Xilinx, Inc. All Rights Reserved.
+------------------------------------------------------------------------------------
+| Design       : picosompssmanager_0
+| Device       : xczu9egffvc900-1
+------------------------------------------------------------------------------------
+
+Utilization Design Information
+
+Table of Contents
+-----------------
+1. CLB Logic
+1.1 Summary of Registers by Type
+2. BLOCKRAM
+3. ARITHMETIC
+
+1. CLB Logic
+------------
+
++----------------------------+------+-------+-----------+-------+
+|          Site Type         | Used | Fixed | Available | Util% |
++----------------------------+------+-------+-----------+-------+
+| CLB LUTs*                  | 3473 |     0 |    274080 |  1.27 |
+|   LUT as Logic             | 3409 |     0 |    274080 |  1.24 |
+|   LUT as Memory            |   64 |     0 |    144000 |  0.04 |
+|     LUT as Distributed RAM |   64 |     0 |           |       |
+| CLB Registers              | 3313 |     0 |    548160 |  0.60 |
++----------------------------+------+-------+-----------+-------+
+* Warning! The Final LUT count is typically lower.
+
+
+1.1 Summary of Registers by Type
+--------------------------------
+
++-------+--------------+-------------+
+| Total | Clock Enable | Synchronous |
++-------+--------------+-------------+
+| 0     |            _ |           - |
+| 3313  |          Yes |           - |
++-------+--------------+-------------+
+
+
+2. BLOCKRAM
+-----------
+
++-------------------+------+-------+-----------+-------+
+|     Site Type     | Used | Fixed | Available | Util% |
++-------------------+------+-------+-----------+-------+
+| Block RAM Tile    |  9.5 |     0 |       912 |  1.04 |
+|   RAMB36/FIFO*    |    6 |     0 |       912 |  0.66 |
+| URAM              |    2 |     0 |        96 |  2.08 |
++-------------------+------+-------+-----------+-------+
+
+
+3. ARITHMETIC
+-------------
+
++-----------+------+-------+-----------+-------+
+| Site Type | Used | Fixed | Available | Util% |
++-----------+------+-------+-----------+-------+
+| DSPs      |    3 |     0 |      2520 |  0.12 |
++-----------+------+-------+-----------+-------+
+'''
+
+# Table of a 7 series device, with the other section names and without URAM
+UTILIZATION_7SERIES = '''1. Slice Logic
+--------------
+
++-------------------------+------+-------+-----------+-------+
+|        Site Type        | Used | Fixed | Available | Util% |
++-------------------------+------+-------+-----------+-------+
+| Slice LUTs              |  120 |     0 |     53200 |  0.23 |
+| Slice Registers         |  240 |     0 |    106400 |  0.23 |
++-------------------------+------+-------+-----------+-------+
+
+
+2. Memory
+---------
+
++-------------------+------+-------+-----------+-------+
+|     Site Type     | Used | Fixed | Available | Util% |
++-------------------+------+-------+-----------+-------+
+| Block RAM Tile    |    1 |     0 |       140 |  0.71 |
++-------------------+------+-------+-----------+-------+
+
+
+3. DSP
+------
+
++-----------+------+-------+-----------+-------+
+| Site Type | Used | Fixed | Available | Util% |
++-----------+------+-------+-----------+-------+
+| DSPs      |    0 |     0 |       220 |  0.00 |
++-----------+------+-------+-----------+-------+
+'''
+
+# The name of the last instance and the Logic LUTs title do not fit in their columns
+HIERARCHY = '''1. Utilization by Hierarchy
+---------------------------
+
++-------------------------+---------------------+------------+--------+------+
+|         Instance        |        Module       | Total LUTs |  Logic |  FFs |
+|                         |                     |            |   LUTs |      |
++-------------------------+---------------------+------------+--------+------+
+| picosompssmanager_0     |               (top) |       3473 |   3409 | 3313 |
+|   inst                  |   PicosOmpSsManager |       3473 |   3409 | 3313 |
+|     Command_In_I        |          Command_In |        900 |    900 |  800 |
+|       copy_opt          | Command_In_copy_opt |        300 |    300 |  200 |
+|     Scheduler_I         |           Scheduler |       1200 |   1136 | 1000 |
+|     Picos_finish_task_I |  axis_switch_picos_ |         40 |     40 |   30 |
+|                         |         finish_task |            |        |      |
++-------------------------+---------------------+------------+--------+------+
+'''
+
+TIMING_SUMMARY = '''Timing Report
+
+------------------------------------------------------------------------------------------------
+| Design Timing Summary
+| ---------------------
+------------------------------------------------------------------------------------------------
+
+    WNS(ns)      TNS(ns)  TNS Failing Endpoints  TNS Total Endpoints      WHS(ns)      THS(ns)  THS Failing Endpoints
+    -------      -------  ---------------------  -------------------      -------      -------  ---------------------
+     -0.215       -3.120                     27                 9125        0.031        0.000                      0
+
+
+Timing constraints are not met.
+'''
+
+
+def write(tmp_path, text, name='report.rpt'):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+def test_utilization_tables(tmp_path):
+    sections = parse_rpt_tables(write(tmp_path, UTILIZATION))
+    assert sorted(sections) == ['ARITHMETIC', 'BLOCKRAM', 'CLB Logic', 'Summary of Registers by Type']
+    clb = sections['CLB Logic'][0]
+    assert clb['header'] == ['Site Type', 'Used', 'Fixed', 'Available', 'Util%']
+    assert clb['rows'][0] == ['CLB LUTs*', 3473, 0, 274080, 1.27]
+    assert clb['rows'][3] == ['LUT as Distributed RAM', 64, 0, '', '']
+    assert clb['depth'] == [0, 1, 1, 2, 0]
+    registers = sections['Summary of Registers by Type'][0]
+    assert registers['rows'] == [[0, '_', '-'], [3313, 'Yes', '-']]
+
+    used, missing = get_used_resources(sections)
+    assert missing is None
+    assert used == {'LUT': 3473, 'FF': 3313, 'DSP48E': 3, 'BRAM_18K': 19, 'URAM': 2}
+
+
+def test_utilization_7series(tmp_path):
+    used, missing = get_used_resources(parse_rpt_tables(write(tmp_path, UTILIZATION_7SERIES)))
+    assert missing is None
+    assert used == {'LUT': 120, 'FF': 240, 'DSP48E': 0, 'BRAM_18K': 2}
+
+
+@pytest.mark.parametrize('section,missing', [('CLB Logic', 'LUT/FF'), ('ARITHMETIC', 'DSP'), ('BLOCKRAM', 'BRAM')])
+def test_missing_section(tmp_path, section, missing):
+    # The section title is renamed, so its table is not found
+    text = UTILIZATION.replace('. ' + section + '\n', '. Other' + ' ' * (len(section) - 5) + '\n')
+    sections = parse_rpt_tables(write(tmp_path, text))
+    assert section not in sections
+    used, found_missing = get_used_resources(sections)
+    assert found_missing == missing
+    assert 'URAM' not in used
+
+
+def test_ambiguous_table(tmp_path):
+    # Both names of the same table in one report
+    sections = parse_rpt_tables(write(tmp_path, UTILIZATION + '\n' + UTILIZATION_7SERIES))
+    assert get_rpt_table(sections, ['Slice Logic', 'CLB Logic']) is None
+    assert get_used_resources(sections)[1] == 'LUT/FF'
+
+
+def test_hierarchy_wrapped_rows(tmp_path):
+    sections = parse_rpt_tables(write(tmp_path, HIERARCHY))
+    assert len(sections['Utilization by Hierarchy']) == 1
+    table = get_rpt_table(sections, ['Utilization by Hierarchy'])
+    assert table['header'] == ['Instance', 'Module', 'Total LUTs', 'Logic LUTs', 'FFs']
+    assert [row[0] for row in table['rows']] == ['picosompssmanager_0', 'inst', 'Command_In_I', 'copy_opt',
+                                                 'Scheduler_I', 'Picos_finish_task_I']
+    assert table['depth'] == [0, 1, 2, 3, 2, 2]
+    assert table['rows'][-1] == ['Picos_finish_task_I', 'axis_switch_picos_finish_task', 40, 40, 30]
+
+
+def test_timing_summary(tmp_path):
+    assert parse_timing_summary(write(tmp_path, TIMING_SUMMARY)) == {'WNS': -0.215, 'TNS': -3.12, 'WHS': 0.031}
+
+
+def test_timing_summary_missing(tmp_path):
+    assert parse_timing_summary(write(tmp_path, 'Timing Report\n\nNo timing paths\n\n\n')) is None
+    # Header without values, e.g. a report cut short
+    cut = TIMING_SUMMARY[:TIMING_SUMMARY.index('     -0.215')] + '\n'
+    assert parse_timing_summary(write(tmp_path, cut)) is None
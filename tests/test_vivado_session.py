@@ -0,0 +1,168 @@
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+
+# VivadoSession driven by tclsh, which understands the same stdin protocol
+
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+from vivado_session import VivadoSession, VivadoSessionPool
+
+pytestmark = pytest.mark.skipif(shutil.which('tclsh') is None, reason='tclsh not found')
+
+
+def write_script(path, body):
+    with open(path, 'w') as f:
+        f.write(body)
+    return str(path)
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # Zombies of already killed children are dead too
+    try:
+        with open('/proc/{}/stat'.format(pid)) as f:
+            return f.read().split(')')[-1].split()[0] != 'Z'
+    except OSError:
+        return False
+
+
+def wait_dead(pid, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if not pid_alive(pid):
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_success(tmp_path):
+    script = write_script(tmp_path / 'ok.tcl', 'puts "args $argc [lindex $argv 1]"\nputs [pwd]\n')
+    session = VivadoSession('tclsh')
+    lines = []
+    try:
+        rc = session.run_script(script, ['a', 'b c'], str(tmp_path), lambda line: lines.append(line) and False)
+        assert rc == 0
+        assert [line.rstrip('\n') for line in lines] == ['args 2 b c', str(tmp_path)]
+        # The same worker runs the next job
+        pid = session.p.pid
+        assert session.run_script(script, ['x', 'y'], str(tmp_path)) == 0
+        assert session.p.pid == pid
+    finally:
+        session.close()
+    assert session.p is None
+
+
+def test_tcl_error(tmp_path):
+    script = write_script(tmp_path / 'err.tcl', 'puts before\nerror "boom"\nputs after\n')
+    session = VivadoSession('tclsh')
+    lines = []
+    try:
+        assert session.run_script(script, [], str(tmp_path), lambda line: lines.append(line) and False) == 1
+        assert 'before\n' in lines and 'ERROR: boom\n' in lines and 'after\n' not in lines
+        # An error does not kill the worker
+        assert session.alive()
+    finally:
+        session.close()
+
+
+def test_abort_kills_process_group(tmp_path):
+    pid_file = tmp_path / 'child.pid'
+    script = write_script(tmp_path / 'abort.tcl',
+                          'exec sh -c "echo \\$\\$ > {}; exec sleep 60" &\n'
+                          'while {{![file exists {}] || [file size {}] == 0}} {{after 10}}\n'
+                          'puts STOP\nflush stdout\nafter 60000\nputs never\n'.format(pid_file, pid_file, pid_file))
+    ok = write_script(tmp_path / 'ok.tcl', 'puts ok\n')
+    session = VivadoSession('tclsh')
+    try:
+        seen = []
+
+        def on_line(line):
+            seen.append(line)
+            return line.startswith('STOP')
+
+        start = time.time()
+        worker = session.p.pid if session.alive() else None
+        assert session.run_script(script, [], str(tmp_path), on_line) == -1
+        assert time.time() - start < 30
+        assert 'never\n' not in seen
+        assert session.p is None
+        child = int(pid_file.read_text())
+        assert wait_dead(child)
+        if worker is not None:
+            assert wait_dead(worker)
+        # A new worker is started for the next job
+        assert session.run_script(ok, [], str(tmp_path)) == 0
+    finally:
+        session.close()
+
+
+def test_restart_after_worker_dies(tmp_path):
+    crash = write_script(tmp_path / 'crash.tcl', 'puts bye\nexit 3\n')
+    ok = write_script(tmp_path / 'ok.tcl', 'puts ok\n')
+    session = VivadoSession('tclsh')
+    try:
+        assert session.run_script(crash, [], str(tmp_path)) == -1
+        assert session.run_script(ok, [], str(tmp_path)) == 0
+        # Killed from outside between jobs
+        pid = session.p.pid
+        os.kill(pid, 9)
+        assert wait_dead(pid)
+        assert session.run_script(ok, [], str(tmp_path)) == 0
+        assert session.p.pid != pid
+    finally:
+        session.close()
+
+
+def test_pool(tmp_path):
+    script = write_script(tmp_path / 'job.tcl', 'after 100\nputs "job [lindex $argv 0] [pid]"\n')
+    pool = VivadoSessionPool(2, 'tclsh')
+    results = {}
+
+    def run(i):
+        lines = []
+        with pool.session() as session:
+            rc = session.run_script(script, [i], str(tmp_path), lambda line: lines.append(line) and False)
+        results[i] = (rc, lines)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    pool.close()
+
+    assert sorted(results) == list(range(6))
+    workers = set()
+    for i, (rc, lines) in results.items():
+        assert rc == 0
+        assert len(lines) == 1 and lines[0].startswith('job {} '.format(i))
+        workers.add(lines[0].split()[-1])
+    # Jobs are spread over at most two long-lived workers
+    assert len(workers) <= 2
+    assert all(session.p is None for session in pool.all_sessions)
@@ -0,0 +1,150 @@
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+# Timing spans of the phases of the build and test scripts. Spans come from
+# the scripts themselves, from the [TIMING] markers printed by our Tcl scripts
+# (phase name and start and end in ms since the epoch, so they are exact even
+# when the output of parallel simulations is printed later) and from the
+# Vivado messages that start each step of launch_simulation. They are written
+# as json lines and as a Chrome trace that can be opened in Perfetto.
+
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from output_monitor import OutputMonitor
+
+RE_TIMING = re.compile(r'^\[TIMING\]: (\S+) (\d+) (\d+)')
+
+# Vivado messages that start each step of launch_simulation, the last step
+# ends with the run
+VIVADO_PHASES = [('compile', r"Executing 'COMPILE and ANALYZE' step"),
+                 ('elaborate', r"Executing 'ELABORATE' step"),
+                 ('simulate', r"Executing 'SIMULATE' step")]
+
+
+class SpanRecorder:
+    def __init__(self):
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def add(self, name, start, end, lane, **args):
+        # start and end are seconds since the epoch
+        with self.lock:
+            self.spans.append({'name': name, 'start': round(start, 6), 'end': round(end, 6),
+                               'dur': round(end - start, 6), 'lane': lane, 'args': args})
+
+    @contextmanager
+    def span(self, name, lane, **args):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.time(), lane, **args)
+
+    def write(self, prefix):
+        with self.lock:
+            spans = sorted(self.spans, key=lambda span: span['start'])
+        with open(prefix + '.jsonl', 'w') as f:
+            for span in spans:
+                f.write(json.dumps(span) + '\n')
+
+        # Chrome traces need spans of the same thread to be nested, overlapping
+        # spans of a lane (e.g. parallel simulations) go to extra threads
+        t0 = spans[0]['start'] if spans else 0
+        threads = {}
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': 'pom'}}]
+        for span in spans:
+            rows = threads.setdefault(span['lane'], [])
+            # Each thread keeps the end of its open spans
+            for tid, stack in rows:
+                while stack and stack[-1] <= span['start']:
+                    stack.pop()
+                if not stack or span['end'] <= stack[-1]:
+                    break
+            else:
+                tid, stack = sum(len(r) for r in threads.values()) + 1, []
+                rows.append((tid, stack))
+                events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid,
+                               'args': {'name': span['lane'] + ('' if len(rows) == 1 else ' #{}'.format(len(rows)))}})
+            stack.append(span['end'])
+            events.append({'name': span['name'], 'ph': 'X', 'pid': 1, 'tid': tid,
+                           'ts': round((span['start'] - t0) * 1e6), 'dur': round(span['dur'] * 1e6),
+                           'args': span['args']})
+        with open(prefix + '.trace.json', 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def slowest(self, key, n=5, exclude=()):
+        # Total time of the spans of each value of the argument key, with the
+        # time of each phase. Spans that contain other phases are excluded
+        groups = {}
+        with self.lock:
+            for span in self.spans:
+                if key not in span['args'] or span['name'] in exclude:
+                    continue
+                group = groups.setdefault(span['args'][key], {})
+                group[span['name']] = group.get(span['name'], 0.0) + span['dur']
+        totals = sorted(((sum(phases.values()), value, phases) for value, phases in groups.items()),
+                        key=lambda item: item[0], reverse=True)
+        return [(value, total, phases) for total, value, phases in totals[:n]]
+
+
+def format_slowest(slowest, label):
+    lines = ['Slowest {}'.format(label)]
+    width = max([len(str(value)) for value, _, _ in slowest] + [12])
+    for value, total, phases in slowest:
+        breakdown = ', '.join('{} {:.1f}s'.format(name, dur) for name, dur in sorted(phases.items(), key=lambda item: -item[1]))
+        lines.append('  {:<{}} {:>9.1f}s  {}'.format(str(value), width, total, breakdown))
+    return '\n'.join(lines)
+
+
+class StreamPhases:
+    # Spans of the phases of a Vivado run. A phase starts at the line matching
+    # its rule and ends when the next one starts or when the run is closed.
+    # [TIMING] markers are recorded as they are, with the current arguments
+    def __init__(self, recorder, lane, rules=VIVADO_PHASES, first=None, **args):
+        self.recorder = recorder
+        self.lane = lane
+        self.monitor = OutputMonitor(rules) if rules else None
+        self.args = args
+        self.current = None
+        if first is not None:
+            self.current = (first, time.time(), dict(args))
+
+    def update(self, **args):
+        self.args.update(args)
+
+    def feed(self, line):
+        m = RE_TIMING.match(line)
+        if m is not None:
+            self.recorder.add(m.group(1), int(m.group(2)) / 1000, int(m.group(3)) / 1000, self.lane, **self.args)
+            return
+        kind = self.monitor.match(line) if self.monitor is not None else None
+        if kind is not None:
+            self.close()
+            self.current = (kind, time.time(), dict(self.args))
+
+    def close(self):
+        if self.current is not None:
+            name, start, args = self.current
+            self.recorder.add(name, start, time.time(), self.lane, **args)
+            self.current = None
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+# Compiles a recorded workload trace into the stimulus files that hwruntime_tb
+# streams with +trace=<dir> instead of generating random commands.
+#
+# The trace is a json lines file with one task per line:
+#   {"id": 7, "type": 4660, "nargs": 3, "parent": 2, "gap": 120}
+# id      unique task id
+# type    task type, every type gets its own accelerators
+# nargs   number of arguments, the same for every task of a type
+# parent  id of the task that creates it, host tasks have no parent
+# gap     cycles since the previous host task was submitted, or since the
+#         parent started or created its previous child (def: 0). Gaps and
+#         the issue cycles of host tasks are at most 2^31 - 1
+# An optional first line {"instances": {"<type>": n}} sets the number of
+# accelerators of the types that do not create tasks (def: 1). Creator types
+# always have one accelerator.
+#
+# Stimulus files, one hex word per line for $readmemh:
+#   trace_types.mem     [7:0] nargs, one per type
+#   trace_host.mem      [23:0] trace id, [31:24] acc id, [63:32] issue cycle, one per host task
+#   trace_tasks.mem     [31:0] first child, [47:32] children, [55:48] type index, one per trace id
+#   trace_children.mem  [31:0] child trace id, [63:32] gap, one per created task
+# Host tasks are the first trace ids. Host tasks carry (1 << 32) | trace id in
+# their first argument and created tasks their index in newTasks, so creators
+# know which part of the trace they are executing.
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+from integration_conf import IntegrationConf, MAX_ACCS, MAX_CREATORS, MAX_TASK_TYPE
+
+MAX_ARGS = 15
+# Widths of the stimulus fields, gaps and issue cycles are compared with
+# signed int counters in the testbench
+MAX_TRACE_IDS = 1 << 24
+MAX_CHILDREN = (1 << 16) - 1
+MAX_GAP = (1 << 31) - 1
+
+
+class TraceTask:
+    def __init__(self, line, record):
+        try:
+            self.id = record['id']
+            self.type = int(record['type'])
+            self.nargs = int(record['nargs'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('line {}: tasks need an id, a type and nargs'.format(line))
+        self.parent = record.get('parent')
+        self.gap = int(record.get('gap', 0))
+        self.line = line
+        self.children = []
+        if self.type < 0 or self.type > MAX_TASK_TYPE:
+            raise ValueError('line {}: type must be between 0 and {}'.format(line, MAX_TASK_TYPE))
+        if self.gap < 0 or self.gap > MAX_GAP:
+            raise ValueError('line {}: gap must be between 0 and {}'.format(line, MAX_GAP))
+        if self.nargs < 0 or self.nargs > MAX_ARGS:
+            raise ValueError('line {}: nargs must be between 0 and {}'.format(line, MAX_ARGS))
+
+
+class TraceConf(IntegrationConf):
+    # The number of host and created tasks come from the trace instead of max_commands
+    def __init__(self, conf_seed, naccs, ninstances, ncreators, task_types, nest_graph, num_cmds, max_new_tasks, repeat_seeds):
+        super().__init__(conf_seed, 1 if ncreators else 0, num_cmds, naccs, ninstances, ncreators, task_types, nest_graph, repeat_seeds)
+        self.num_cmds = num_cmds
+        self.max_new_tasks = max_new_tasks
+
+    def generics(self):
+        counts = {'NUM_CMDS': str(self.num_cmds), 'MAX_NEW_TASKS': str(self.max_new_tasks)}
+        return [(name, counts.get(name, value)) for name, value in super().generics()]
+
+    def desc(self):
+        return 'naccs {} ntypes {} ncreators {} trace'.format(self.naccs, self.ntypes, self.ncreators)
+
+
+class Trace:
+    def __init__(self, path):
+        self.path = path
+        self.instances = {}
+        self.tasks = []
+        sha = hashlib.sha256()
+        with open(path, 'r') as f:
+            for num, line in enumerate(f, 1):
+                sha.update(line.encode('utf-8'))
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    raise ValueError('line {}: {}'.format(num, e))
+                if 'instances' in record and not self.tasks:
+                    self.instances = {int(t): int(n) for t, n in record['instances'].items()}
+                else:
+                    self.tasks.append(TraceTask(num, record))
+        self.hash = sha.hexdigest()
+        self.check()
+
+    def check(self):
+        by_id = {}
+        for task in self.tasks:
+            if task.id in by_id:
+                raise ValueError('line {}: duplicated task id {}'.format(task.line, task.id))
+            by_id[task.id] = task
+        for task in self.tasks:
+            if task.parent is not None:
+                if task.parent not in by_id:
+                    raise ValueError('line {}: unknown parent {}'.format(task.line, task.parent))
+                by_id[task.parent].children.append(task)
+        self.host_tasks = [task for task in self.tasks if task.parent is None]
+        if not self.host_tasks:
+            raise ValueError('the trace has no host tasks')
+        # Every task gets a 24 bit trace id, so the 32 bit first child index never overflows
+        if len(self.tasks) > MAX_TRACE_IDS:
+            raise ValueError('the trace has {} tasks, at most {} are supported'.format(len(self.tasks), MAX_TRACE_IDS))
+        for task in self.tasks:
+            if len(task.children) > MAX_CHILDREN:
+                raise ValueError('line {}: more than {} children'.format(task.line, MAX_CHILDREN))
+        issue = 0
+        for task in self.host_tasks:
+            issue += task.gap
+            if issue > MAX_GAP:
+                raise ValueError('line {}: issue cycle {} out of range'.format(task.line, issue))
+
+        self.nargs = {}
+        for task in self.tasks:
+            if self.nargs.setdefault(task.type, task.nargs) != task.nargs:
+                raise ValueError('line {}: tasks of type {} have {} and {} arguments'.format(task.line, task.type, self.nargs[task.type], task.nargs))
+
+        # A creator waits for its children, a type that creates itself (directly
+        # or not) would wait for its own only accelerator
+        self.creates = {}
+        for task in self.tasks:
+            for child in task.children:
+                self.creates.setdefault(task.type, set()).add(child.type)
+        state = {}
+
+        def visit(t):
+            state[t] = 1
+            for child in self.creates.get(t, ()):
+                if state.get(child) == 1:
+                    raise ValueError('task type {} creates itself through nested tasks'.format(child))
+                if child not in state:
+                    visit(child)
+            state[t] = 2
+        for t in list(self.creates):
+            if t not in state:
+                visit(t)
+
+        # Creators store the task index in the first argument
+        if self.creates:
+            for t, nargs in self.nargs.items():
+                if nargs == 0:
+                    raise ValueError('tasks of type {} need at least one argument when the trace creates tasks'.format(t))
+
+    def conf(self, repeat_seeds):
+        order = []
+        for task in self.tasks:
+            if task.type not in order:
+                order.append(task.type)
+        creators = [t for t in order if t in self.creates]
+        others = [t for t in order if t not in self.creates]
+        if len(creators) > MAX_CREATORS:
+            raise ValueError('the trace has {} creator types, at most {} are supported'.format(len(creators), MAX_CREATORS))
+        if not others:
+            raise ValueError('the trace needs a type that does not create tasks')
+        types = creators + others
+        ninstances = [1] * len(creators) + [self.instances.get(t, 1) for t in others]
+        if sum(ninstances) > MAX_ACCS:
+            raise ValueError('the trace needs {} accelerators, at most {} are supported'.format(sum(ninstances), MAX_ACCS))
+        nest_graph = [[1 if t in self.creates[c] else 0 for t in types] for c in creators]
+        num_created = len(self.tasks) - len(self.host_tasks)
+        conf = TraceConf(int(self.hash[:8], 16) & 0x7FFFFFFF, sum(ninstances), ninstances, len(creators), types, nest_graph,
+                         len(self.host_tasks), max(num_created, 1), repeat_seeds)
+        return conf
+
+    def write_stimulus(self, conf, dst_dir):
+        os.makedirs(dst_dir, exist_ok=True)
+        type_idx = {t: i for i, t in enumerate(conf.task_types)}
+        first_acc = []
+        acc = 0
+        for n in conf.ninstances:
+            first_acc.append(acc)
+            acc += n
+
+        # Host tasks first, then the created ones in trace order
+        trace_ids = {}
+        for task in self.host_tasks:
+            trace_ids[task.id] = len(trace_ids)
+        for task in self.tasks:
+            if task.parent is not None:
+                trace_ids[task.id] = len(trace_ids)
+        ordered = sorted(self.tasks, key=lambda task: trace_ids[task.id])
+
+        with open(os.path.join(dst_dir, 'trace_types.mem'), 'w') as f:
+            for t in conf.task_types:
+                f.write('{:016X}\n'.format(self.nargs[t]))
+
+        next_instance = [0] * conf.ntypes
+        issue = 0
+        with open(os.path.join(dst_dir, 'trace_host.mem'), 'w') as f:
+            for task in self.host_tasks:
+                idx = type_idx[task.type]
+                acc_id = first_acc[idx] + next_instance[idx]
+                next_instance[idx] = (next_instance[idx] + 1) % conf.ninstances[idx]
+                issue += task.gap
+                f.write('{:08X}{:02X}{:06X}\n'.format(issue, acc_id, trace_ids[task.id]))
+
+        children = []
+        with open(os.path.join(dst_dir, 'trace_tasks.mem'), 'w') as f:
+            for task in ordered:
+                f.write('{:02X}{:02X}{:04X}{:08X}\n'.format(0, type_idx[task.type], len(task.children), len(children)))
+                children += task.children
+
+        with open(os.path.join(dst_dir, 'trace_children.mem'), 'w') as f:
+            for child in children:
+                f.write('{:08X}{:08X}\n'.format(child.gap, trace_ids[child.id]))
+            # $readmemh needs at least one word
+            if not children:
+                f.write('{:016X}\n'.format(0))
+
+
+class ArgParser:
+    def __init__(self):
+        self.parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter,
+                                              description='Compile a workload trace into hwruntime_tb stimulus files')
+
+        self.parser.add_argument('trace', help='json lines workload trace')
+        self.parser.add_argument('-o', '--output', help='directory of the stimulus files (def: trace_stimulus)', type=str, default='trace_stimulus')
+
+    def parse_args(self):
+        args = self.parser.parse_args()
+        return args
+
+
+if __name__ == '__main__':
+    args = ArgParser().parse_args()
+    try:
+        trace = Trace(args.trace)
+        conf = trace.conf([1])
+        trace.write_stimulus(conf, args.output)
+        conf.write_files(args.output)
+    except ValueError as e:
+        print('Invalid trace {}: {}'.format(args.trace, e))
+        sys.exit(1)
+    print('{}: {} host tasks, {} created tasks'.format(conf.desc(), conf.num_cmds, len(trace.tasks) - conf.num_cmds))
+    for name, value in conf.generics():
+        print('  {} = {}'.format(name, value))
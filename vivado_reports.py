@@ -0,0 +1,149 @@
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+# Parsers of the reports written by Vivado that are shared by the scripts
+# which synthesize the IP
+
+from sv_literal import parse_sv_literal
+
+
+def to_number(value):
+    try:
+        return parse_sv_literal(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+
+def parse_rpt_tables(rpt_path):
+    # Walks a Vivado report once and returns the tables of every section as
+    # {section: [{'header': [...], 'rows': [[...]], 'depth': [...]}]}
+    # NOTE: Sections are titled '<n>. <title>' or '<n>.<m> <title>', underlined with dashes
+    sections = {}
+    section = None
+    candidate = None
+    table = None
+    borders = 0
+    with open(rpt_path, 'r') as rpt_file:
+        for line in rpt_file:
+            line = line.rstrip('\n')
+            if line.startswith('+-'):
+                if table is None:
+                    table = {'header': [], 'rows': [], 'depth': []}
+                    sections.setdefault(section, []).append(table)
+                    borders = 0
+                borders += 1
+                if borders == 3:
+                    table = None
+            elif line.startswith('|') and table is not None:
+                cells = line[1:].rstrip().rstrip('|').split('|')
+                if borders == 1:
+                    # Long titles are wrapped in several header lines
+                    if table['header']:
+                        table['header'] = [(title + ' ' + c.strip()).strip() for title, c in zip(table['header'], cells)]
+                    else:
+                        table['header'] = [c.strip() for c in cells]
+                elif table['rows'] and not cells[0].strip() and len(cells) == len(table['rows'][-1]):
+                    # A cell too wide for its column goes on in the next line,
+                    # whose first cell is empty
+                    row = table['rows'][-1]
+                    for col, c in enumerate(cells):
+                        if c.strip():
+                            row[col] = to_number(str(row[col]) + c.strip())
+                else:
+                    table['rows'].append([to_number(c.strip()) for c in cells])
+                    # Hierarchy levels are indented by 2 spaces
+                    table['depth'].append((len(cells[0]) - len(cells[0].lstrip()) - 1) // 2)
+            else:
+                table = None
+                if candidate is not None and line and line == '-' * len(candidate):
+                    section = candidate.split(' ', 1)[1]
+                candidate = line if line[:1].isdigit() else None
+    return sections
+
+
+def get_rpt_table(sections, section_names):
+    # NOTE: The same table has different section names depending on the device family
+    tables = [sections[name][0] for name in section_names if name in sections]
+    if len(tables) != 1:
+        return None
+    return tables[0]
+
+
+def get_rpt_site_used(table, site_types):
+    if table is None or 'Used' not in table['header']:
+        return None
+    col = table['header'].index('Used')
+    for row in table['rows']:
+        if str(row[0]).rstrip('*') in site_types:
+            return row[col]
+    return None
+
+
+def get_used_resources(sections):
+    # Returns the used resources of a utilization report and the name of the
+    # first resource that could not be found, if any
+    used_resources = {}
+
+    # Get LUT/FF
+    clb_table = get_rpt_table(sections, ['Slice Logic', 'CLB Logic'])
+    lut = get_rpt_site_used(clb_table, ['Slice LUTs', 'CLB LUTs'])
+    ff = get_rpt_site_used(clb_table, ['Slice Registers', 'CLB Registers'])
+    if lut is None or ff is None:
+        return used_resources, 'LUT/FF'
+    used_resources['LUT'] = int(lut)
+    used_resources['FF'] = int(ff)
+
+    # Get DSP
+    dsp = get_rpt_site_used(get_rpt_table(sections, ['DSP', 'ARITHMETIC']), ['DSPs'])
+    if dsp is None:
+        return used_resources, 'DSP'
+    used_resources['DSP48E'] = int(dsp)
+
+    # Get BRAM
+    memory_table = get_rpt_table(sections, ['Memory', 'BLOCKRAM'])
+    bram = get_rpt_site_used(memory_table, ['Block RAM Tile'])
+    if bram is None:
+        return used_resources, 'BRAM'
+    used_resources['BRAM_18K'] = int(float(bram) * 2)
+
+    # Get URAM, only available in UltraScale+ devices
+    uram = get_rpt_site_used(memory_table, ['URAM'])
+    if uram is not None:
+        used_resources['URAM'] = int(uram)
+
+    return used_resources, None
+
+
+def parse_timing_summary(summary_path):
+    with open(summary_path, 'r') as rpt_file:
+        rpt_data = rpt_file.readlines()
+
+    # The Design Timing Summary table starts with a WNS(ns) header followed by a dashed line
+    ids = [idx for idx in range(len(rpt_data) - 2) if rpt_data[idx].split()[:2] == ['WNS(ns)', 'TNS(ns)']]
+    if len(ids) == 0:
+        return None
+    elems = rpt_data[ids[0] + 2].split()
+    try:
+        return {'WNS': float(elems[0]), 'TNS': float(elems[1]), 'WHS': float(elems[4])}
+    except (IndexError, ValueError):
+        return None
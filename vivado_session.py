@@ -0,0 +1,142 @@
+# ------------------------------------------------------------------------- #
+#   Copyright (C) 2020-2023 Barcelona Supercomputing Center                 #
+#                   Centro Nacional de Supercomputacion (BSC-CNS)           #
+#                                                                           #
+#   This file is part of OmpSs@FPGA toolchain.                              #
+#                                                                           #
+#   This program is free software: you can redistribute it and/or modify    #
+#   it under the terms of the GNU General Public License as published       #
+#   by the Free Software Foundation, either version 3 of the License,       #
+#   or (at your option) any later version.                                  #
+#                                                                           #
+#   This program is distributed in the hope that it will be useful,         #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of          #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                    #
+#   See the GNU General Public License for more details.                    #
+#                                                                           #
+#   You should have received a copy of the GNU General Public License       #
+#   along with this program. If not, see <https://www.gnu.org/licenses/>.   #
+# ------------------------------------------------------------------------- #
+
+# Long-lived Vivado Tcl workers. Each job is sent through stdin as a single
+# Tcl command that sources a script with its own argv and then prints a
+# done marker with the catch return code. Any Tcl shell that understands
+# this protocol can be used instead of Vivado (e.g. tclsh for testing).
+# When the line callback returns True the job is aborted and the worker and
+# its children (e.g. xsim) are killed; a new worker is started for the next job.
+
+import os
+import queue
+import subprocess
+from contextlib import contextmanager
+
+from output_monitor import LineReader, kill_process_tree
+
+VIVADO_SESSION_CMD = 'vivado -nojournal -nolog -notrace -mode tcl'
+DONE_MARKER = '<<<POM_DONE'
+
+
+def tcl_quote(value):
+    value = str(value)
+    if value and not any(c in value for c in '{}\\'):
+        return '{' + value + '}'
+    return '"' + ''.join('\\' + c if c in '[]{}$"\\ ' else c for c in value) + '"'
+
+
+class VivadoSession:
+    def __init__(self, cmd=VIVADO_SESSION_CMD):
+        self.cmd = cmd
+        self.p = None
+        self.reader = None
+        self.jobs = 0
+
+    def start(self):
+        self.p = subprocess.Popen(self.cmd, shell=True, start_new_session=True,
+                                  stdin=subprocess.PIPE,
+                                  stdout=subprocess.PIPE,
+                                  stderr=subprocess.STDOUT)
+        self.reader = LineReader(self.p.stdout)
+
+    def alive(self):
+        return self.p is not None and self.p.poll() is None
+
+    def run_script(self, script, tclargs, cwd, on_line=None):
+        if not self.alive():
+            self.start()
+
+        self.jobs += 1
+        token = '{}_{}'.format(os.getpid(), self.jobs)
+        # Leftovers of the previous job must not leak into the next one
+        command = ('catch {close_sim -quiet -force}; catch {close_project -quiet}; '
+                   'cd ' + tcl_quote(cwd) + '; '
+                   'set argv [list ' + ' '.join(tcl_quote(a) for a in tclargs) + ']; '
+                   'set argc ' + str(len(tclargs)) + '; '
+                   'set __pom_rc [catch {source ' + tcl_quote(script) + '} __pom_msg]; '
+                   'if {$__pom_rc == 1} {puts "ERROR: $__pom_msg"}; '
+                   'puts "' + DONE_MARKER + ' ' + token + ' $__pom_rc>>>"; flush stdout\n')
+        try:
+            self.p.stdin.write(command.encode('utf-8'))
+            self.p.stdin.flush()
+        except (BrokenPipeError, OSError):
+            self.close()
+            return -1
+
+        marker = DONE_MARKER + ' ' + token + ' '
+        for line in iter(self.reader.readline, ''):
+            idx = line.find(marker)
+            if idx != -1:
+                return int(line[idx + len(marker):].split('>')[0])
+            if on_line is not None and on_line(line):
+                self.kill()
+                return -1
+
+        # The worker exited in the middle of the job (e.g. the script called exit)
+        self.close()
+        return -1
+
+    def close(self):
+        if self.p is None:
+            return
+        if self.p.poll() is None:
+            try:
+                self.p.stdin.write(b'exit\n')
+                self.p.stdin.flush()
+            except (BrokenPipeError, OSError):
+                pass
+            try:
+                self.p.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.kill()
+                return
+        self.reader.close()
+        self.p = None
+
+    def kill(self):
+        if self.p is None:
+            return
+        kill_process_tree(self.p)
+        self.p.wait()
+        self.reader.close()
+        self.p = None
+
+
+class VivadoSessionPool:
+    def __init__(self, size, cmd=VIVADO_SESSION_CMD):
+        self.sessions = queue.Queue()
+        self.all_sessions = []
+        for _ in range(size):
+            session = VivadoSession(cmd)
+            self.sessions.put(session)
+            self.all_sessions.append(session)
+
+    @contextmanager
+    def session(self):
+        session = self.sessions.get()
+        try:
+            yield session
+        finally:
+            self.sessions.put(session)
+
+    def close(self):
+        for session in self.all_sessions:
+            session.close()